@@ -0,0 +1,108 @@
+import bisect
+import threading
+
+DEFAULT_TIMEFRAME = '1d'  # alertas de status sem 'timeframe' (configs antigos) usam o gráfico diário
+TIMEFRAME_OPTIONS = ('15m', '1h', '4h', '1d', '1w')  # timeframes oferecidos nos alertas de status
+
+# --- Motor de Avaliação de Alertas ---
+
+class _SymbolAlerts:
+    """Alertas de um símbolo compilados em índices ordenados."""
+    __slots__ = ('high_prices', 'high_alerts', 'low_prices', 'low_alerts', 'status_by_signal', 'other_alerts',
+                 'high_edge', 'low_edge', 'price_primed', 'active_signals')
+
+    def __init__(self, alerts):
+        highs = sorted((a for a in alerts if a.get('type') == 'high'), key=lambda a: a.get('price', 0))
+        lows = sorted((a for a in alerts if a.get('type') == 'low'), key=lambda a: a.get('price', 0))
+        self.high_prices, self.high_alerts = [a.get('price', 0) for a in highs], highs
+        self.low_prices, self.low_alerts = [a.get('price', 0) for a in lows], lows
+        self.status_by_signal = {}
+        for alert in alerts:
+            if alert.get('type') == 'status':
+                key = (alert.get('timeframe', DEFAULT_TIMEFRAME), alert.get('value'))
+                self.status_by_signal.setdefault(key, []).append(alert)
+        self.other_alerts = [a for a in alerts if a.get('type') not in ('high', 'low', 'status')]
+        # high_alerts[:high_edge] e low_alerts[low_edge:] são os alertas de preço atingidos na última avaliação.
+        self.high_edge, self.low_edge = 0, len(lows)
+        self.price_primed = False
+        self.active_signals = None  # None: status ainda não avaliados desde a compilação
+
+class AlertEngine:
+    """Avalia os alertas do config.json por símbolo usando índices pré-compilados.
+
+    Os alertas 'high'/'low' ficam em listas ordenadas por preço e são localizados por bisect;
+    os de status ficam em um mapa (timeframe, sinal) -> alertas. Entre duas avaliações só os alertas cuja
+    condição mudou são visitados, preservando a semântica de borda de 'triggered_now': um alerta
+    dispara ao passar de não atingido para atingido e é rearmado quando deixa de ser atingido.
+    Os dicionários de alerta do config são referenciados (não copiados), então 'triggered_now'
+    continua sendo gravado no próprio config.
+    """
+    def __init__(self, cryptos=()):
+        self.lock = threading.Lock()
+        self.index = {}
+        self.rebuild(cryptos)
+
+    def rebuild(self, cryptos):
+        """Recompila os índices a partir de config['cryptos_to_monitor'] (chamar após salvar o config)."""
+        alerts_by_symbol = {}
+        for crypto in cryptos:
+            # Entradas repetidas do mesmo símbolo somam os alertas em vez de se sobrescreverem.
+            alerts = crypto.get('alerts', [])
+            if alerts: alerts_by_symbol.setdefault(crypto['symbol'], []).extend(alerts)
+        index = {symbol: _SymbolAlerts(alerts) for symbol, alerts in alerts_by_symbol.items()}
+        with self.lock: self.index = index
+
+    def status_timeframes(self, symbol):
+        """Timeframes usados pelos alertas de status de `symbol` (conjunto vazio se não houver)."""
+        with self.lock:
+            entry = self.index.get(symbol)
+            return {timeframe for timeframe, _ in entry.status_by_signal} if entry else set()
+
+    def alert_count(self):
+        with self.lock:
+            return sum(len(e.high_alerts) + len(e.low_alerts) + len(e.other_alerts) + sum(map(len, e.status_by_signal.values()))
+                       for e in self.index.values())
+
+    def evaluate(self, symbol, price, signals=None):
+        """Avalia os alertas de `symbol` e retorna os que acabaram de disparar.
+
+        `signals` é o conjunto de pares (timeframe, sinal) ativos do símbolo; com None (ticks de preço do
+        stream) os alertas de status não são avaliados e mantêm o estado anterior.
+        """
+        fired = []
+        with self.lock:
+            entry = self.index.get(symbol)
+            if entry is None: return fired
+            high_edge = bisect.bisect_right(entry.high_prices, price)
+            low_edge = bisect.bisect_left(entry.low_prices, price)
+            if not entry.price_primed:
+                for alert in entry.other_alerts: alert["triggered_now"] = False
+                self._apply(entry.high_alerts, 0, high_edge, True, fired)
+                self._apply(entry.high_alerts, high_edge, len(entry.high_alerts), False, fired)
+                self._apply(entry.low_alerts, low_edge, len(entry.low_alerts), True, fired)
+                self._apply(entry.low_alerts, 0, low_edge, False, fired)
+            else:
+                if high_edge > entry.high_edge: self._apply(entry.high_alerts, entry.high_edge, high_edge, True, fired)
+                elif high_edge < entry.high_edge: self._apply(entry.high_alerts, high_edge, entry.high_edge, False, fired)
+                if low_edge < entry.low_edge: self._apply(entry.low_alerts, low_edge, entry.low_edge, True, fired)
+                elif low_edge > entry.low_edge: self._apply(entry.low_alerts, entry.low_edge, low_edge, False, fired)
+            entry.high_edge, entry.low_edge, entry.price_primed = high_edge, low_edge, True
+
+            if signals is not None:
+                active = frozenset(s for s in signals if s in entry.status_by_signal)
+                if entry.active_signals is None:
+                    for value, alerts in entry.status_by_signal.items(): self._apply(alerts, 0, len(alerts), value in active, fired)
+                else:
+                    for value in active - entry.active_signals: self._apply(entry.status_by_signal[value], 0, len(entry.status_by_signal[value]), True, fired)
+                    for value in entry.active_signals - active: self._apply(entry.status_by_signal[value], 0, len(entry.status_by_signal[value]), False, fired)
+                entry.active_signals = active
+        return fired
+
+    @staticmethod
+    def _apply(alerts, start, stop, triggered, fired):
+        for i in range(start, stop):
+            alert = alerts[i]
+            if triggered and not alert.get("triggered_now", False):
+                alert["triggered_now"] = True; fired.append(alert)
+            elif not triggered:
+                alert["triggered_now"] = False
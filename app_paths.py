@@ -0,0 +1,12 @@
+import os
+import sys
+
+# --- Caminhos da Aplicação ---
+
+def get_application_path():
+    """Retorna o caminho do diretório da aplicação, seja executável ou script."""
+    if getattr(sys, 'frozen', False):
+        application_path = os.path.dirname(sys.executable)
+    else:
+        application_path = os.path.dirname(os.path.abspath(__file__))
+    return application_path
@@ -0,0 +1,203 @@
+import io
+import itertools
+import logging
+import os
+import threading
+import wave
+import numpy as np
+
+logger = logging.getLogger("monitor")
+
+# --- Serviço de Áudio (uma thread de mixagem para todos os alertas) ---
+
+MIX_RATE, MIX_CHANNELS = 44_100, 2
+DEFAULT_MAX_CONCURRENT = 3
+PRICE_ALERT_PRIORITY, STATUS_ALERT_PRIORITY, PREVIEW_PRIORITY = 1, 0, 10
+MIX_CACHE_SIZE = 8
+
+def decode_wav(path):
+    """Lê um .wav PCM (8/16/24/32 bits) e o converte para float32 em MIX_RATE/MIX_CHANNELS (frames x canais)."""
+    with wave.open(path, 'rb') as w:
+        channels, width, rate, raw = w.getnchannels(), w.getsampwidth(), w.getframerate(), w.readframes(w.getnframes())
+    if width == 1: samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2: samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)) << 8 >> 8).astype(np.float32) / 8_388_608
+    elif width == 4: samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2_147_483_648
+    else: raise ValueError(f"largura de amostra não suportada: {width} bytes")
+    samples = samples.reshape(-1, channels)
+    if rate != MIX_RATE and len(samples):
+        positions = np.arange(int(len(samples) * MIX_RATE / rate)) * (rate / MIX_RATE)
+        samples = np.stack([np.interp(positions, np.arange(len(samples)), samples[:, c]) for c in range(channels)], axis=1).astype(np.float32)
+    if channels == 1: samples = np.repeat(samples, MIX_CHANNELS, axis=1)
+    elif channels > MIX_CHANNELS: samples = samples[:, :MIX_CHANNELS]
+    return samples
+
+def encode_wav(samples):
+    """Converte amostras float32 (frames x canais) em um .wav PCM 16 bits em memória."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(MIX_CHANNELS); w.setsampwidth(2); w.setframerate(MIX_RATE); w.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+# --- Backends ---
+
+class NullAudioBackend:
+    """Backend silencioso (Linux, modo headless e testes): registra o que seria tocado e simula a duração."""
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+        self.played = []
+        self.interrupt = threading.Event()
+
+    def play(self, wav_bytes, duration):
+        self.played.append(len(wav_bytes))
+        self.interrupt.wait(duration * self.time_scale); self.interrupt.clear()
+
+    def stop(self):
+        self.interrupt.set()
+
+class WinsoundBackend:
+    """Toca o buffer mixado com winsound a partir da memória (sem reler o .wav do disco)."""
+    def __init__(self):
+        import winsound
+        self.winsound = winsound
+
+    def play(self, wav_bytes, duration):
+        self.winsound.PlaySound(wav_bytes, self.winsound.SND_MEMORY | self.winsound.SND_NODEFAULT)
+
+    def stop(self):
+        self.winsound.PlaySound(None, 0)  # interrompe a reprodução em andamento (inclusive a síncrona)
+
+def create_audio_backend():
+    try: return WinsoundBackend()
+    except ImportError: return NullAudioBackend()
+
+# --- Serviço ---
+
+class _Voice:
+    __slots__ = ('sound', 'priority', 'order', 'stop_event', 'loop')
+
+    def __init__(self, sound, priority, order, stop_event, loop):
+        self.sound, self.priority, self.order, self.stop_event, self.loop = sound, priority, order, stop_event, loop
+
+class AudioService:
+    """Toca os sons dos alertas em uma única thread, a partir de buffers pré-carregados.
+
+    Cada alerta vira uma "voz" que se repete até o seu `stop_event` ser sinalizado (popup fechado).
+    Até `max_concurrent` vozes tocam juntas, mixadas em um único buffer; as demais esperam na fila por
+    prioridade (maior primeiro, depois ordem de chegada). Vozes iguais (mesmo som e mesmo evento) não
+    se repetem. A mixagem é refeita só quando o conjunto de vozes ativas muda.
+    """
+    def __init__(self, backend=None, base_path="", max_concurrent=DEFAULT_MAX_CONCURRENT):
+        self.backend = backend or create_audio_backend()
+        self.base_path, self.max_concurrent = base_path, max_concurrent
+        self.lock = threading.Lock()
+        self.sounds = {}         # caminho absoluto -> (mtime, amostras float32)
+        self.voices = []
+        self.mix_cache = {}      # tupla de caminhos das vozes ativas -> (wav em bytes, duração)
+        self.order = itertools.count()
+        self.wake_event = threading.Event(); self.stop_event = threading.Event()
+        self.playing = ()        # caminhos das vozes do buffer em reprodução
+        self.thread = threading.Thread(target=self._run, daemon=True, name="audio-mixer"); self.thread.start()
+
+    def resolve(self, sound_path):
+        return sound_path if os.path.isabs(sound_path) else os.path.join(self.base_path, sound_path)
+
+    def preload(self, sound_paths):
+        """Decodifica e guarda em cache os sons informados (ex.: todos os referenciados no config.json)."""
+        for sound_path in set(filter(None, sound_paths)): self._load(self.resolve(sound_path))
+
+    def play(self, sound_path, stop_event=None, priority=0, loop=True):
+        """Enfileira um som; com `loop` ele se repete até `stop_event` ser sinalizado. Retorna False se o som não pôde ser carregado."""
+        path = self.resolve(sound_path)
+        if self._load(path) is None: return False
+        stop_event = stop_event or threading.Event()
+        with self.lock:
+            if any(v.sound == path and v.stop_event is stop_event for v in self.voices): return True
+            self.voices.append(_Voice(path, priority, next(self.order), stop_event, loop))
+            interrupt = self._active_paths() != self.playing
+        if interrupt: self.backend.stop()
+        self.wake_event.set()
+        return True
+
+    def preview(self, sound_path):
+        """Toca o som uma vez, à frente dos alertas (botão ▶ do diálogo de alerta)."""
+        return self.play(sound_path, priority=PREVIEW_PRIORITY, loop=False)
+
+    def stop_all(self):
+        with self.lock:
+            for voice in self.voices: voice.stop_event.set()
+        self.backend.stop(); self.wake_event.set()
+
+    def stop(self):
+        self.stop_event.set(); self.stop_all()
+        self.thread.join(timeout=2)
+
+    def pending(self):
+        with self.lock: return len(self.voices)
+
+    def refresh(self):
+        """Chamar após sinalizar o `stop_event` de uma voz: interrompe o buffer atual se ele a incluía."""
+        with self.lock: interrupt = self._active_paths() != self.playing
+        if interrupt: self.backend.stop()
+        self.wake_event.set()
+
+    # --- Mixagem ---
+
+    def _load(self, path):
+        try: mtime = os.path.getmtime(path)
+        except OSError:
+            logger.warning(f"Aviso: arquivo de som não encontrado: {path}"); return None
+        cached = self.sounds.get(path)
+        if cached and cached[0] == mtime: return cached[1]
+        try: samples = decode_wav(path)
+        except (wave.Error, ValueError, EOFError, OSError) as e:
+            logger.error(f"--> Erro ao carregar o som '{path}': {e}"); return None
+        with self.lock:
+            self.sounds[path] = (mtime, samples)
+            self.mix_cache = {k: v for k, v in self.mix_cache.items() if path not in k}
+        return samples
+
+    def _active(self):
+        """Vozes que tocam agora: as `max_concurrent` de maior prioridade (chamar com o lock)."""
+        self.voices = [v for v in self.voices if not v.stop_event.is_set()]
+        return sorted(self.voices, key=lambda v: (-v.priority, v.order))[:self.max_concurrent]
+
+    def _active_paths(self):
+        return tuple(sorted({v.sound for v in self._active()}))  # o mesmo som em duas vozes toca uma vez
+
+    def _mix(self, paths):
+        key = paths
+        cached = self.mix_cache.get(key)
+        if cached: return cached
+        tracks = [self.sounds[p][1] for p in paths]
+        length = max(len(t) for t in tracks)
+        mixed = np.zeros((length, MIX_CHANNELS), dtype=np.float32)
+        for track in tracks: mixed[:len(track)] += track
+        mixed *= 1 / np.sqrt(len(tracks))  # evita saturação ao somar várias vozes
+        result = (encode_wav(mixed), length / MIX_RATE)
+        if len(self.mix_cache) >= MIX_CACHE_SIZE: self.mix_cache.pop(next(iter(self.mix_cache)))
+        self.mix_cache[key] = result
+        return result
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            with self.lock:
+                active = self._active()
+                paths = tuple(sorted({v.sound for v in active}))
+                if paths:
+                    wav_bytes, duration = self._mix(paths)
+                    self.playing = paths
+                else: self.playing = ()
+            if not paths:
+                self.wake_event.wait(); self.wake_event.clear(); continue
+            try: self.backend.play(wav_bytes, duration)
+            except Exception as e:
+                logger.error(f"--> Erro ao tocar som: {e}")
+                self.stop_event.wait(1)
+            with self.lock:
+                # Vozes sem repetição (prévia) saem depois de tocar uma vez.
+                for voice in active:
+                    if not voice.loop: voice.stop_event.set()
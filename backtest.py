@@ -0,0 +1,237 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from alert_engine import DEFAULT_TIMEFRAME
+from app_paths import get_application_path
+from candle_store import CandleStore, CLOSE, OPEN_TIME, INTERVAL_MS, INTERVAL_OFFSET_MS, MAX_KLINES_PER_REQUEST, is_multiple_of
+from http_client import HttpClient
+from indicators import (compute_indicator_matrix, signal_columns, RSI_OVERBOUGHT, RSI_OVERSOLD, BB_ABOVE, BB_BELOW,
+                        GOLDEN_CROSS, DEATH_CROSS)
+from monitor_service import INDICATOR_CANDLES, KLINE_FETCH_WORKERS, KLINE_REQUEST_WEIGHT
+
+# --- Backtest: replay do histórico de candles pelas regras de alerta ---
+#
+# Cada candle fechado do intervalo base é tratado como um ciclo do Monitor: o preço é o fechamento
+# do candle, os sinais de cada timeframe saem de compute_indicator_matrix sobre a mesma janela de
+# INDICATOR_CANDLES candles (o último, parcial, quando o timeframe é maior que o base) e os alertas
+# seguem a semântica de borda de 'triggered_now' do AlertEngine: disparam ao passar de não atingido
+# para atingido e são rearmados quando a condição deixa de valer.
+
+logger = logging.getLogger("monitor")
+
+BLOCK_ROWS = 8192  # janelas avaliadas por chamada de compute_indicator_matrix
+HISTORY_MAX_CANDLES = 1_000_000
+STATUS_RULES = (RSI_OVERBOUGHT, BB_ABOVE, RSI_OVERSOLD, BB_BELOW,
+                "MACD: Cruzamento de Alta", "MACD: Cruzamento de Baixa", GOLDEN_CROSS, DEATH_CROSS)
+
+def history_path(base_path, interval):
+    return os.path.join(base_path, f"backtest_klines_{interval}.npz")
+
+# --- Histórico ---
+
+def download_history(store, symbols, days, client=None, now_ms=None):
+    """Baixa (ou completa) `days` dias de candles de cada símbolo no `store` e o salva em disco.
+
+    Símbolos que já têm histórico só baixam os candles posteriores ao último guardado.
+    """
+    client = client or HttpClient(pool_size=KLINE_FETCH_WORKERS)
+    now_ms = now_ms or int(time.time() * 1000)
+    interval_ms = INTERVAL_MS[store.interval]
+
+    def fetch(symbol):
+        history = store.get_closed(symbol)
+        start = int(history[-1, OPEN_TIME]) + interval_ms if history is not None and len(history) else now_ms - days * 86_400_000
+        klines = []
+        while start < now_ms:
+            params = {'symbol': symbol, 'interval': store.interval, 'limit': MAX_KLINES_PER_REQUEST, 'startTime': start}
+            try: page = client.get_json("https://api.binance.com/api/v3/klines", params=params, timeout=10, weight=KLINE_REQUEST_WEIGHT)
+            except Exception as e: logger.error(f"--> Erro ao baixar klines de '{symbol}': {e}"); break
+            klines.extend(page)
+            if len(page) < MAX_KLINES_PER_REQUEST: break
+            start = int(page[-1][0]) + interval_ms
+        if klines: store.merge(symbol, klines, now_ms)
+        return symbol, len(klines)
+
+    with ThreadPoolExecutor(max_workers=KLINE_FETCH_WORKERS, thread_name_prefix="backtest") as executor:
+        for symbol, count in executor.map(fetch, symbols): logger.info(f"{symbol}: {count} candle(s) baixado(s).")
+    store.save()
+
+def _step_windows(candles, timeframe):
+    """Para cada candle base, o índice do candle do timeframe em andamento e os fechamentos já fechados.
+
+    Retorna (fechamentos dos candles fechados do timeframe, índice do grupo de cada passo); passos
+    anteriores ao primeiro candle completo do timeframe recebem -1, como em resample_candles.
+    """
+    period, offset = INTERVAL_MS[timeframe], INTERVAL_OFFSET_MS.get(timeframe, 0)
+    open_times = candles[:, OPEN_TIME].astype(np.int64)
+    keys = (open_times - offset) // period
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    ends = np.append(starts[1:], len(candles)) - 1
+    group = np.cumsum(np.concatenate(([0], np.diff(keys) != 0)))
+    if keys[0] * period + offset != open_times[0]: group -= 1; ends = ends[1:]  # primeiro grupo incompleto
+    return candles[ends, CLOSE], group
+
+def replay_signals(histories, timeframe, window=INDICATOR_CANDLES, block_rows=BLOCK_ROWS):
+    """Calcula os sinais de `timeframe` em cada candle base de cada símbolo.
+
+    Retorna {símbolo: {'rsi_signal', 'bollinger_signal', 'macd', 'mme'}} com um vetor de textos por
+    coluna (um valor por candle base), iguais aos que o Monitor teria exibido naquele momento.
+    As janelas de todos os símbolos são avaliadas juntas, em blocos de `block_rows` linhas.
+    """
+    padded, rows_index, current, spans = [], [], [], {}
+    offset, row = 0, 0
+    for symbol, candles in histories.items():
+        group_closes, group = _step_windows(candles, timeframe)
+        # Cada janela = até window-1 candles fechados do timeframe + o candle em andamento (fechamento atual).
+        padded.append(np.concatenate((np.full(window - 1, np.nan), group_closes)))
+        rows_index.append(np.where(group >= 0, offset + group, -1))
+        current.append(candles[:, CLOSE])
+        spans[symbol] = (row, row + len(candles))
+        offset += len(padded[-1]); row += len(candles)
+    if not spans: return {}
+    padded, rows_index, current = np.concatenate(padded), np.concatenate(rows_index), np.concatenate(current)
+    columns = {'rsi_signal': np.full(row, "", dtype=object), 'bollinger_signal': np.full(row, "", dtype=object),
+               'macd': np.full(row, "N/A", dtype=object), 'mme': np.full(row, "N/A", dtype=object)}
+
+    valid_rows = np.flatnonzero(rows_index >= 0)
+    steps = np.arange(window - 1)
+    for i in range(0, len(valid_rows), block_rows):
+        block = valid_rows[i:i + block_rows]
+        matrix = np.empty((len(block), window))
+        matrix[:, :-1] = padded[rows_index[block, None] + steps]
+        matrix[:, -1] = current[block]
+        lengths = window - np.isnan(matrix).sum(axis=1)
+        ind = compute_indicator_matrix(matrix, lengths)
+        columns['rsi_signal'][block], columns['bollinger_signal'][block] = signal_columns(ind, current[block])
+        columns['macd'][block] = ind['macd']
+        columns['mme'][block] = [value or "N/A" for value in ind['mme']]
+    columns['macd'] = np.array(["MACD: " + v for v in columns['macd']], dtype=object)
+    return {symbol: {name: values[start:stop] for name, values in columns.items()} for symbol, (start, stop) in spans.items()}
+
+# --- Regras ---
+
+def rules_from_config(config):
+    """Alertas de config['cryptos_to_monitor'] como {símbolo: [alerta, ...]}."""
+    return {crypto['symbol']: crypto.get('alerts', []) for crypto in config.get('cryptos_to_monitor', []) if crypto.get('alerts')}
+
+def all_status_rules(symbols, timeframes=(DEFAULT_TIMEFRAME,)):
+    """Todas as regras de status em todos os timeframes, para cada símbolo."""
+    return {symbol: [{'type': 'status', 'value': value, 'timeframe': timeframe} for timeframe in timeframes for value in STATUS_RULES]
+            for symbol in symbols}
+
+def rule_label(alert):
+    if alert.get('type') in ('high', 'low'): return f"{alert['type'].upper()} @ ${alert.get('price', 0):,.2f}"
+    return f"Status: {alert.get('value', 'N/A')}"
+
+def rising_edges(active):
+    """Índices em que a condição passa de falsa para verdadeira (o alerta começa rearmado)."""
+    return np.flatnonzero(active & ~np.concatenate(([False], active[:-1])))
+
+def run_backtest(histories, rules, base_interval, window=INDICATOR_CANDLES):
+    """Reproduz as regras sobre o histórico e devolve uma linha de relatório por (símbolo, regra).
+
+    `histories` é {símbolo: candles do intervalo base}; `rules` é {símbolo: [alerta, ...]} no formato
+    do config.json. Cada linha traz 'symbol', 'rule', 'timeframe', 'triggers', 'candles' e os
+    horários (ms) de cada disparo em 'times'.
+    """
+    histories = {s: c for s, c in histories.items() if s in rules and c is not None and len(c)}
+    timeframes = {a.get('timeframe', DEFAULT_TIMEFRAME) for alerts in rules.values() for a in alerts if a.get('type') == 'status'}
+    signals = {}
+    for timeframe in sorted(timeframes, key=INTERVAL_MS.get):
+        if not is_multiple_of(timeframe, base_interval):
+            logger.warning(f"Aviso: timeframe {timeframe} não pode ser montado a partir de {base_interval}; regras ignoradas."); continue
+        signals[timeframe] = replay_signals(histories, timeframe, window)
+
+    report = []
+    for symbol, candles in histories.items():
+        closes, open_times = candles[:, CLOSE], candles[:, OPEN_TIME].astype(np.int64)
+        for alert in rules[symbol]:
+            a_type, timeframe = alert.get('type'), None
+            if a_type == 'high': active = closes >= alert.get('price', 0)
+            elif a_type == 'low': active = closes <= alert.get('price', 0)
+            elif a_type == 'status':
+                timeframe = alert.get('timeframe', DEFAULT_TIMEFRAME)
+                if timeframe not in signals: continue
+                value = alert.get('value')
+                active = np.zeros(len(candles), dtype=bool)
+                for column in signals[timeframe][symbol].values(): active |= column == value
+            else: continue
+            fired = rising_edges(active)
+            report.append({'symbol': symbol, 'rule': rule_label(alert), 'timeframe': timeframe, 'triggers': len(fired),
+                           'candles': len(candles), 'times': open_times[fired].tolist()})
+    return report
+
+# --- Relatório ---
+
+def _format_time(ms):
+    return time.strftime("%Y-%m-%d %H:%M", time.gmtime(ms / 1000))
+
+def write_report(report, path):
+    """Grava o relatório em JSON ou CSV, conforme a extensão de `path`."""
+    if path.lower().endswith('.csv'):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['symbol', 'rule', 'timeframe', 'triggers', 'candles', 'first', 'last'])
+            for r in report:
+                writer.writerow([r['symbol'], r['rule'], r['timeframe'] or '', r['triggers'], r['candles'],
+                                 _format_time(r['times'][0]) if r['times'] else '', _format_time(r['times'][-1]) if r['times'] else ''])
+    else:
+        with open(path, 'w', encoding='utf-8') as f: json.dump(report, f, indent=2, ensure_ascii=False)
+
+def print_summary(report, out=sys.stdout):
+    totals = {}
+    for r in report:
+        key = (r['rule'], r['timeframe'] or '')
+        count, symbols = totals.get(key, (0, 0)); totals[key] = (count + r['triggers'], symbols + 1)
+    print(f"{'Regra':<45} {'TF':<5} {'Disparos':>9} {'Símbolos':>9}", file=out)
+    for (rule, timeframe), (count, symbols) in sorted(totals.items(), key=lambda item: -item[1][0]):
+        print(f"{rule:<45} {timeframe:<5} {count:>9} {symbols:>9}", file=out)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reproduz o histórico de candles pelas regras de alerta e conta os disparos.")
+    parser.add_argument('--config', help="caminho do config.json (padrão: pasta da aplicação)")
+    parser.add_argument('--interval', default=DEFAULT_TIMEFRAME, help="intervalo base dos candles (padrão: 1d)")
+    parser.add_argument('--history', help="arquivo .npz com o histórico (padrão: backtest_klines_<intervalo>.npz)")
+    parser.add_argument('--download', type=int, metavar='DIAS', help="baixa/completa DIAS dias de histórico da Binance antes do replay")
+    parser.add_argument('--symbols', nargs='+', help="símbolos a reproduzir (padrão: os do config.json)")
+    parser.add_argument('--all-rules', action='store_true', help="avalia todas as regras de status em vez dos alertas do config")
+    parser.add_argument('--timeframes', nargs='+', default=[DEFAULT_TIMEFRAME], help="timeframes usados com --all-rules")
+    parser.add_argument('--output', help="grava o relatório completo em .json ou .csv")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    base_path = get_application_path()
+    config = {}
+    try:
+        with open(args.config or os.path.join(base_path, "config.json"), 'r', encoding='utf-8') as f: config = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError) as e: logger.warning(f"Aviso: config.json não carregado ({e}).")
+
+    store = CandleStore(args.history or history_path(base_path, args.interval), interval=args.interval, max_candles=HISTORY_MAX_CANDLES)
+    config_rules = rules_from_config(config)
+    symbols = args.symbols or sorted(config_rules if not args.all_rules else {c['symbol'] for c in config.get('cryptos_to_monitor', [])})
+    if args.download: download_history(store, symbols, args.download)
+    histories = {symbol: store.get_closed(symbol) for symbol in symbols}
+    missing = [s for s, c in histories.items() if c is None or not len(c)]
+    if missing: logger.warning(f"Aviso: sem histórico para {', '.join(missing)} (use --download).")
+
+    rules = all_status_rules(symbols, args.timeframes) if args.all_rules else {s: config_rules.get(s, []) for s in symbols}
+    started = time.perf_counter()
+    report = run_backtest(histories, rules, args.interval)
+    candles = sum(len(c) for c in histories.values() if c is not None)
+    logger.info(f"Replay de {candles} candles ({len(histories)} símbolos) em {time.perf_counter() - started:.2f}s.")
+    print_summary(report)
+    if args.output: write_report(report, args.output); logger.info(f"Relatório gravado em '{args.output}'.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
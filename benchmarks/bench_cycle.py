@@ -0,0 +1,289 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from candle_store import CLOSE, INTERVAL_MS, resample_candles
+from http_client import HttpClient
+from indicators import (compute_indicator_matrix, compute_signal_table, pack_close_matrix,
+                        calculate_rsi, calculate_bollinger_bands, calculate_macd, calculate_emas)
+from monitor_service import MonitorService, INDICATOR_CANDLES, KLINE_FETCH_WORKERS
+from row_model import build_row_view
+
+# --- Benchmark do ciclo de monitoramento e dos indicadores ---
+#
+# Sobe um servidor HTTP local que imita /klines e /ticker/24hr da Binance e /coins/markets da
+# CoinGecko com candles sintéticos determinísticos, executa ciclos completos do MonitorService
+# para cada tamanho de watchlist e mede cada etapa (busca, matriz de fechamentos, indicadores,
+# alertas e diff da tabela). Os resultados vão para um JSON; com --baseline as diferenças em
+# relação a uma execução anterior são impressas.
+
+logger = logging.getLogger("monitor")
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_WARM_CYCLES = 5
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "bench_cycle.json")
+REGRESSION_THRESHOLD = 0.20  # diferenças acima de 20% são destacadas na comparação
+
+# --- Dados sintéticos ---
+
+def synthetic_closes(symbol, open_times, interval_ms):
+    """Fechamentos determinísticos por (símbolo, horário): repetíveis entre pedidos e execuções."""
+    seed = zlib.crc32(symbol.encode())
+    k = np.asarray(open_times, dtype=np.float64) / interval_ms
+    base = 1 + seed % 5000
+    return base * np.exp(0.25 * np.sin(k / 97 + seed % 13) + 0.08 * np.sin(k / 11 + seed % 7) + 0.02 * np.sin(k * 1.7 + seed % 3))
+
+def synthetic_klines(symbol, interval, limit, start_time=None, now_ms=None):
+    """Resposta de /api/v3/klines (listas no formato da Binance) com `limit` candles até agora."""
+    now_ms = now_ms or int(time.time() * 1000)
+    interval_ms = INTERVAL_MS[interval]
+    first = start_time // interval_ms * interval_ms if start_time is not None else (now_ms // interval_ms - limit + 1) * interval_ms
+    open_times = np.arange(first, min(first + limit * interval_ms, now_ms + 1), interval_ms, dtype=np.int64)
+    if not len(open_times): return []
+    closes = synthetic_closes(symbol, open_times, interval_ms)
+    opens = synthetic_closes(symbol, open_times - interval_ms, interval_ms)
+    return [[int(t), f"{o:.8f}", f"{max(o, c) * 1.002:.8f}", f"{min(o, c) * 0.998:.8f}", f"{c:.8f}", "1000.0", int(t) + interval_ms - 1]
+            for t, o, c in zip(open_times.tolist(), opens.tolist(), closes.tolist())]
+
+def synthetic_ticker(symbol):
+    now_ms = int(time.time() * 1000)
+    price = float(synthetic_closes(symbol, [now_ms], 60_000)[0])
+    return {'symbol': symbol, 'lastPrice': f"{price:.8f}", 'priceChangePercent': f"{(zlib.crc32(symbol.encode()) % 2000) / 100 - 10:.2f}"}
+
+def synthetic_market(cg_id):
+    seed = zlib.crc32(cg_id.encode())
+    return {'id': cg_id, 'symbol': cg_id[:4], 'current_price': 1 + seed % 1000, 'market_cap': 1e6 * (1 + seed % 10_000),
+            'fully_diluted_valuation': 1.5e6 * (1 + seed % 10_000), 'price_change_percentage_24h_in_currency': (seed % 2000) / 100 - 10}
+
+# --- Servidor HTTP local ---
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Imita os endpoints REST usados pelo MonitorService; `server.latency` simula o tempo de rede."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # cabeçalho e corpo saem em escritas separadas
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if self.server.latency: time.sleep(self.server.latency)
+        if parts.path == "/api/v3/klines":
+            start = int(params['startTime']) if 'startTime' in params else None
+            body = synthetic_klines(params['symbol'], params.get('interval', '1d'), int(params.get('limit', 500)), start)
+        elif parts.path == "/api/v3/ticker/24hr":
+            body = [synthetic_ticker(s) for s in json.loads(params.get('symbols', '[]'))]
+        elif parts.path == "/api/v3/coins/markets":
+            body = [synthetic_market(cg_id) for cg_id in params.get('ids', '').split(',') if cg_id]
+        else:
+            self.send_error(404); return
+        payload = json.dumps(body, separators=(',', ':')).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(payload)))
+        self.end_headers(); self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer:
+    def __init__(self, latency=0.0):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self.httpd.daemon_threads = True; self.httpd.latency = latency
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start(); return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown(); self.httpd.server_close()
+
+class LocalHttpClient(HttpClient):
+    """HttpClient que envia as chamadas da Binance e da CoinGecko para o servidor local.
+
+    O host passa a ser 127.0.0.1, então os limites por host (pensados para as APIs reais) não se aplicam.
+    """
+    def __init__(self, base_url, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def get(self, url, **kwargs):
+        parts = urlsplit(url)
+        return super().get(f"{self.base_url}{parts.path}" + (f"?{parts.query}" if parts.query else ""), **kwargs)
+
+# --- Medições ---
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {'median': statistics.median(samples), 'min': samples[0], 'max': samples[-1], 'runs': len(samples)}
+
+def _time_calls(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat): fn()
+    return (time.perf_counter() - started) / repeat
+
+def _make_config(n_symbols, timeframes):
+    binance = [f"BENCH{i:04d}USDT" for i in range(n_symbols - n_symbols // 10)]
+    coingecko = [f"bench-coin-{i:04d}" for i in range(n_symbols // 10)]
+    cryptos = []
+    for i, symbol in enumerate(binance):
+        alerts = [{'type': 'status', 'value': "SOBRECOMPRADO (RSI >= 70)", 'timeframe': timeframes[i % len(timeframes)]},
+                  {'type': 'status', 'value': "MACD: Cruzamento de Alta", 'timeframe': timeframes[0]},
+                  {'type': 'high', 'price': float(synthetic_closes(symbol, [0], 60_000)[0]) * 1.1}]
+        cryptos.append({'symbol': symbol, 'alerts': alerts})
+    cryptos += [{'symbol': cg_id, 'alerts': [{'type': 'low', 'price': 1.0}]} for cg_id in coingecko]
+    config = {"telegram_bot_token": "SEU_TOKEN_AQUI", "telegram_chat_id": "SEU_CHAT_ID_AQUI", "check_interval_seconds": 300,
+              "timeframes": list(timeframes), "display_timeframe": timeframes[0], "streaming_mode": False, "cryptos_to_monitor": cryptos}
+    return config, binance, coingecko
+
+def _ui_diff_stage(rows, rendered, timeframe):
+    """Etapa de UI sem o Tk: monta as views (build_row_view) e calcula as células alteradas, como _apply_row_views."""
+    started = time.perf_counter()
+    for row in rows:
+        values, tags = build_row_view(row, timeframe)
+        if values is None: continue
+        previous = rendered.get(row['symbol'], ((), None))[0]
+        [k for k, (old, new) in enumerate(zip(previous, values)) if old != new]
+        rendered[row['symbol']] = (values, tags)
+    return time.perf_counter() - started
+
+def _matrix_stage(service, symbols):
+    """Montagem da matriz de fechamentos (reamostragem + empacotamento), separada do cálculo dos indicadores."""
+    store, base = service.candle_store, service.candle_store.interval
+    candles = {s: store.get_candles(s) for s in symbols}
+    started = time.perf_counter()
+    matrices = []
+    for timeframe in service.timeframes:
+        closes = [resample_candles(candles[s], base, timeframe)[-INDICATOR_CANDLES:, CLOSE] for s in symbols if candles[s] is not None]
+        matrices.append(pack_close_matrix(closes))
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    for matrix, lengths in matrices: compute_indicator_matrix(matrix, lengths)
+    return built, time.perf_counter() - started
+
+def bench_cycle(n_symbols, server, timeframes, warm_cycles):
+    """Executa um ciclo frio (cache vazio) e `warm_cycles` ciclos quentes com `n_symbols` símbolos."""
+    config, binance, coingecko = _make_config(n_symbols, timeframes)
+    with tempfile.TemporaryDirectory(prefix="bench_cycle_") as base_path:
+        with open(os.path.join(base_path, "config.json"), 'w', encoding='utf-8') as f: json.dump(config, f)
+        service = MonitorService(base_path=base_path)
+        service.http.close()
+        service.http = LocalHttpClient(server.base_url, pool_size=KLINE_FETCH_WORKERS + 2)
+        universe = service.symbol_universe
+        universe.binance_symbols, universe.coingecko_coins = binance, [(cg_id, cg_id.upper()) for cg_id in coingecko]
+        universe.fetched_at = time.time()
+        service._apply_symbol_universe()
+        service.load_config()
+        try:
+            cycles, rendered = [], {}
+            for run in range(warm_cycles + 1):
+                started = time.perf_counter()
+                rows = service.run_cycle()
+                elapsed = time.perf_counter() - started
+                stats = dict(service.last_cycle_stats)
+                ui = _ui_diff_stage(rows, rendered, service.display_timeframe)
+                matrix, indicators = _matrix_stage(service, binance)
+                cycles.append({'cycle': elapsed, 'fetch': stats['fetch'], 'indicators': stats['indicators'],
+                               'alerts': stats['alerts'], 'matrix_build': matrix, 'indicator_math': indicators, 'ui_apply': ui,
+                               'errors': sum(1 for row in rows if row['error'])})
+            requests_total = sum(s['requests'] for s in service.http.metrics().values())
+        finally:
+            service.stop()
+    cold, warm = cycles[0], cycles[1:]
+    result = {'symbols': n_symbols, 'binance_symbols': len(binance), 'coingecko_ids': len(coingecko),
+              'http_requests': requests_total, 'cold': cold, 'warm': {}}
+    for stage in cold:
+        if stage == 'errors': continue
+        if warm: result['warm'][stage] = _summary([c[stage] for c in warm])
+    return result
+
+def bench_indicator_functions(candles=INDICATOR_CANDLES, repeat=200):
+    """Custo por chamada das funções calculate_* (pandas) e do caminho vetorizado usado no ciclo."""
+    closes = synthetic_closes("BENCHUSDT", np.arange(candles) * 86_400_000, 86_400_000)
+    results = {'compute_signal_table_per_symbol': {}}
+    for batch in (1, 100, 1000):
+        series = [closes] * batch
+        per_call = _time_calls(lambda: compute_signal_table(list(range(batch)), series, [closes[-1]] * batch), max(1, repeat // batch))
+        results['compute_signal_table_per_symbol'][str(batch)] = per_call / batch
+    df = pd.DataFrame({'close': closes})
+    results['dataframe_build'] = _time_calls(lambda: pd.DataFrame({'close': closes}), repeat)
+    for name, fn in (('calculate_rsi', calculate_rsi), ('calculate_bollinger_bands', calculate_bollinger_bands),
+                     ('calculate_macd', calculate_macd), ('calculate_emas', calculate_emas)):
+        results[name] = _time_calls(lambda: fn(df), repeat)
+    return results
+
+# --- Relatório ---
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Imprime a variação das medianas quentes e das funções em relação a `baseline`."""
+    previous = {r['symbols']: r for r in baseline.get('cycle', [])}
+    for r in results['cycle']:
+        old = previous.get(r['symbols'])
+        if not old: continue
+        for stage, summary in r['warm'].items():
+            before = old['warm'].get(stage, {}).get('median')
+            if not before: continue
+            change = summary['median'] / before - 1
+            flag = "  <-- REGRESSÃO" if change > threshold else ""
+            print(f"{r['symbols']:>5} símbolos {stage:<15} {before * 1000:9.2f} ms -> {summary['median'] * 1000:9.2f} ms ({change:+.0%}){flag}")
+    for name, value in results['indicators'].items():
+        before = baseline.get('indicators', {}).get(name)
+        if isinstance(value, float) and isinstance(before, float) and before:
+            change = value / before - 1
+            flag = "  <-- REGRESSÃO" if change > threshold else ""
+            print(f"{name:<32} {before * 1e6:9.1f} µs -> {value * 1e6:9.1f} µs ({change:+.0%}){flag}")
+
+def print_results(results):
+    for r in results['cycle']:
+        warm = r['warm']
+        stages = ", ".join(f"{stage}: {summary['median'] * 1000:.1f} ms" for stage, summary in warm.items())
+        print(f"{r['symbols']:>5} símbolos | frio: {r['cold']['cycle']:.2f}s | quente (mediana) {stages}")
+    for name, value in results['indicators'].items():
+        if isinstance(value, float): print(f"{name:<32} {value * 1e6:9.1f} µs/chamada")
+        elif isinstance(value, dict): print(f"{name:<32} " + ", ".join(f"lote {k}: {v * 1e6:.1f} µs" for k, v in value.items()))
+        else: print(f"{name:<32} {value}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do ciclo de monitoramento e das funções de indicadores.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help="tamanhos de watchlist (padrão: 10 100 1000)")
+    parser.add_argument('--warm-cycles', type=int, default=DEFAULT_WARM_CYCLES, help="ciclos quentes por tamanho")
+    parser.add_argument('--timeframes', nargs='+', default=['1d'], help="timeframes configurados nos alertas")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="atraso simulado por resposta do servidor local")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="arquivo JSON de resultados")
+    parser.add_argument('--baseline', help="JSON de uma execução anterior para comparação")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+    results = {'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"), 'python': platform.python_version(), 'numpy': np.__version__,
+               'platform': platform.platform(), 'params': {'sizes': args.sizes, 'warm_cycles': args.warm_cycles,
+                                                           'timeframes': args.timeframes, 'latency_ms': args.latency_ms},
+               'cycle': []}
+    with StandInServer(latency=args.latency_ms / 1000) as server:
+        for size in args.sizes: results['cycle'].append(bench_cycle(size, server, args.timeframes, args.warm_cycles))
+    results['indicators'] = bench_indicator_functions()
+
+    print_results(results)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f: compare(results, json.load(f))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f: json.dump(results, f, indent=2)
+    print(f"Resultados gravados em '{args.output}'.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
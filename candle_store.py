@@ -0,0 +1,151 @@
+import os
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger("monitor")
+
+# --- Cache Incremental de Candles (klines) ---
+
+INTERVAL_MS = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000, '8h': 28_800_000,
+    '12h': 43_200_000, '1d': 86_400_000, '3d': 259_200_000, '1w': 604_800_000,
+}
+CANDLE_FIELDS = ('open_time', 'open', 'high', 'low', 'close', 'volume')
+OPEN_TIME, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(CANDLE_FIELDS))
+MAX_KLINES_PER_REQUEST = 1000
+# Margem para o relógio local: um candle só é considerado fechado (e persistido)
+# quando o seu horário de fechamento ficou claramente para trás.
+CLOCK_MARGIN_MS = 5_000
+
+# Candles semanais da Binance abrem na segunda-feira; 01/01/1970 foi uma quinta-feira.
+INTERVAL_OFFSET_MS = {'1w': 4 * 86_400_000}
+
+def klines_to_array(klines):
+    """Converte a resposta JSON de /klines em uma matriz float64 (n, 6) com OHLCV."""
+    if not klines: return np.empty((0, len(CANDLE_FIELDS)), dtype=np.float64)
+    return np.array([k[:len(CANDLE_FIELDS)] for k in klines], dtype=np.float64)
+
+def is_multiple_of(interval, base_interval):
+    """True se `interval` pode ser montado somando candles de `base_interval`."""
+    if INTERVAL_MS[interval] % INTERVAL_MS[base_interval]: return False
+    return INTERVAL_OFFSET_MS.get(interval, 0) % INTERVAL_MS[base_interval] == 0
+
+def resample_candles(candles, base_interval, interval):
+    """Agrega candles de `base_interval` em candles de `interval` (OHLCV), localmente.
+
+    O primeiro grupo é descartado se começar no meio do período (histórico incompleto);
+    o último grupo pode ser parcial e representa o candle ainda aberto do timeframe maior.
+    """
+    if interval == base_interval or candles is None or not len(candles): return candles
+    period, offset = INTERVAL_MS[interval], INTERVAL_OFFSET_MS.get(interval, 0)
+    open_times = candles[:, OPEN_TIME].astype(np.int64)
+    keys = (open_times - offset) // period
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    if keys[0] * period + offset != open_times[0]: starts = starts[1:]
+    if not len(starts): return klines_to_array([])
+    ends = np.append(starts[1:], len(candles)) - 1
+    out = np.empty((len(starts), len(CANDLE_FIELDS)), dtype=np.float64)
+    out[:, OPEN_TIME] = keys[starts] * period + offset
+    out[:, OPEN] = candles[starts, OPEN]
+    out[:, HIGH] = np.maximum.reduceat(candles[starts[0]:, HIGH], starts - starts[0])
+    out[:, LOW] = np.minimum.reduceat(candles[starts[0]:, LOW], starts - starts[0])
+    out[:, CLOSE] = candles[ends, CLOSE]
+    out[:, VOLUME] = np.add.reduceat(candles[starts[0]:, VOLUME], starts - starts[0])
+    return out
+
+class CandleStore:
+    """Guarda o histórico de candles fechados por símbolo e o persiste em um arquivo .npz.
+
+    Só o candle aberto (e eventuais candles recém-fechados) precisa ser baixado a cada
+    ciclo; o histórico fechado é reaproveitado entre ciclos e entre execuções.
+    """
+    def __init__(self, path, interval='1d', max_candles=300):
+        self.path, self.interval, self.max_candles = path, interval, max_candles
+        self.interval_ms = INTERVAL_MS[interval]
+        self.lock = threading.Lock()
+        self.closed = {}
+        self.open_rows = {}
+        self.dirty = False
+        self.backfilled = set()
+        self.load()
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                self.closed = {symbol: data[symbol] for symbol in data.files}
+        except FileNotFoundError: pass
+        except Exception as e: logger.warning(f"Aviso: cache de candles '{self.path}' ignorado. {e}")
+
+    def save(self):
+        with self.lock:
+            if not self.dirty: return
+            snapshot = dict(self.closed); self.dirty = False
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f: np.savez_compressed(f, **snapshot)
+            os.replace(tmp_path, self.path)
+        except Exception as e: logger.error(f"--> Erro ao salvar cache de candles: {e}")
+
+    def build_request(self, symbol, now_ms=None):
+        """Retorna os parâmetros (startTime/limit) da próxima busca de klines do símbolo."""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        history = self.closed.get(symbol)
+        if history is None or not len(history): return self.backfill_request(now_ms)
+        # Histórico mais curto que o necessário (ex.: max_candles aumentou): completa uma vez por sessão.
+        if len(history) + 1 < self.max_candles and symbol not in self.backfilled:
+            self.backfilled.add(symbol); return self.backfill_request(now_ms)
+        next_open = int(history[-1, OPEN_TIME]) + self.interval_ms
+        expected = max(0, (now_ms - next_open) // self.interval_ms) + 1
+        if expected >= self.max_candles: return self.backfill_request(now_ms)
+        return {'start_time': next_open, 'limit': expected + 1}
+
+    def backfill_request(self, now_ms):
+        """Busca completa do histórico; acima de MAX_KLINES_PER_REQUEST é paginada a partir de start_time."""
+        if self.max_candles <= MAX_KLINES_PER_REQUEST: return {'limit': self.max_candles}
+        current_open = now_ms // self.interval_ms * self.interval_ms
+        return {'start_time': current_open - (self.max_candles - 1) * self.interval_ms, 'limit': self.max_candles}
+
+    def merge(self, symbol, klines, now_ms=None):
+        """Incorpora as klines recebidas: candles fechados vão para o histórico, o resto fica como candle aberto."""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        rows = klines_to_array(klines)
+        is_closed = np.array([int(k[6]) < now_ms - CLOCK_MARGIN_MS for k in klines], dtype=bool)
+        new_closed, open_rows = rows[is_closed], rows[~is_closed]
+        with self.lock:
+            history = self.closed.get(symbol)
+            if len(new_closed):
+                if history is not None and len(history):
+                    history = history[history[:, OPEN_TIME] < new_closed[0, OPEN_TIME]]
+                    new_closed = np.concatenate([history, new_closed])
+                self.closed[symbol] = new_closed[-self.max_candles:]
+                self.dirty = True
+            self.open_rows[symbol] = open_rows
+
+    def get_closed(self, symbol):
+        """Retorna o histórico de candles fechados do símbolo (matriz (n, 6), possivelmente vazia)."""
+        with self.lock: history = self.closed.get(symbol)
+        return history if history is not None else klines_to_array([])
+
+    def get_open(self, symbol):
+        """Retorna os candles ainda abertos do símbolo recebidos na última busca."""
+        with self.lock: open_rows = self.open_rows.get(symbol)
+        return open_rows if open_rows is not None else klines_to_array([])
+
+    def get_candles(self, symbol):
+        """Retorna os últimos `max_candles` candles do símbolo (fechados + aberto) como matriz (n, 6)."""
+        with self.lock:
+            history = self.closed.get(symbol)
+            open_rows = self.open_rows.get(symbol)
+        parts = [p for p in (history, open_rows) if p is not None and len(p)]
+        if not parts: return None
+        return np.concatenate(parts)[-self.max_candles:]
+
+    def discard(self, symbols_to_keep):
+        """Remove do cache os símbolos que não são mais monitorados."""
+        with self.lock:
+            for symbol in set(self.closed) - set(symbols_to_keep):
+                del self.closed[symbol]; self.dirty = True
+            for symbol in set(self.open_rows) - set(symbols_to_keep): del self.open_rows[symbol]
@@ -0,0 +1,142 @@
+import copy
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("monitor")
+
+# --- Persistência do config.json ---
+
+SAVE_DEBOUNCE_SECONDS = 0.5    # edições em sequência dentro deste intervalo viram uma única gravação
+SAVE_MAX_DELAY_SECONDS = 3.0   # ...mas nenhuma edição espera mais do que isto para ir ao disco
+WATCH_INTERVAL_SECONDS = 2.0
+RUNTIME_KEYS = ('triggered_now',)  # estado de execução gravado nos alertas, nunca persistido
+
+def strip_runtime_keys(config):
+    """Cópia do config sem o estado de execução dos alertas."""
+    clean = dict(config)
+    clean['cryptos_to_monitor'] = [{**crypto, 'alerts': [{k: v for k, v in alert.items() if k not in RUNTIME_KEYS}
+                                                         for alert in crypto.get('alerts', [])]}
+                                   for crypto in config.get('cryptos_to_monitor', [])]
+    return clean
+
+class ConfigStore:
+    """Grava o config.json de forma atômica e agrupada e recarrega edições externas do arquivo.
+
+    `save(config)` tira um snapshot do config sob `lock` (o mesmo lock de quem altera os alertas em
+    outra thread, como o AlertEngine com 'triggered_now') e agenda a gravação: edições seguidas são
+    agrupadas e gravadas uma vez, via arquivo temporário + os.replace. A mesma thread verifica o
+    arquivo a cada `watch_interval` segundos; uma alteração feita por outro programa é lida e
+    entregue a `on_reload(config)`. As gravações do próprio store não disparam recarga.
+    """
+    def __init__(self, path, lock=None, on_reload=None, debounce=SAVE_DEBOUNCE_SECONDS, max_delay=SAVE_MAX_DELAY_SECONDS,
+                 watch_interval=WATCH_INTERVAL_SECONDS):
+        self.path = path
+        self.lock = lock or threading.Lock()
+        self.on_reload = on_reload
+        self.debounce, self.max_delay, self.watch_interval = debounce, max_delay, watch_interval
+        self.state_lock = threading.Lock()
+        self.pending_text = None; self.pending_since = None; self.pending_due = None
+        self.known_signature = None    # (mtime_ns, tamanho) do arquivo como o store o conhece
+        self.known_text = None
+        self.last_error = None
+        self.writes = 0
+        self.wake_event = threading.Event(); self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="config-store")
+
+    def start(self):
+        if not self.thread.is_alive(): self.thread.start()
+
+    def stop(self):
+        """Grava o que estiver pendente e encerra a thread."""
+        self.stop_event.set(); self.wake_event.set()
+        if self.thread.is_alive(): self.thread.join(timeout=5)
+        self.flush()
+
+    def load(self):
+        """Lê o config.json. Propaga FileNotFoundError e json.JSONDecodeError."""
+        with open(self.path, 'r', encoding='utf-8') as f: text = f.read()
+        config = json.loads(text)
+        with self.state_lock: self.known_text, self.known_signature = text, self._signature()
+        return config
+
+    def save(self, config):
+        """Agenda a gravação de um snapshot de `config` (o arquivo é escrito pela thread do store)."""
+        with self.lock: snapshot = copy.deepcopy(config)
+        text = json.dumps(strip_runtime_keys(snapshot), indent=2, ensure_ascii=False)
+        now = time.monotonic()
+        with self.state_lock:
+            if self.pending_text is None: self.pending_since = now
+            self.pending_text = text
+            self.pending_due = min(now + self.debounce, self.pending_since + self.max_delay)
+        self.wake_event.set()
+
+    def flush(self):
+        """Grava imediatamente o snapshot pendente; retorna False se a gravação falhou."""
+        with self.state_lock:
+            text, self.pending_text, self.pending_since, self.pending_due = self.pending_text, None, None, None
+        if text is None: return True
+        return self._write(text)
+
+    # --- Gravação e observação do arquivo ---
+
+    def _write(self, text):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text); f.flush(); os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"--> Erro ao salvar 'config.json': {e}")
+            with self.state_lock:
+                self.last_error = str(e)
+                # Mantém o snapshot para uma nova tentativa, a menos que outro mais novo já tenha chegado.
+                if self.pending_text is None:
+                    self.pending_text, self.pending_since = text, time.monotonic()
+                    self.pending_due = self.pending_since + self.watch_interval
+            return False
+        with self.state_lock:
+            self.known_text, self.known_signature, self.last_error = text, self._signature(), None
+            self.writes += 1
+        return True
+
+    def _signature(self):
+        try: stat = os.stat(self.path)
+        except OSError: return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _run(self):
+        next_check = time.monotonic() + self.watch_interval
+        while not self.stop_event.is_set():
+            with self.state_lock: due = self.pending_due
+            now = time.monotonic()
+            if due is not None and now >= due: self.flush(); continue
+            if now >= next_check:
+                next_check = now + self.watch_interval
+                if due is None: self._check_external_change()
+                continue
+            self.wake_event.wait(min(next_check, due if due is not None else next_check) - now)
+            self.wake_event.clear()
+
+    def _check_external_change(self):
+        signature = self._signature()
+        with self.state_lock:
+            if signature is None or signature == self.known_signature: return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: text = f.read()
+            config = json.loads(text)
+        except (OSError, json.JSONDecodeError) as e:
+            # Arquivo em edição ou inválido: mantém o config atual e tenta de novo na próxima alteração.
+            logger.warning(f"Aviso: 'config.json' alterado externamente, mas não pôde ser lido ({e}).")
+            with self.state_lock: self.known_signature = signature
+            return
+        with self.state_lock:
+            unchanged = text == self.known_text
+            self.known_text, self.known_signature = text, signature
+        if unchanged or not isinstance(config, dict): return
+        logger.info("'config.json' alterado externamente; recarregando.")
+        if self.on_reload:
+            try: self.on_reload(config)
+            except Exception: logger.exception("--> Erro ao recarregar 'config.json'")
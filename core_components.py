@@ -1,20 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
-import sys
-import winsound
 import ttkbootstrap as ttkb
-import pandas as pd
+from app_paths import get_application_path
+from alert_engine import DEFAULT_TIMEFRAME, TIMEFRAME_OPTIONS
+from symbol_search import SymbolSearchIndex, SEARCH_DEBOUNCE_MS
+
+SYMBOL_SUGGESTIONS_LIMIT = 100
 
 # --- Funções Auxiliares de UI e Sistema ---
 
-def get_application_path():
-    """Retorna o caminho do diretório da aplicação, seja executável ou script."""
-    if getattr(sys, 'frozen', False):
-        application_path = os.path.dirname(sys.executable)
-    else:
-        application_path = os.path.dirname(os.path.abspath(__file__))
-    return application_path
+def update_listbox(listbox, items):
+    """Atualiza o Listbox para `items` alterando só o trecho que difere do conteúdo atual."""
+    current = listbox.get(0, tk.END)
+    common = 0
+    for old, new in zip(current, items):
+        if old != new: break
+        common += 1
+    if common < len(current): listbox.delete(common, tk.END)
+    if common < len(items): listbox.insert(tk.END, *items[common:])
+
+def search_index_for(parent_app, symbols):
+    """Índice de busca compartilhado do app (construído ao carregar o universo) ou um novo para `symbols`."""
+    index = getattr(parent_app, 'symbol_search_index', None)
+    return index if index is not None and len(index) else SymbolSearchIndex(symbols)
 
 class Tooltip:
     """Cria um balão de ajuda (tooltip) para um widget."""
@@ -42,47 +51,6 @@ class Tooltip:
             self.tooltip_window.destroy()
         self.tooltip_window = None
 
-# --- Funções de Análise Técnica ---
-
-def calculate_rsi(df, period=14):
-    if df.empty or len(df) < period + 1: return 0
-    delta = df['close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-    if loss.iloc[-1] == 0: return 100
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi.iloc[-1]
-
-def calculate_bollinger_bands(df, period=20, std_dev=2):
-    if df.empty or len(df) < period: return 0, 0
-    sma = df['close'].rolling(window=period).mean().iloc[-1]
-    std = df['close'].rolling(window=period).std().iloc[-1]
-    if pd.isna(sma) or pd.isna(std): return 0, 0
-    upper_band = sma + (std * std_dev)
-    lower_band = sma - (std * std_dev)
-    return upper_band, lower_band
-
-def calculate_macd(df, fast=12, slow=26, signal=9):
-    if len(df) < slow: return "N/A"
-    exp1 = df['close'].ewm(span=fast, adjust=False).mean()
-    exp2 = df['close'].ewm(span=slow, adjust=False).mean()
-    macd = exp1 - exp2
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    if macd.iloc[-2] < signal_line.iloc[-2] and macd.iloc[-1] > signal_line.iloc[-1]:
-        return "Cruzamento de Alta"
-    elif macd.iloc[-2] > signal_line.iloc[-2] and macd.iloc[-1] < signal_line.iloc[-1]:
-        return "Cruzamento de Baixa"
-    return "Nenhum"
-
-def calculate_emas(df, periods=[50, 200]):
-    if df.empty: return {}
-    emas = {}
-    for period in periods:
-        if len(df) >= period:
-            emas[period] = df['close'].ewm(span=period, adjust=False).mean()
-    return emas
-
 # --- Janela de Configuração de Alertas ---
 
 class AlertConfigDialog(ttkb.Toplevel):
@@ -92,6 +60,8 @@ class AlertConfigDialog(ttkb.Toplevel):
         self.geometry("800x450"); self.transient(self.master); self.grab_set()
         
         self.all_symbols = all_symbols
+        self.search_index = search_index_for(parent_app, all_symbols)
+        self.search_job = None
         main_frame = ttkb.Frame(self, padding="10"); main_frame.pack(expand=True, fill="both")
         common_frame = ttkb.Frame(main_frame); common_frame.pack(fill='x', pady=(0, 10))
         self.specific_frame = ttkb.Frame(main_frame); self.specific_frame.pack(fill='x', pady=5)
@@ -139,14 +109,18 @@ class AlertConfigDialog(ttkb.Toplevel):
         self.parent_app.center_toplevel_on_main(self)
 
     def update_symbol_list(self, event=None):
-        search_term = self.symbol_var.get().upper()
-        self.symbol_listbox.delete(0, tk.END)
-        if search_term:
-            matches = [s for s in self.all_symbols if search_term in s.upper()][:100]
-            if matches:
-                for match in matches: self.symbol_listbox.insert(tk.END, match)
+        # Debounce: só consulta o índice quando a digitação pausa.
+        if self.search_job: self.after_cancel(self.search_job)
+        self.search_job = self.after(SEARCH_DEBOUNCE_MS, self._run_symbol_search)
+
+    def _run_symbol_search(self):
+        self.search_job = None
+        search_term = self.symbol_var.get().strip()
+        matches = self.search_index.search(search_term, limit=SYMBOL_SUGGESTIONS_LIMIT) if search_term else []
+        if matches:
+            update_listbox(self.symbol_listbox, matches)
+            if not self.symbol_listbox.winfo_ismapped():
                 self.symbol_listbox.pack(fill="x", expand=True, before=self.symbol_entry.master.pack_slaves()[-1])
-            else: self.hide_symbol_list()
         else: self.hide_symbol_list()
 
     def on_symbol_select(self, event=None):
@@ -177,6 +151,10 @@ class AlertConfigDialog(ttkb.Toplevel):
             self.status_value_var = ttkb.StringVar(value=alert_data.get('value', status_options[0]) if alert_data else status_options[0])
             self.status_value_combo = ttkb.Combobox(self.specific_frame, textvariable=self.status_value_var, values=status_options, state="readonly")
             self.status_value_combo.grid(row=0, column=1, sticky="ew", pady=5)
+            ttkb.Label(self.specific_frame, text="Timeframe:").grid(row=1, column=0, sticky="w", pady=5)
+            self.timeframe_var = ttkb.StringVar(value=alert_data.get('timeframe', DEFAULT_TIMEFRAME) if alert_data else DEFAULT_TIMEFRAME)
+            self.timeframe_combo = ttkb.Combobox(self.specific_frame, textvariable=self.timeframe_var, values=list(TIMEFRAME_OPTIONS), state="readonly")
+            self.timeframe_combo.grid(row=1, column=1, sticky="ew", pady=5)
         self.specific_frame.columnconfigure(1, weight=1)
     
     def browse_sound_file(self):
@@ -189,10 +167,8 @@ class AlertConfigDialog(ttkb.Toplevel):
         sound_path_str = self.sound_var.get()
         if not sound_path_str: messagebox.showwarning("Aviso", "Nenhum arquivo de som selecionado.", parent=self); return
         sound_path = sound_path_str if os.path.isabs(sound_path_str) else os.path.join(get_application_path(), sound_path_str)
-        if os.path.exists(sound_path):
-            try: winsound.PlaySound(sound_path, winsound.SND_FILENAME | winsound.SND_ASYNC)
-            except Exception as e: messagebox.showerror("Erro", f"Não foi possível tocar o som:\n{e}", parent=self)
-        else: messagebox.showerror("Erro", "Arquivo de som não encontrado.", parent=self)
+        if not os.path.exists(sound_path): messagebox.showerror("Erro", "Arquivo de som não encontrado.", parent=self)
+        elif not self.parent_app.audio.preview(sound_path): messagebox.showerror("Erro", "Não foi possível tocar o som (veja o log).", parent=self)
     
     def on_save(self):
         symbol = self.symbol_var.get().strip()
@@ -202,7 +178,7 @@ class AlertConfigDialog(ttkb.Toplevel):
             price = self.price_var.get()
             if price <= 0: messagebox.showerror("Erro", "O 'Preço Alvo' deve ser > 0.", parent=self); return
             self.result.update({"type": self.price_type_var.get(), "price": price})
-        else: self.result.update({"type": "status", "value": self.status_value_var.get()})
+        else: self.result.update({"type": "status", "value": self.status_value_var.get(), "timeframe": self.timeframe_var.get()})
         self.destroy()
 
 # --- Janela de Gerenciador de Alertas ---
@@ -277,7 +253,7 @@ class AlertManagerWindow(ttkb.Toplevel):
             if crypto['symbol'] == symbol:
                 for alert in crypto.get("alerts", []):
                     alert_type_str = "Preço" if alert['type'] in ['high', 'low'] else "Análise Técnica"
-                    condition = f"{'Maior que' if alert['type'] == 'high' else 'Menor que'} ${alert.get('price', 0):,.2f}" if alert_type_str == "Preço" else alert.get('value', '')
+                    condition = f"{'Maior que' if alert['type'] == 'high' else 'Menor que'} ${alert.get('price', 0):,.2f}" if alert_type_str == "Preço" else f"{alert.get('value', '')} [{alert.get('timeframe', DEFAULT_TIMEFRAME)}]"
                     iid = str(alert_id_counter)
                     self.alerts_tree.insert('', tk.END, iid=iid, values=(alert_type_str, condition, alert.get('notes', '')))
                     self.alert_map[iid] = alert
@@ -370,6 +346,9 @@ class ManageSymbolsDialog(ttkb.Toplevel):
         self.geometry("800x600")
         self.transient(self.master)
         self.grab_set()
+        # Estado das listas antes dos widgets: os traces das buscas já disparam ao criar os placeholders.
+        self.search_index = search_index_for(self.parent_app, self.parent_app.all_symbols_list)
+        self.monitored_set = {crypto['symbol'] for crypto in self.parent_app.config.get("cryptos_to_monitor", [])}
 
         main_frame = ttkb.Frame(self, padding=10)
         main_frame.pack(expand=True, fill='both')
@@ -377,7 +356,8 @@ class ManageSymbolsDialog(ttkb.Toplevel):
         left_frame = ttkb.LabelFrame(main_frame, text="Moedas Disponíveis", padding=10)
         left_frame.pack(side='left', fill='both', expand=True, padx=(0, 5))
         self.available_search_var = ttkb.StringVar()
-        self.available_search_var.trace_add("write", self._filter_available)
+        self.available_search_var.trace_add("write", self._schedule_filter_available)
+        self.filter_job = None
         self.available_entry = ttkb.Entry(left_frame, textvariable=self.available_search_var)
         self.available_entry.pack(fill='x', pady=(0, 5))
         self.available_listbox = tk.Listbox(left_frame, selectmode='extended', exportselection=False)
@@ -422,69 +402,57 @@ class ManageSymbolsDialog(ttkb.Toplevel):
             widget.insert(0, widget.placeholder); widget.config(foreground=widget.p_color)
             
     def _populate_lists(self):
-        self.all_symbols_master = sorted(self.parent_app.all_symbols_list)
-        monitored_symbols = {crypto['symbol'] for crypto in self.parent_app.config.get("cryptos_to_monitor", [])}
-        self.available_listbox.delete(0, tk.END); self.monitored_listbox.delete(0, tk.END)
-        for symbol in self.all_symbols_master:
-            if symbol not in monitored_symbols: self.available_listbox.insert(tk.END, symbol)
-        for symbol in sorted(list(monitored_symbols)): self.monitored_listbox.insert(tk.END, symbol)
+        self._filter_monitored()
+        self._filter_available()
+
+    def _schedule_filter_available(self, *args):
+        if self.filter_job: self.after_cancel(self.filter_job)
+        self.filter_job = self.after(SEARCH_DEBOUNCE_MS, self._filter_available)
         
     def _filter_available(self, *args):
-        search_term = self.available_search_var.get().upper()
-        self.available_listbox.delete(0, tk.END)
-        monitored_symbols = set(self.monitored_listbox.get(0, tk.END))
-        if search_term == "BUSCAR DISPONÍVEIS...":
-            for symbol in self.all_symbols_master:
-                if symbol not in monitored_symbols: self.available_listbox.insert(tk.END, symbol)
-            return
-        for symbol in self.all_symbols_master:
-            if search_term in symbol.upper() and symbol not in monitored_symbols:
-                self.available_listbox.insert(tk.END, symbol)
+        self.filter_job = None
+        search_term = self.available_search_var.get()
+        if search_term == self.available_entry.placeholder: search_term = ""
+        update_listbox(self.available_listbox, self.search_index.search(search_term, exclude=self.monitored_set))
             
     def _filter_monitored(self, *args):
-        search_term = self.monitored_search_var.get().upper()
-        monitored_symbols = sorted([crypto['symbol'] for crypto in self.parent_app.config.get("cryptos_to_monitor", [])])
-        self.monitored_listbox.delete(0, tk.END)
-        if search_term == "BUSCAR MONITORADAS...":
-             for symbol in monitored_symbols: self.monitored_listbox.insert(tk.END, symbol)
-             return
-        for symbol in monitored_symbols:
-            if search_term in symbol.upper(): self.monitored_listbox.insert(tk.END, symbol)
+        search_term = self.monitored_search_var.get()
+        if search_term == self.monitored_entry.placeholder: search_term = ""
+        search_term = search_term.upper()
+        update_listbox(self.monitored_listbox, [s for s in sorted(self.monitored_set) if search_term in s.upper()])
             
     def _add_symbols(self):
         selected_indices = self.available_listbox.curselection();
         if not selected_indices: return
         symbols_to_move = [self.available_listbox.get(i) for i in selected_indices]
         for i in sorted(selected_indices, reverse=True): self.available_listbox.delete(i)
-        current_monitored = self.monitored_listbox.get(0, tk.END)
-        for symbol in symbols_to_move:
-            if symbol not in current_monitored: self.monitored_listbox.insert(tk.END, symbol)
+        self.monitored_set.update(symbols_to_move)
+        self._filter_monitored()
         
     def _remove_symbols(self):
         selected_indices = self.monitored_listbox.curselection()
         if not selected_indices: return
         symbols_to_move = [self.monitored_listbox.get(i) for i in selected_indices]
         for i in sorted(selected_indices, reverse=True): self.monitored_listbox.delete(i)
-        current_available = self.available_listbox.get(0, tk.END)
-        for symbol in symbols_to_move:
-            if symbol not in current_available: self.available_listbox.insert(tk.END, symbol)
-        all_available = sorted(self.available_listbox.get(0, tk.END))
-        self.available_listbox.delete(0, tk.END)
-        for symbol in all_available: self.available_listbox.insert(tk.END, symbol)
+        self.monitored_set.difference_update(symbols_to_move)
+        self._filter_monitored()
+        self._filter_available()
         
     def on_save(self):
-        new_monitored_symbols = set(self.monitored_listbox.get(0, tk.END))
+        # A lista da direita pode estar filtrada pela busca: o conjunto completo é monitored_set.
+        new_monitored_symbols = set(self.monitored_set)
         new_config_list = []
         for crypto in self.parent_app.config["cryptos_to_monitor"]:
             if crypto['symbol'] in new_monitored_symbols: new_config_list.append(crypto)
         existing_symbols_in_new_list = {c['symbol'] for c in new_config_list}
-        for symbol in new_monitored_symbols:
+        for symbol in sorted(new_monitored_symbols):
             if symbol not in existing_symbols_in_new_list:
                 new_config_list.append({"symbol": symbol, "alerts": []})
         self.parent_app.config["cryptos_to_monitor"] = new_config_list
         if self.parent_app._save_config():
             messagebox.showinfo("Sucesso", "Lista de moedas atualizada.", parent=self)
-            self.parent_app.load_config_and_populate()
+            # O config em memória já é o salvo: reler o config.json aqui só traria de volta a versão anterior.
+            self.parent_app._populate_from_config()
             self.parent_manager._populate_symbols_tree()
             self.parent_manager.on_symbol_selected()
             self.destroy()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+logger = logging.getLogger("monitor")
+
+# --- Histórico de Alertas (SQLite, somente inserção) ---
+
+FLUSH_INTERVAL_SECONDS = 1.0
+PRUNE_INTERVAL_SECONDS = 3600
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    trigger TEXT NOT NULL,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_timestamp ON alerts (timestamp);
+CREATE INDEX IF NOT EXISTS idx_alerts_symbol_timestamp ON alerts (symbol, timestamp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+class AlertHistoryStore:
+    """Histórico de alertas em SQLite (modo WAL) com gravação em lote.
+
+    `append()` só enfileira o registro; uma thread grava a fila em uma única transação a cada
+    `flush_interval` segundos, então uma rajada de alertas custa um commit, não um por alerta.
+    As consultas gravam a fila antes de ler. Na primeira abertura o antigo alert_history.json
+    (uma lista JSON) é importado e renomeado para '.migrated'.
+    """
+    def __init__(self, path, legacy_json_path=None, retention_days=None, max_records=None, flush_interval=FLUSH_INTERVAL_SECONDS):
+        self.path, self.flush_interval = path, flush_interval
+        self.retention_days, self.max_records = retention_days, max_records
+        self.lock = threading.Lock()
+        self.pending = []
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        if legacy_json_path: self._migrate_legacy_json(legacy_json_path)
+        self.prune()
+        self.stop_event = threading.Event(); self.wake_event = threading.Event()
+        self.thread = threading.Thread(target=self._flush_loop, daemon=True); self.thread.start()
+
+    # --- Gravação ---
+
+    def append(self, symbol, trigger, notes, timestamp=None):
+        """Enfileira um alerta e retorna o registro criado."""
+        timestamp = timestamp or datetime.now().strftime(TIMESTAMP_FORMAT)
+        record = {'timestamp': timestamp, 'symbol': symbol, 'trigger': trigger, 'notes': notes or ''}
+        with self.lock: self.pending.append(record)
+        self.wake_event.set()
+        return record
+
+    def flush(self):
+        """Grava os registros enfileirados em uma única transação."""
+        with self.lock:
+            if not self.pending: return
+            batch, self.pending = self.pending, []
+            try:
+                with self.conn:
+                    self.conn.executemany("INSERT INTO alerts (timestamp, symbol, trigger, notes) VALUES (?, ?, ?, ?)",
+                                          [(r['timestamp'], r['symbol'], r['trigger'], r['notes']) for r in batch])
+            except sqlite3.Error as e:
+                self.pending = batch + self.pending
+                logger.error(f"--> Erro ao gravar histórico de alertas: {e}")
+
+    def _flush_loop(self):
+        last_prune = time.monotonic()
+        while not self.stop_event.is_set():
+            if self.wake_event.wait(PRUNE_INTERVAL_SECONDS):
+                self.wake_event.clear()
+                # Aguarda o intervalo para juntar os alertas do mesmo ciclo em um único commit.
+                self.stop_event.wait(self.flush_interval)
+                self.flush()
+            if time.monotonic() - last_prune >= PRUNE_INTERVAL_SECONDS: self.prune(); last_prune = time.monotonic()
+
+    # --- Consultas ---
+
+    def query(self, symbol=None, since=None, until=None, before_id=None, limit=None):
+        """Retorna os alertas do mais recente para o mais antigo, com filtros opcionais.
+
+        `since`/`until` são strings 'AAAA-MM-DD[ HH:MM:SS]' (inclusivas); `before_id` permite
+        paginar a partir do último 'id' recebido.
+        """
+        self.flush()
+        where, params = self._filters(symbol, since, until)
+        if before_id is not None: where.append("id < ?"); params.append(before_id)
+        sql = "SELECT id, timestamp, symbol, trigger, notes FROM alerts"
+        if where: sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC"
+        if limit is not None: sql += " LIMIT ?"; params.append(limit)
+        with self.lock: rows = self.conn.execute(sql, params).fetchall()
+        return [{'id': r[0], 'timestamp': r[1], 'symbol': r[2], 'trigger': r[3], 'notes': r[4]} for r in rows]
+
+    def count(self, symbol=None, since=None, until=None):
+        self.flush()
+        where, params = self._filters(symbol, since, until)
+        sql = "SELECT COUNT(*) FROM alerts" + (" WHERE " + " AND ".join(where) if where else "")
+        with self.lock: return self.conn.execute(sql, params).fetchone()[0]
+
+    @staticmethod
+    def _filters(symbol, since, until):
+        where, params = [], []
+        if symbol: where.append("symbol = ?"); params.append(symbol)
+        if since: where.append("timestamp >= ?"); params.append(since)
+        if until:
+            # Uma data sem horário inclui o dia inteiro.
+            where.append("timestamp <= ?"); params.append(until if len(until) > 10 else f"{until} 23:59:59")
+        return where, params
+
+    # --- Manutenção ---
+
+    def clear(self):
+        with self.lock:
+            self.pending = []
+            with self.conn: self.conn.execute("DELETE FROM alerts")
+
+    def prune(self):
+        """Aplica a retenção configurada (idade máxima em dias e/ou número máximo de registros)."""
+        self.flush()
+        with self.lock:
+            try:
+                with self.conn:
+                    if self.retention_days:
+                        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime(TIMESTAMP_FORMAT)
+                        self.conn.execute("DELETE FROM alerts WHERE timestamp < ?", (cutoff,))
+                    if self.max_records:
+                        self.conn.execute("DELETE FROM alerts WHERE id <= (SELECT id FROM alerts ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                                          (self.max_records,))
+            except sqlite3.Error as e: logger.error(f"--> Erro ao aplicar retenção do histórico: {e}")
+
+    def set_retention(self, retention_days=None, max_records=None):
+        self.retention_days, self.max_records = retention_days, max_records
+        self.prune()
+
+    def close(self):
+        self.stop_event.set(); self.wake_event.set()
+        self.thread.join(timeout=5)
+        self.flush()
+        with self.lock: self.conn.close()
+
+    def _migrate_legacy_json(self, json_path):
+        if self.conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_migrated'").fetchone(): return
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f: records = json.load(f)
+        except FileNotFoundError: records = []
+        except (json.JSONDecodeError, OSError) as e:
+            logger.warning(f"Aviso: histórico '{json_path}' não pôde ser importado. {e}"); return
+        with self.conn:
+            self.conn.executemany("INSERT INTO alerts (timestamp, symbol, trigger, notes) VALUES (?, ?, ?, ?)",
+                                  [(r.get('timestamp', ''), r.get('symbol', ''), r.get('trigger', ''), r.get('notes') or '')
+                                   for r in records if isinstance(r, dict)])
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_migrated', ?)", (json_path,))
+        if records:
+            try: os.replace(json_path, f"{json_path}.migrated")
+            except OSError: pass
+            logger.info(f"Histórico migrado de '{json_path}': {len(records)} alertas.")
@@ -0,0 +1,157 @@
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("monitor")
+
+# --- Cliente HTTP compartilhado (Binance e CoinGecko) ---
+
+BINANCE_HOST = "api.binance.com"
+COINGECKO_HOST = "api.coingecko.com"
+# Requisições por segundo e rajada máxima por host. O plano gratuito da CoinGecko tolera cerca
+# de 30 chamadas por minuto; na Binance o limite real é o peso, controlado pelo BinanceWeightLimiter.
+DEFAULT_HOST_LIMITS = {BINANCE_HOST: (20.0, 40), COINGECKO_HOST: (0.4, 5)}
+DEFAULT_POOL_SIZE = 10
+MAX_RETRIES = 3
+BACKOFF_BASE_SECONDS = 0.5
+MAX_BACKOFF_SECONDS = 30
+RETRY_STATUS = (418, 429, 500, 502, 503, 504)
+
+class TokenBucket:
+    """Balde de fichas: até `capacity` requisições em rajada, reabastecido a `rate` fichas por segundo."""
+    def __init__(self, rate, capacity):
+        self.rate, self.capacity = float(rate), float(capacity)
+        self.tokens = float(capacity); self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate); self.updated = now
+                if self.tokens >= tokens: self.tokens -= tokens; return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+class BinanceWeightLimiter:
+    """Controla o peso de requisições consumido na janela de 1 minuto da Binance."""
+    def __init__(self, max_weight_per_minute=6000, safety_ratio=0.8):
+        self.budget = int(max_weight_per_minute * safety_ratio)
+        self.lock = threading.Lock()
+        self.window = None; self.used_weight = 0; self.blocked_until = 0.0
+
+    def acquire(self, weight):
+        while True:
+            with self.lock:
+                now = time.time(); window = int(now // 60)
+                if window != self.window: self.window, self.used_weight = window, 0
+                if now < self.blocked_until: wait = self.blocked_until - now
+                elif self.used_weight + weight > self.budget: wait = 60 - (now % 60)
+                else: self.used_weight += weight; return
+            logger.warning(f"Limite de peso da Binance atingido; aguardando {wait:.1f}s.")
+            time.sleep(wait)
+
+    def update_from_response(self, response):
+        """Sincroniza o peso usado com o cabeçalho da Binance e respeita bloqueios (429/418)."""
+        used = response.headers.get('X-MBX-USED-WEIGHT-1M')
+        with self.lock:
+            if used is not None and int(used) > self.used_weight: self.used_weight = int(used)
+            if response.status_code in (418, 429):
+                retry_after = float(response.headers.get('Retry-After', 60))
+                self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+
+def create_http_session(pool_size=DEFAULT_POOL_SIZE):
+    """Cria uma sessão HTTP com conexões keep-alive reaproveitadas entre as requisições."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount("https://", adapter); session.mount("http://", adapter)
+    return session
+
+def _retry_after_seconds(response, default):
+    try: return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError): return default
+
+class HttpClient:
+    """Ponto único de acesso às APIs REST: pool de conexões, limites por host, retry e métricas.
+
+    Cada host tem um TokenBucket; a Binance também passa pelo BinanceWeightLimiter, alimentado por
+    X-MBX-USED-WEIGHT-1M. Respostas 418/429 bloqueiam o host pelo Retry-After informado. Falhas de
+    rede, 429 e 5xx são repetidas até `max_retries` vezes com backoff exponencial e jitter.
+    `metrics()` traz, por endpoint (host + caminho), requisições, erros, retries, peso e latência.
+    """
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, host_limits=None, max_retries=MAX_RETRIES):
+        self.session = create_http_session(pool_size)
+        self.max_retries = max_retries
+        self.buckets = {host: TokenBucket(rate, capacity) for host, (rate, capacity) in (host_limits or DEFAULT_HOST_LIMITS).items()}
+        self.binance_limiter = BinanceWeightLimiter()
+        self.lock = threading.Lock()
+        self.blocked_until = {}  # host -> time.time() até quando não enviar nada
+        self.stats = {}
+
+    def get(self, url, params=None, headers=None, timeout=10, weight=1):
+        """GET com limites e retry; retorna a última resposta (o chamador decide sobre o status)."""
+        parts = urlsplit(url)
+        host, endpoint = parts.hostname, f"{parts.hostname}{parts.path}"
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_host(host, weight)
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, weight, time.perf_counter() - started, error=True, retry=attempt < self.max_retries)
+                if attempt == self.max_retries: raise
+                delay = self._backoff(attempt)
+                logger.warning(f"Falha de rede em {endpoint} ({e}); nova tentativa em {delay:.1f}s.")
+                time.sleep(delay); continue
+
+            if host == BINANCE_HOST: self.binance_limiter.update_from_response(response)
+            retryable = response.status_code in RETRY_STATUS and attempt < self.max_retries
+            self._record(endpoint, weight, time.perf_counter() - started, error=response.status_code >= 400, retry=retryable)
+            if not retryable: return response
+            delay = self._backoff(attempt)
+            if response.status_code in (418, 429):
+                delay = max(delay, _retry_after_seconds(response, 60 if host == BINANCE_HOST else delay))
+                with self.lock: self.blocked_until[host] = max(self.blocked_until.get(host, 0.0), time.time() + delay)
+            logger.warning(f"{endpoint} respondeu {response.status_code}; nova tentativa em {delay:.1f}s.")
+            if response.status_code not in (418, 429): time.sleep(delay)  # 418/429: a espera acontece em _wait_for_host
+        return response
+
+    def get_json(self, url, params=None, headers=None, timeout=10, weight=1):
+        """GET que valida o status (levanta requests.HTTPError) e decodifica o JSON da resposta."""
+        response = self.get(url, params=params, headers=headers, timeout=timeout, weight=weight)
+        response.raise_for_status()
+        return response.json()
+
+    def metrics(self):
+        with self.lock: stats = {endpoint: dict(s) for endpoint, s in self.stats.items()}
+        for s in stats.values(): s['latency_avg'] = s['latency_total'] / s['requests'] if s['requests'] else None
+        return stats
+
+    def close(self):
+        self.session.close()
+
+    def _wait_for_host(self, host, weight):
+        with self.lock: blocked = self.blocked_until.get(host, 0.0) - time.time()
+        if blocked > 0:
+            logger.warning(f"{host} bloqueou as requisições; aguardando {blocked:.1f}s.")
+            time.sleep(blocked)
+        bucket = self.buckets.get(host)
+        if bucket: bucket.acquire()
+        if host == BINANCE_HOST: self.binance_limiter.acquire(weight)
+
+    def _record(self, endpoint, weight, latency, error=False, retry=False):
+        with self.lock:
+            s = self.stats.setdefault(endpoint, {'requests': 0, 'errors': 0, 'retries': 0, 'weight': 0,
+                                                 'latency_total': 0.0, 'latency_max': 0.0})
+            s['requests'] += 1; s['weight'] += weight; s['latency_total'] += latency
+            s['latency_max'] = max(s['latency_max'], latency)
+            if error: s['errors'] += 1
+            if retry: s['retries'] += 1
+
+    @staticmethod
+    def _backoff(attempt):
+        return min(MAX_BACKOFF_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt) * random.uniform(0.8, 1.2)
@@ -0,0 +1,337 @@
+import bisect
+import copy
+import math
+from collections import deque
+import numpy as np
+
+# --- Motor Incremental de Indicadores ---
+#
+# Reproduz, para um símbolo, os indicadores de compute_indicator_matrix sobre os últimos `window`
+# valores da série sem recalculá-la: cada candle fechado atualiza o estado em tempo constante e o
+# candle aberto é avaliado "por cima" do estado, sem alterá-lo. As MMEs (MACD e 50/200) são mantidas
+# desde o primeiro candle e corrigidas para a janela: ewm(adjust=False) é linear, então a série
+# semeada no início da janela difere da completa por um termo que decai geometricamente.
+
+GOLDEN_CROSS = "MME: Cruz Dourada (50/200)"
+DEATH_CROSS = "MME: Cruz da Morte (50/200)"
+DEFAULT_WINDOW = 300           # candles por série no ciclo (INDICATOR_CANDLES do MonitorService)
+_RESYNC_EVERY = 512
+_CLOSE, _FAST, _SLOW, _SIGNAL, _EMAS = range(5)  # colunas do histórico circular
+
+def _ewm_step(alpha, previous, value):
+    """Um passo de ewm(adjust=False) com a mesma aritmética do pandas."""
+    if previous is None or previous == value: return value
+    return ((1. - alpha) * previous + alpha * value) / ((1. - alpha) + alpha)
+
+def _ewm_of_powers(alpha, ratio, n):
+    """n-ésimo valor de ewm(adjust=False) aplicado à sequência ratio**j (j = 0, 1, ...)."""
+    keep = 1. - alpha
+    return keep ** n + alpha * ratio * (ratio ** n - keep ** n) / (ratio - keep)
+
+def _macd_cross(prev_macd, prev_signal, macd, signal):
+    if prev_macd < prev_signal and macd > signal: return "Cruzamento de Alta"
+    if prev_macd > prev_signal and macd < signal: return "Cruzamento de Baixa"
+    return "Nenhum"
+
+class IncrementalIndicators:
+    """Estado incremental de RSI, Bandas de Bollinger, MACD e MMEs de um símbolo.
+
+    `snapshot()` equivale a compute_indicator_matrix (e às funções calculate_*) aplicado aos últimos
+    `window` valores da série, como no ciclo; o resultado não depende de desde quando o estado existe.
+    """
+    def __init__(self, rsi_period=14, bb_period=20, bb_std_dev=2, macd_fast=12, macd_slow=26, macd_signal=9, ema_periods=(50, 200),
+                 window=DEFAULT_WINDOW):
+        self.rsi_period, self.bb_period, self.bb_std_dev = rsi_period, bb_period, bb_std_dev
+        self.macd_slow, self.window = macd_slow, window
+        self.alpha_fast, self.alpha_slow, self.alpha_signal = (2.0 / (1.0 + p) for p in (macd_fast, macd_slow, macd_signal))
+        self.ema_periods = tuple(ema_periods)
+        self.ema_alphas = [2.0 / (1.0 + p) for p in self.ema_periods]
+        self.reset()
+
+    def reset(self):
+        self.count = 0; self.last_open_time = None; self.last_close = None
+        self.gains, self.losses = deque(maxlen=self.rsi_period), deque(maxlen=self.rsi_period)
+        self.gain_sum = self.loss_sum = 0.0; self.nonzero_losses = 0
+        self.bb_window = deque(maxlen=self.bb_period); self.bb_shift = None
+        self.bb_sum = self.bb_sumsq = 0.0
+        self.ema_fast = self.ema_slow = self.signal = None
+        self.emas = [None] * len(self.ema_periods)
+        # Linha do candle fechado k em history[k % window]: fechamento, MMEs rápida/lenta, sinal do MACD e MMEs 50/200.
+        self.history = np.empty((self.window, _EMAS + len(self.ema_periods)))
+
+    # --- Atualização com candles fechados ---
+
+    def push_closed(self, close, open_time=None):
+        """Incorpora um candle fechado em O(1)."""
+        close = float(close)
+        if self.last_close is not None:
+            delta = close - self.last_close
+            gain, loss = (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+            if len(self.gains) == self.rsi_period:
+                self.gain_sum -= self.gains[0]; self.loss_sum -= self.losses[0]
+                if self.losses[0] != 0: self.nonzero_losses -= 1
+            self.gains.append(gain); self.losses.append(loss)
+            self.gain_sum += gain; self.loss_sum += loss
+            if loss != 0: self.nonzero_losses += 1
+
+        if self.bb_shift is None: self.bb_shift = close
+        if len(self.bb_window) == self.bb_period:
+            old = self.bb_window[0] - self.bb_shift
+            self.bb_sum -= old; self.bb_sumsq -= old * old
+        self.bb_window.append(close)
+        shifted = close - self.bb_shift
+        self.bb_sum += shifted; self.bb_sumsq += shifted * shifted
+
+        row = self._ewm_row(close)
+        _, self.ema_fast, self.ema_slow, self.signal, *self.emas = row
+        self.history[self.count % self.window] = row
+
+        self.count += 1; self.last_close = close; self.last_open_time = open_time
+        if self.count % _RESYNC_EVERY == 0: self._resync_sums()
+
+    def _ewm_row(self, close):
+        """Linha do histórico para `close` como próximo candle (MMEs sobre a série completa)."""
+        ema_fast = _ewm_step(self.alpha_fast, self.ema_fast, close)
+        ema_slow = _ewm_step(self.alpha_slow, self.ema_slow, close)
+        signal = _ewm_step(self.alpha_signal, self.signal, ema_fast - ema_slow)
+        return (close, ema_fast, ema_slow, signal, *(_ewm_step(a, e, close) for a, e in zip(self.ema_alphas, self.emas)))
+
+    def _resync_sums(self):
+        """Recalcula as somas acumuladas a partir das janelas, eliminando o erro de arredondamento."""
+        self.gain_sum, self.loss_sum = math.fsum(self.gains), math.fsum(self.losses)
+        self.bb_sum = math.fsum(v - self.bb_shift for v in self.bb_window)
+        self.bb_sumsq = math.fsum((v - self.bb_shift) ** 2 for v in self.bb_window)
+
+    def sync(self, open_times, closes):
+        """Alinha o estado com o histórico de candles fechados, consumindo só os candles novos."""
+        start = 0
+        if self.last_open_time is not None:
+            idx = bisect.bisect_left(open_times, self.last_open_time)
+            if idx < len(open_times) and open_times[idx] == self.last_open_time: start = idx + 1
+            else: self.reset()
+        # Série mais curta que a janela: a janela é a série inteira, então o estado tem de começar no mesmo candle.
+        if self.count > start and len(closes) < self.window: self.reset(); start = 0
+        for i in range(start, len(closes)): self.push_closed(closes[i], open_times[i])
+
+    # --- Leitura dos indicadores ---
+
+    def snapshot(self, pending_closes=()):
+        """Calcula os indicadores como se `pending_closes` (candles ainda abertos) fossem o fim da série.
+
+        Retorna {'rsi', 'upper_band', 'lower_band', 'macd', 'mme'} com os mesmos valores (e os mesmos
+        valores "vazios") das funções calculate_* aplicadas aos últimos `window` valores da série.
+        """
+        pending_closes = [float(c) for c in pending_closes]
+        if len(pending_closes) > 1:
+            state = copy.deepcopy(self)
+            for close in pending_closes[:-1]: state.push_closed(close)
+            return state.snapshot(pending_closes[-1:])
+        result = {'rsi': 0, 'upper_band': 0, 'lower_band': 0, 'macd': "N/A", 'mme': None}
+        if pending_closes:
+            close = pending_closes[0]
+            gain_sum, loss_sum, nonzero = self.gain_sum, self.loss_sum, self.nonzero_losses
+            s, sq = self.bb_sum, self.bb_sumsq
+            if self.count:
+                delta = close - self.last_close
+                gain, loss = (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+                gain_sum, loss_sum, nonzero = gain_sum + gain, loss_sum + loss, nonzero + (loss != 0)
+                if len(self.gains) == self.rsi_period:
+                    gain_sum -= self.gains[0]; loss_sum -= self.losses[0]; nonzero -= (self.losses[0] != 0)
+                shifted = close - self.bb_shift
+                s, sq = s + shifted, sq + shifted * shifted
+                if len(self.bb_window) == self.bb_period:
+                    old = self.bb_window[0] - self.bb_shift
+                    s -= old; sq -= old * old
+            t, last = self.count, self._ewm_row(close)
+        else:
+            if not self.count: return result
+            gain_sum, loss_sum, nonzero, s, sq = self.gain_sum, self.loss_sum, self.nonzero_losses, self.bb_sum, self.bb_sumsq
+            t = self.count - 1; last = self.history[t % self.window]
+        length = min(t + 1, self.window)  # pontos da série dentro da janela
+
+        if length >= self.rsi_period + 1: result['rsi'] = self._rsi(gain_sum, loss_sum, nonzero)
+        if length >= self.bb_period: result['upper_band'], result['lower_band'] = self._bands(s, sq)
+        if length >= 2:
+            previous, current = self._windowed(t - length + 1, [(t - 1, self.history[(t - 1) % self.window]), (t, last)])
+            if length >= self.macd_slow: result['macd'] = _macd_cross(previous[0], previous[1], current[0], current[1])
+            if length >= max(self.ema_periods): result['mme'] = self._ema_cross(previous[2], current[2])
+        return result
+
+    def signals(self, pending_closes, price):
+        """Textos de sinal do Monitor ({'rsi_signal', 'bollinger_signal', 'macd', 'mme'}), como em compute_signal_table."""
+        ind = self.snapshot(pending_closes)
+        rsi_signal, bollinger_signal = signal_columns({key: np.array([ind[key]], dtype=np.float64) for key in ('rsi', 'upper_band', 'lower_band')}, [price])
+        return {'rsi_signal': str(rsi_signal[0]), 'bollinger_signal': str(bollinger_signal[0]), 'macd': ind['macd'], 'mme': ind['mme']}
+
+    def _windowed(self, start, points):
+        """(macd, sinal, [MMEs]) dos pontos [(índice, linha do histórico)] com as MMEs semeadas em `start`."""
+        base = self.history[start % self.window]
+        origin = base[_CLOSE]
+        fast_gap, slow_gap = base[_FAST] - origin, base[_SLOW] - origin
+        signal_gap = base[_SIGNAL] - (base[_FAST] - base[_SLOW])
+        keep_fast, keep_slow, keep_signal = 1. - self.alpha_fast, 1. - self.alpha_slow, 1. - self.alpha_signal
+        values = []
+        for index, row in points:
+            n = index - start
+            macd = (row[_FAST] - keep_fast ** n * fast_gap) - (row[_SLOW] - keep_slow ** n * slow_gap)
+            signal = (row[_SIGNAL] - keep_signal ** n * signal_gap - fast_gap * _ewm_of_powers(self.alpha_signal, keep_fast, n)
+                      + slow_gap * _ewm_of_powers(self.alpha_signal, keep_slow, n))
+            emas = {p: row[_EMAS + i] - (1. - a) ** n * (base[_EMAS + i] - origin)
+                    for i, (p, a) in enumerate(zip(self.ema_periods, self.ema_alphas))}
+            values.append((macd, signal, emas))
+        return values
+
+    def _rsi(self, gain_sum, loss_sum, nonzero_losses):
+        if nonzero_losses == 0: return 100
+        rs = (gain_sum / self.rsi_period) / (loss_sum / self.rsi_period)
+        return 100 - (100 / (1 + rs))
+
+    def _bands(self, shifted_sum, shifted_sumsq):
+        n = self.bb_period
+        variance = max((shifted_sumsq - shifted_sum * shifted_sum / n) / (n - 1), 0.0)
+        sma, std = self.bb_shift + shifted_sum / n, math.sqrt(variance)
+        return sma + (std * self.bb_std_dev), sma - (std * self.bb_std_dev)
+
+    def _ema_cross(self, previous, current):
+        fast, slow = self.ema_periods[0], self.ema_periods[-1]
+        if previous[fast] < previous[slow] and current[fast] > current[slow]: return GOLDEN_CROSS
+        if previous[fast] > previous[slow] and current[fast] < current[slow]: return DEATH_CROSS
+        return None
+
+# --- Cálculo Vetorizado para Vários Símbolos ---
+
+RSI_OVERBOUGHT, RSI_OVERSOLD = "SOBRECOMPRADO (RSI >= 70)", "SOBREVENDIDO (RSI <= 30)"
+BB_ABOVE, BB_BELOW = "ACIMA DA BANDA SUPERIOR", "ABAIXO DA BANDA INFERIOR"
+
+def pack_close_matrix(close_series):
+    """Empacota as séries de fechamento em uma matriz float64 (símbolos x tempo), alinhadas à direita.
+
+    As séries mais curtas são completadas com NaN à esquerda. Retorna (matriz, comprimentos).
+    """
+    lengths = np.array([len(s) for s in close_series], dtype=np.int64)
+    matrix = np.full((len(close_series), int(lengths.max(initial=0))), np.nan, dtype=np.float64)
+    for row, series in enumerate(close_series):
+        if len(series): matrix[row, matrix.shape[1] - len(series):] = series
+    return matrix, lengths
+
+def _ewm_matrix(matrix, span):
+    """ewm(span, adjust=False) ao longo do tempo para todas as linhas, com a aritmética do pandas."""
+    alpha = 2.0 / (1.0 + span); keep = 1. - alpha
+    # Percorre uma cópia tempo x linhas: cada passo lê e grava um bloco contíguo, sem temporários.
+    columns = np.ascontiguousarray(matrix.T)
+    out = np.empty_like(columns); current = np.full(columns.shape[1], np.nan)
+    weighted, reset = np.empty_like(current), np.empty(columns.shape[1], dtype=bool)
+    for t in range(columns.shape[0]):
+        value, stepped = columns[t], out[t]
+        np.multiply(keep, current, out=stepped); np.multiply(alpha, value, out=weighted)
+        stepped += weighted; stepped /= keep + alpha
+        np.isnan(current, out=reset); reset |= current == value
+        np.copyto(stepped, value, where=reset)
+        current = stepped
+    return out.T
+
+def compute_indicator_matrix(matrix, lengths, rsi_period=14, bb_period=20, bb_std_dev=2, macd_fast=12, macd_slow=26, macd_signal=9, ema_periods=(50, 200)):
+    """Calcula RSI, Bandas de Bollinger, cruzamento MACD e cruzamento das MMEs de todas as linhas de uma vez.
+
+    Equivale a aplicar calculate_rsi, calculate_bollinger_bands, calculate_macd e calculate_emas
+    a cada série. Retorna um dicionário de vetores (um valor por linha da matriz).
+    """
+    n_rows, n_cols = matrix.shape
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rsi = np.zeros(n_rows)
+        if n_cols > rsi_period:
+            delta = np.diff(matrix[:, -(rsi_period + 1):], axis=1)
+            gain_mean = np.where(delta > 0, delta, 0.0).sum(axis=1) / rsi_period
+            loss_mean = np.where(delta < 0, -delta, 0.0).sum(axis=1) / rsi_period
+            rsi = np.where(np.count_nonzero(delta < 0, axis=1) == 0, 100.0, 100 - (100 / (1 + gain_mean / loss_mean)))
+            rsi = np.where(lengths >= rsi_period + 1, rsi, 0.0)
+
+        upper, lower = np.zeros(n_rows), np.zeros(n_rows)
+        if n_cols >= bb_period:
+            window = matrix[:, -bb_period:]
+            sma, std = window.mean(axis=1), window.std(axis=1, ddof=1)
+            valid = lengths >= bb_period
+            upper = np.where(valid, sma + std * bb_std_dev, 0.0); lower = np.where(valid, sma - std * bb_std_dev, 0.0)
+
+        macd_cross = np.full(n_rows, "N/A", dtype=object)
+        if n_cols >= 2:
+            macd_line = _ewm_matrix(matrix, macd_fast) - _ewm_matrix(matrix, macd_slow)
+            macd, signal = macd_line[:, -2:], _ewm_matrix(macd_line, macd_signal)[:, -2:]
+            up = (macd[:, 0] < signal[:, 0]) & (macd[:, 1] > signal[:, 1])
+            down = (macd[:, 0] > signal[:, 0]) & (macd[:, 1] < signal[:, 1])
+            macd_cross = np.where(lengths >= macd_slow, np.where(up, "Cruzamento de Alta", np.where(down, "Cruzamento de Baixa", "Nenhum")), "N/A").astype(object)
+
+        mme_cross = np.full(n_rows, None, dtype=object)
+        if n_cols >= 2:
+            fast, slow = (_ewm_matrix(matrix, p)[:, -2:] for p in (ema_periods[0], ema_periods[-1]))
+            golden = (fast[:, 0] < slow[:, 0]) & (fast[:, 1] > slow[:, 1])
+            death = (fast[:, 0] > slow[:, 0]) & (fast[:, 1] < slow[:, 1])
+            valid = lengths >= max(ema_periods)
+            mme_cross[valid & golden] = GOLDEN_CROSS; mme_cross[valid & death] = DEATH_CROSS
+    return {'rsi': rsi, 'upper_band': upper, 'lower_band': lower, 'macd': macd_cross, 'mme': mme_cross}
+
+def signal_columns(ind, prices):
+    """Converte RSI e bandas de compute_indicator_matrix nos textos de sinal do Monitor (um por linha)."""
+    prices = np.asarray(prices, dtype=np.float64)
+    rsi, ub, lb = ind['rsi'], ind['upper_band'], ind['lower_band']
+    rsi_signal = np.where(rsi >= 70, RSI_OVERBOUGHT, np.where((rsi <= 30) & (rsi > 0), RSI_OVERSOLD, ""))
+    bollinger_signal = np.where((prices > ub) & (ub > 0), BB_ABOVE, np.where((prices < lb) & (lb > 0), BB_BELOW, ""))
+    return rsi_signal, bollinger_signal
+
+def compute_signal_table(symbols, close_series, prices):
+    """Calcula, em uma única passada vetorizada, a tabela de sinais de todos os símbolos.
+
+    `close_series` traz os fechamentos de cada símbolo (candle aberto incluído) e `prices` o preço
+    atual usado na comparação com as bandas. Retorna {símbolo: {'rsi_signal', 'bollinger_signal',
+    'macd', 'mme'}} com os mesmos textos exibidos no Monitor.
+    """
+    if not symbols: return {}
+    matrix, lengths = pack_close_matrix(close_series)
+    ind = compute_indicator_matrix(matrix, lengths)
+    rsi_signal, bollinger_signal = signal_columns(ind, prices)
+    return {symbol: {'rsi_signal': str(rsi_signal[i]), 'bollinger_signal': str(bollinger_signal[i]),
+                     'macd': ind['macd'][i], 'mme': ind['mme'][i]}
+            for i, symbol in enumerate(symbols)}
+
+# --- Funções de Análise Técnica (pandas, um símbolo por vez) ---
+#
+# Referência dos cálculos acima: recebem um DataFrame com a coluna 'close'.
+
+def calculate_rsi(df, period=14):
+    if df.empty or len(df) < period + 1: return 0
+    delta = df['close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+    if loss.iloc[-1] == 0: return 100
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi.iloc[-1]
+
+def calculate_bollinger_bands(df, period=20, std_dev=2):
+    if df.empty or len(df) < period: return 0, 0
+    sma = df['close'].rolling(window=period).mean().iloc[-1]
+    std = df['close'].rolling(window=period).std().iloc[-1]
+    if np.isnan(sma) or np.isnan(std): return 0, 0
+    upper_band = sma + (std * std_dev)
+    lower_band = sma - (std * std_dev)
+    return upper_band, lower_band
+
+def calculate_macd(df, fast=12, slow=26, signal=9):
+    if len(df) < slow: return "N/A"
+    exp1 = df['close'].ewm(span=fast, adjust=False).mean()
+    exp2 = df['close'].ewm(span=slow, adjust=False).mean()
+    macd = exp1 - exp2
+    signal_line = macd.ewm(span=signal, adjust=False).mean()
+    if macd.iloc[-2] < signal_line.iloc[-2] and macd.iloc[-1] > signal_line.iloc[-1]:
+        return "Cruzamento de Alta"
+    elif macd.iloc[-2] > signal_line.iloc[-2] and macd.iloc[-1] < signal_line.iloc[-1]:
+        return "Cruzamento de Baixa"
+    return "Nenhum"
+
+def calculate_emas(df, periods=[50, 200]):
+    if df.empty: return {}
+    emas = {}
+    for period in periods:
+        if len(df) >= period:
+            emas[period] = df['close'].ewm(span=period, adjust=False).mean()
+    return emas
@@ -1,25 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
+import logging
 import os
-import requests
-import time
+import queue
 import sys
 import threading
+import multiprocessing
 import ctypes
-import winsound
 from datetime import datetime
 import ttkbootstrap as ttkb
-import pandas as pd
 from pystray import MenuItem as item
 import pystray
 from PIL import Image, ImageTk
 
 # --- Importação dos componentes modulares ---
-from core_components import (
-    get_application_path, Tooltip, AlertConfigDialog, AlertManagerWindow,
-    calculate_rsi, calculate_bollinger_bands, calculate_macd, calculate_emas
-)
+from app_paths import get_application_path
+from core_components import Tooltip, AlertManagerWindow
+from monitor_service import MonitorService
+from scheduler import CycleScheduler
+from audio_service import AudioService, create_audio_backend, PRICE_ALERT_PRIORITY, STATUS_ALERT_PRIORITY, DEFAULT_MAX_CONCURRENT
+from row_model import MonitorTableModel, rows_to_move, build_row_view, MONITOR_COLUMNS, EMPTY_SIGNALS
+
+logger = logging.getLogger("monitor")
+
+HISTORY_PAGE_SIZE = 200
+HISTORY_PREFETCH_FRACTION = 0.9  # carrega a próxima página quando a rolagem passa deste ponto
+STATUS_REFRESH_MS = 2000
+UI_POLL_MS = 100  # intervalo com que a thread do Tk aplica o que as outras threads enfileiraram
+PLACEHOLDER_ROW_VALUES = ("", "Carregando...", "...", "...", "...", "...", "...", "...", "...", "...")
 
 # --- Funções de Comunicação e Formatação ---
 
@@ -29,32 +37,6 @@ def show_windows_ok_popup(title, message, sound_stop_event=None):
     if sound_stop_event:
         sound_stop_event.set()
 
-def send_telegram_alert(bot_token, chat_id, message):
-    """Envia uma mensagem de alerta para um chat do Telegram."""
-    if not bot_token or "AQUI" in str(bot_token) or not chat_id or "AQUI" in str(chat_id):
-        return
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    payload = {'chat_id': chat_id, 'text': message, 'parse_mode': 'Markdown'}
-    try:
-        requests.post(url, data=payload, timeout=10).raise_for_status()
-        print("Alerta enviado para o Telegram.")
-    except Exception as e:
-        print(f"--> Erro ao enviar para o Telegram: {e}")
-
-def format_large_number(num):
-    """Formata números grandes para uma leitura mais fácil (K, M, B, T)."""
-    if num is None or not isinstance(num, (int, float)):
-        return "N/A"
-    if num < 1_000:
-        return f"${num:,.2f}"
-    if num < 1_000_000:
-        return f"${num/1_000:,.2f} K"
-    if num < 1_000_000_000:
-        return f"${num/1_000_000:,.2f} M"
-    if num < 1_000_000_000_000:
-        return f"${num/1_000_000_000:,.2f} B"
-    return f"${num/1_000_000_000_000:,.2f} T"
-
 
 # --- Classe Principal da Aplicação ---
 
@@ -64,24 +46,27 @@ class CryptoMonitorApp:
         self.root.title("Programa Alerta Cripto (Análise Integrada)")
         self.set_initial_geometry()
         
-        self.config = {}
+        # O Tk só pode ser usado pela sua própria thread: as demais postam (função, args) nesta fila.
+        self.ui_queue = queue.SimpleQueue()
+        self.service = MonitorService()
+        self.service.alert_listeners.append(self._on_alert_triggered)
+        # Recarga a quente do config.json: a tabela só é refeita na thread do Tk.
+        self.service.config_listeners.append(lambda config: self.post_to_ui(self._on_config_reloaded))
         self.check_interval_ms = 60000
-        self.current_prices = {}
-        self.ticker_24h_data = {}
-        self.sound_threads = {}
-        self.fundamental_data = {}
-        self.coin_gecko_ids = {}
+        self.audio = AudioService(create_audio_backend(), base_path=get_application_path())
         self.icons = {}
-        self.symbol_source_map = {} 
+        self.scheduler = CycleScheduler(self.update_prices, lambda: self.check_interval_ms / 1000)
         
-        self.config_path = os.path.join(get_application_path(), "config.json")
-        self.history_path = os.path.join(get_application_path(), "alert_history.json")
-        
-        self.update_job = None
         self.interval_map = {"1 Minuto": 60, "5 Minutos": 300, "15 Minutos": 900, "30 Minutos": 1800, "1 Hora": 3600}
         
         self.tray_icon = None
-        self.all_symbols_list = []
+        self.rendered_rows = {}  # símbolo -> (valores, tags) exibidos na tabela
+        self.table_model = MonitorTableModel()  # valores brutos e ordenação escolhida da tabela
+        self.last_rows = []
+        self.history_filters = {}
+        self.history_oldest_id = None
+        self.history_exhausted = True
+        self.history_page_pending = False
 
         self._load_icons()
         self._setup_styles()
@@ -92,9 +77,20 @@ class CryptoMonitorApp:
         
         self.root.protocol("WM_DELETE_WINDOW", self.minimize_to_tray)
         
-        threading.Thread(target=self._fetch_all_symbols, daemon=True).start()
+        self.service.start_symbol_refresh()
         
-        self.root.after(1000, self.force_update)
+        self._drain_ui_queue()
+        self.scheduler.start(initial_delay=1.0)
+
+    # Atalhos para o estado do serviço, usados também pelas janelas de core_components.
+    @property
+    def config(self): return self.service.config
+
+    @property
+    def all_symbols_list(self): return self.service.all_symbols_list
+
+    @property
+    def symbol_search_index(self): return self.service.symbol_search_index
 
     def _load_icons(self):
         icon_files = { "manage": "manage_icon.png", "sync": "sync_icon.png", "clear": "clear_icon.png" }
@@ -106,7 +102,7 @@ class CryptoMonitorApp:
                 image = Image.open(image_path).resize((16, 16), Image.Resampling.LANCZOS)
                 self.icons[name] = ImageTk.PhotoImage(image)
             except Exception as e:
-                print(f"Aviso: Não foi possível carregar o ícone '{filename}'. {e}")
+                logger.warning(f"Aviso: Não foi possível carregar o ícone '{filename}'. {e}")
                 self.icons[name] = None
     
     def center_toplevel_on_main(self, toplevel_window):
@@ -118,59 +114,6 @@ class CryptoMonitorApp:
         y = main_y + (main_height // 2) - (toplevel_height // 2)
         toplevel_window.geometry(f"+{x}+{y}")
         
-    def _fetch_all_symbols(self):
-        binance_symbols, coingecko_map = set(), {}
-
-        def fetch_binance():
-            nonlocal binance_symbols
-            try:
-                response = requests.get("https://api.binance.com/api/v3/exchangeInfo", timeout=15)
-                response.raise_for_status()
-                symbols = {s['symbol'] for s in response.json()['symbols'] if 'USDT' in s['symbol']}
-                binance_symbols.update(symbols)
-            except Exception as e: print(f"--> Erro na thread ao buscar símbolos da Binance: {e}")
-
-        def fetch_coingecko():
-            nonlocal coingecko_map
-            try:
-                response = requests.get("https://api.coingecko.com/api/v3/coins/list?include_platform=false", timeout=15)
-                response.raise_for_status()
-                for item in response.json(): coingecko_map[item['id']] = {'symbol': item['symbol'].upper(), 'id': item['id']}
-            except Exception as e: print(f"--> Erro na thread ao buscar IDs da CoinGecko: {e}")
-
-        t1, t2 = threading.Thread(target=fetch_binance), threading.Thread(target=fetch_coingecko)
-        t1.start(); t2.start(); t1.join(); t2.join()
-
-        final_symbols = set(binance_symbols)
-        self.coin_gecko_ids = {}
-        temp_cg_symbol_to_id_map = {v['symbol']: k for k, v in coingecko_map.items()}
-
-        for symbol in binance_symbols:
-            self.symbol_source_map[symbol] = 'binance'
-            base_currency = symbol.replace('USDT', '')
-            if base_currency in temp_cg_symbol_to_id_map:
-                 self.coin_gecko_ids[symbol] = temp_cg_symbol_to_id_map[base_currency]
-
-        for cg_id, cg_data in coingecko_map.items():
-            if f"{cg_data['symbol']}USDT" not in binance_symbols:
-                final_symbols.add(cg_id); self.symbol_source_map[cg_id] = 'coingecko'; self.coin_gecko_ids[cg_id] = cg_id
-
-        self.all_symbols_list = sorted(list(final_symbols))
-
-    def _fetch_fundamental_data(self, coingecko_ids):
-        if not coingecko_ids: return {}
-        try:
-            ids_string = ",".join(list(set(coingecko_ids)))
-            params = {'vs_currency': 'usd', 'ids': ids_string, 'price_change_percentage': '24h'}
-            response = requests.get(f"https://api.coingecko.com/api/v3/coins/markets", params=params, timeout=15)
-            response.raise_for_status()
-            return {item['id']: item for item in response.json()}
-        except Exception as e:
-            print(f"--> Erro ao buscar dados fundamentais da CoinGecko: {e}"); return {}
-
-    def get_coingecko_id(self, symbol):
-        return self.coin_gecko_ids.get(symbol)
-    
     def set_initial_geometry(self):
         width, height = 1600, 800
         screen_width, screen_height = self.root.winfo_screenwidth(), self.root.winfo_screenheight()
@@ -183,26 +126,25 @@ class CryptoMonitorApp:
     def _create_widgets(self):
         self.notebook = ttkb.Notebook(self.root, padding=10); self.notebook.pack(expand=True, fill='both')
         self.monitor_frame, self.history_frame, self.legend_frame = ttkb.Frame(self.notebook), ttkb.Frame(self.notebook), ttkb.Frame(self.notebook)
-        self.notebook.add(self.monitor_frame, text='Monitor'); self.notebook.add(self.history_frame, text='Histórico de Alertas'); self.notebook.add(self.legend_frame, text='Legenda')
-        self.create_monitor_widgets(); self.create_history_widgets(); self.create_legend_widgets()
+        self.status_frame = ttkb.Frame(self.notebook)
+        self.notebook.add(self.monitor_frame, text='Monitor'); self.notebook.add(self.history_frame, text='Histórico de Alertas')
+        self.notebook.add(self.status_frame, text='Status'); self.notebook.add(self.legend_frame, text='Legenda')
+        self.create_monitor_widgets(); self.create_history_widgets(); self.create_status_widgets(); self.create_legend_widgets()
         
     def create_monitor_widgets(self):
         table_frame = ttkb.Frame(self.monitor_frame); table_frame.pack(expand=True, fill='both', padx=5, pady=5)
         controls_frame = ttkb.Frame(self.monitor_frame, padding=(0, 10)); controls_frame.pack(fill='x', padx=5, pady=5)
         
-        columns = ('symbol', 'current_price', 'price_change_24h', 
-                   'rsi_signal', 'bollinger_signal', 'macd_signal', 'mme_cross', 
-                   'market_cap', 'fdv', 'mcap_fdv_ratio')
-                   
+        columns = MONITOR_COLUMNS
         self.tree = ttkb.Treeview(table_frame, columns=columns, show='headings', bootstyle="dark")
         
         self.header_tooltips = {
             'symbol': "Símbolo do par (ex: BTCUSDT) ou ID da CoinGecko (ex: bitcoin).",
             'current_price': "Último preço negociado na Binance ou CoinGecko.",
             'price_change_24h': "Variação percentual do preço nas últimas 24 horas.",
-            'rsi_signal': "Sinal do RSI (Índice de Força Relativa) no gráfico diário. 'SOBREVENDIDO' é um sinal de compra potencial; 'SOBRECOMPRADO' é um sinal de venda potencial.",
-            'bollinger_signal': "Sinal das Bandas de Bollinger no gráfico diário. 'ABAIXO DA BANDA' é um sinal de compra potencial; 'ACIMA DA BANDA' é um sinal de venda potencial.",
-            'macd_signal': "Sinais de cruzamento MACD no gráfico diário. 'Cruzamento de Alta' é otimista; 'Cruzamento de Baixa' é pessimista.",
+            'rsi_signal': "Sinal do RSI (Índice de Força Relativa) no timeframe selecionado (padrão: diário). 'SOBREVENDIDO' é um sinal de compra potencial; 'SOBRECOMPRADO' é um sinal de venda potencial.",
+            'bollinger_signal': "Sinal das Bandas de Bollinger no timeframe selecionado (padrão: diário). 'ABAIXO DA BANDA' é um sinal de compra potencial; 'ACIMA DA BANDA' é um sinal de venda potencial.",
+            'macd_signal': "Sinais de cruzamento MACD no timeframe selecionado (padrão: diário). 'Cruzamento de Alta' é otimista; 'Cruzamento de Baixa' é pessimista.",
             'mme_cross': "Sinais de Cruz Dourada/Morte (MME 50/200). A Cruz Dourada é um forte sinal de alta a longo prazo.",
             'market_cap': "Capitalização de Mercado: Valor total de todas as moedas em circulação.",
             'fdv': "Fully Diluted Valuation: Valor de mercado se todos os tokens estivessem em circulação.",
@@ -230,136 +172,91 @@ class CryptoMonitorApp:
         ttkb.Label(controls_frame, text="Intervalo:").pack(side='left', padx=(20, 5))
         self.interval_combo = ttkb.Combobox(controls_frame, values=list(self.interval_map.keys()), width=15, state="readonly"); self.interval_combo.pack(side='left')
         self.interval_combo.bind("<<ComboboxSelected>>", self.on_interval_change)
+        ttkb.Label(controls_frame, text="Timeframe:").pack(side='left', padx=(20, 5))
+        self.timeframe_combo = ttkb.Combobox(controls_frame, width=6, state="readonly"); self.timeframe_combo.pack(side='left')
+        self.timeframe_combo.bind("<<ComboboxSelected>>", self.on_timeframe_change)
+
+    def post_to_ui(self, callback, *args):
+        """Agenda `callback(*args)` na thread do Tk; pode ser chamado de qualquer thread (não toca no Tk)."""
+        self.ui_queue.put((callback, args))
+
+    def _drain_ui_queue(self):
+        """Executa na thread do Tk o que as outras threads postaram e se reagenda."""
+        while True:
+            try: callback, args = self.ui_queue.get_nowait()
+            except queue.Empty: break
+            try: callback(*args)
+            except Exception as e: logger.error(f"--> Erro ao atualizar a interface: {e}")
+        self.root.after(UI_POLL_MS, self._drain_ui_queue)
 
     def update_prices(self):
-        all_symbols_to_monitor = list({c['symbol'] for c in self.config.get("cryptos_to_monitor", [])})
-        if not all_symbols_to_monitor:
-            if self.root.winfo_exists(): self.update_job = self.root.after(self.check_interval_ms, self.update_prices); return
-
-        binance_symbols = [s for s in all_symbols_to_monitor if self.symbol_source_map.get(s) == 'binance']
-        coingecko_ids = [s for s in all_symbols_to_monitor if self.symbol_source_map.get(s) == 'coingecko']
-        
-        all_cg_ids_for_fundamentals = [cg_id for symbol in all_symbols_to_monitor if (cg_id := self.get_coingecko_id(symbol))]
-        self.fundamental_data = self._fetch_fundamental_data(all_cg_ids_for_fundamentals)
-        self.ticker_24h_data = self.get_24hr_ticker_data(binance_symbols)
-
-        for cg_id in coingecko_ids:
-            if cg_id in self.fundamental_data:
-                item = self.fundamental_data[cg_id]
-                self.ticker_24h_data[item['id']] = {
-                    'symbol': item['id'],
-                    'lastPrice': item.get('current_price', 0),
-                    'priceChangePercent': item.get('price_change_percentage_24h_in_currency', 0)
-                }
-
-        for symbol in all_symbols_to_monitor:
+        """Executa um ciclo fora da thread do Tk e posta o resultado para ser aplicado na thread do Tk."""
+        rows = self.service.run_cycle()
+        views = {row['symbol']: build_row_view(row) for row in rows}
+        self.post_to_ui(self._apply_row_views, views, rows)
+
+    def _apply_row_views(self, views, rows=None, timeframe=None):
+        """Aplica na tabela só as células e tags que mudaram desde a última renderização (thread do Tk).
+
+        `rows`/`timeframe` são os mesmos usados para montar `views`; o modelo da tabela é atualizado com
+        eles e a ordenação escolhida é mantida, movendo só as linhas que mudaram de posição.
+        """
+        if rows is not None: self.last_rows = rows
+        for symbol, (values, tags) in views.items():
             if not self.tree.exists(symbol): continue
-            
-            source_data = self.ticker_24h_data.get(symbol)
-            if not source_data:
-                self.tree.set(symbol, 'current_price', "Erro"); continue
-
-            price = float(source_data.get('lastPrice', 0))
-            change_24h = float(source_data.get('priceChangePercent', 0)) if source_data.get('priceChangePercent') is not None else 0.0
-            self.current_prices[symbol] = price
-            
-            cg_id = self.get_coingecko_id(symbol)
-            fund_data = self.fundamental_data.get(cg_id)
-            
-            rsi_signal, bollinger_signal, macd, mme = "", "", "N/A", "N/A"
-            s_tag, mme_tag = 'status_neutral', 'status_neutral'
-            
-            if self.symbol_source_map.get(symbol) == 'binance':
-                klines = self.get_kline_data(symbol, interval='1d', limit=300)
-                if klines:
-                    df = pd.DataFrame(klines, columns=['ts','o','h','l','close','v','ct','qav','nt','tbbav','tbqav','ig'])
-                    df['close'] = pd.to_numeric(df['close'])
-                    
-                    rsi, (ub, lb) = calculate_rsi(df), calculate_bollinger_bands(df)
-                    macd, emas = calculate_macd(df), calculate_emas(df, [50, 200])
-                    
-                    if rsi >= 70: rsi_signal = "SOBRECOMPRADO (RSI >= 70)"
-                    elif rsi <= 30 and rsi > 0: rsi_signal = "SOBREVENDIDO (RSI <= 30)"
-                    
-                    if price > ub and ub > 0: bollinger_signal = "ACIMA DA BANDA SUPERIOR"
-                    elif price < lb and lb > 0: bollinger_signal = "ABAIXO DA BANDA INFERIOR"
-
-                    if 50 in emas and 200 in emas:
-                        if emas[50].iloc[-2] < emas[200].iloc[-2] and emas[50].iloc[-1] > emas[200].iloc[-1]: mme = "MME: Cruz Dourada (50/200)"
-                        elif emas[50].iloc[-2] > emas[200].iloc[-2] and emas[50].iloc[-1] < emas[200].iloc[-1]: mme = "MME: Cruz da Morte (50/200)"
-
-            if "SOBREVENDIDO" in rsi_signal or "ABAIXO" in bollinger_signal: s_tag = 'status_buy'
-            elif "SOBRECOMPRADO" in rsi_signal or "ACIMA" in bollinger_signal: s_tag = 'status_sell'
-            
-            if "Alta" in str(macd) or "Dourada" in str(mme): mme_tag = 'status_buy'
-            elif "Baixa" in str(macd) or "Morte" in str(mme): mme_tag = 'status_sell'
-            
-            mcap, fdv, ratio = "N/A", "N/A", "N/A"
-            if fund_data:
-                mcap_val, fdv_val = fund_data.get('market_cap'), fund_data.get('fully_diluted_valuation')
-                mcap, fdv = format_large_number(mcap_val), format_large_number(fdv_val)
-                if mcap_val and fdv_val and fdv_val > 0:
-                    ratio = f"{(mcap_val / fdv_val):.2f}"
-            
-            self.tree.item(symbol, tags=['price_up' if change_24h >= 0 else 'price_down', s_tag, mme_tag])
-            d_symbol = symbol.upper() if self.symbol_source_map.get(symbol) == 'binance' else f"{fund_data.get('symbol', symbol).upper()} (CG)"
-            
-            self.tree.set(symbol, 'symbol', d_symbol)
-            self.tree.set(symbol, 'current_price', f"${price:,.8f}".rstrip('0').rstrip('.'))
-            self.tree.set(symbol, 'price_change_24h', f"{change_24h:+.2f}%")
-            self.tree.set(symbol, 'rsi_signal', rsi_signal)
-            self.tree.set(symbol, 'bollinger_signal', bollinger_signal)
-            self.tree.set(symbol, 'macd_signal', macd)
-            self.tree.set(symbol, 'mme_cross', mme)
-            self.tree.set(symbol, 'market_cap', mcap)
-            self.tree.set(symbol, 'fdv', fdv)
-            self.tree.set(symbol, 'mcap_fdv_ratio', ratio)
-            
-            for crypto in self.config.get("cryptos_to_monitor", []):
-                if crypto['symbol'] == symbol:
-                    for alert in crypto.get("alerts", []):
-                        a_type, triggered = alert.get('type'), False
-                        
-                        if a_type in ['high', 'low']:
-                            triggered = (a_type == 'high' and price >= alert.get('price', 0)) or \
-                                      (a_type == 'low' and price <= alert.get('price', 0))
-                        
-                        elif a_type == 'status' and self.symbol_source_map.get(symbol) == 'binance':
-                            a_val = alert.get('value')
-                            triggered = (a_val == rsi_signal) or \
-                                        (a_val == bollinger_signal) or \
-                                        (a_val == f"MACD: {macd}") or \
-                                        (a_val == mme)
-                        
-                        if triggered and not alert.get("triggered_now", False):
-                            alert["triggered_now"] = True
-                            alert_info = {**alert, 'symbol': d_symbol, 'original_symbol': symbol}
-                            self.trigger_alert(alert_info)
-                        elif not triggered:
-                            alert["triggered_now"] = False
-                            
-        if self.root.winfo_exists():
-            self.update_job = self.root.after(self.check_interval_ms, self.update_prices)
+            previous_values, previous_tags = self.rendered_rows.get(symbol, (PLACEHOLDER_ROW_VALUES, None))
+            if values is None:  # erro: mantém o restante da linha e só marca o preço
+                values, tags = (previous_values[0], "Erro") + previous_values[2:], previous_tags
+            changed = [k for k, (old, new) in enumerate(zip(previous_values, values)) if old != new]
+            if len(changed) > len(values) // 2: self.tree.item(symbol, values=values)
+            else:
+                for k in changed: self.tree.set(symbol, MONITOR_COLUMNS[k], values[k])
+            if tags is not None and tags != previous_tags: self.tree.item(symbol, tags=tags)
+            self.rendered_rows[symbol] = (values, tags)
+        self._apply_order(self.table_model.update(self.last_rows, timeframe, EMPTY_SIGNALS))
+
+    def _apply_order(self, order):
+        current = list(self.tree.get_children(''))
+        if current == order: return
+        if set(current) != set(order):  # tabela e modelo fora de sincronia: reordena tudo
+            for index, symbol in enumerate(s for s in order if self.tree.exists(s)): self.tree.move(symbol, '', index)
+            return
+        moving = set(rows_to_move(current, order))
+        for index, symbol in enumerate(order):
+            if symbol not in moving: continue
+            # Posição logo após a linha que a precede em `order` (contada sem a própria linha, como no Tk).
+            current.remove(symbol)
+            position = current.index(order[index - 1]) + 1 if index else 0
+            current.insert(position, symbol); self.tree.move(symbol, '', position)
 
     def load_config_and_populate(self):
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as f: self.config = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.config = {"telegram_bot_token": "SEU_TOKEN_AQUI", "telegram_chat_id": "SEU_CHAT_ID_AQUI", "check_interval_seconds": 300, "cryptos_to_monitor": []}
-            self._save_config()
+        self.service.load_config()
+        self._populate_from_config()
+
+    def _on_config_reloaded(self):
+        self._populate_from_config()
+        timeframe = self.service.display_timeframe
+        self._apply_row_views({row['symbol']: build_row_view(row, timeframe) for row in self.last_rows}, timeframe=timeframe)
+        self.scheduler.reschedule()  # o intervalo pode ter mudado
+
+    def _populate_from_config(self):
+        # Sons decodificados uma vez: o disparo de um alerta não relê o .wav do disco.
+        self.audio.max_concurrent = self.config.get("max_concurrent_sounds", DEFAULT_MAX_CONCURRENT)
+        self.audio.preload(alert.get("sound") for crypto in self.config.get("cryptos_to_monitor", []) for alert in crypto.get("alerts", []))
         self.check_interval_ms = self.config.get("check_interval_seconds", 300) * 1000
         current_interval_sec = self.config.get("check_interval_seconds", 300)
         for text, seconds in self.interval_map.items():
             if seconds == current_interval_sec: self.interval_combo.set(text); break
         else: self.interval_combo.set("5 Minutos")
+        self.timeframe_combo.config(values=self.service.timeframes); self.timeframe_combo.set(self.service.display_timeframe)
         
         for i in self.tree.get_children(): self.tree.delete(i)
+        self.rendered_rows = {}
         all_symbols = {c['symbol'] for c in self.config.get("cryptos_to_monitor", [])}
-        for symbol in sorted(list(all_symbols)):
-            self.tree.insert('', tk.END, iid=symbol, values=(symbol, "Carregando...", "...", "...", "...", "...", "...", "...", "...", "..."))
-            
-        for crypto in self.config.get("cryptos_to_monitor", []):
-            for alert in crypto.get("alerts", []): alert['triggered_now'] = False
+        self.table_model.reset(sorted(all_symbols))
+        for symbol in self.table_model.order():
+            self.tree.insert('', tk.END, iid=symbol, values=(symbol,) + PLACEHOLDER_ROW_VALUES[1:])
+            self.rendered_rows[symbol] = ((symbol,) + PLACEHOLDER_ROW_VALUES[1:], None)
             
     def _on_treeview_motion(self, event):
         region = self.tree.identify_region(event.x, event.y)
@@ -375,21 +272,9 @@ class CryptoMonitorApp:
     def _on_treeview_leave(self, event): self.tooltip.hide_tooltip()
     
     def sort_column(self, col, reverse):
-        try:
-            data = [(self.tree.set(child, col), child) for child in self.tree.get_children('')]
-            def sort_key(item):
-                val = item[0].replace('$', '').replace('%', '').replace(',', '').replace('(CG)','').strip()
-                mult = 1
-                if 'T' in val: mult=1e12; val=val.replace('T','').strip()
-                elif 'B' in val: mult=1e9; val=val.replace('B','').strip()
-                elif 'M' in val: mult=1e6; val=val.replace('M','').strip()
-                elif 'K' in val: mult=1e3; val=val.replace('K','').strip()
-                try: return float(val) * mult
-                except (ValueError, TypeError): return val.lower()
-            data.sort(key=sort_key, reverse=reverse)
-            for index, (val, child) in enumerate(data): self.tree.move(child, '', index)
-            self.tree.heading(col, command=lambda: self.sort_column(col, not reverse))
-        except Exception as e: print(f"Erro ao ordenar: {e}")
+        """Ordena pelos valores brutos do modelo; a ordem é mantida nos ciclos seguintes."""
+        self._apply_order(self.table_model.sort_by(col, reverse))
+        self.tree.heading(col, command=lambda: self.sort_column(col, not reverse))
 
     def open_alert_manager(self): AlertManagerWindow(self)
     def on_closing(self):
@@ -409,13 +294,13 @@ class CryptoMonitorApp:
 
     def show_window(self):
         if self.tray_icon: self.tray_icon.stop()
-        self.root.after(0, self.root.deiconify)
+        self.post_to_ui(self.root.deiconify)  # chamado pela thread do ícone da bandeja
         
     def _quit_application(self):
         if self.tray_icon: self.tray_icon.stop()
-        if self.update_job: self.root.after_cancel(self.update_job)
-        for thread_info in self.sound_threads.values():
-            if thread_info['thread'].is_alive(): thread_info['stop_event'].set()
+        self.scheduler.stop()
+        self.service.stop()
+        self.audio.stop()
         self.root.destroy()
         
     def _setup_monitor_tags(self):
@@ -425,59 +310,97 @@ class CryptoMonitorApp:
         self.tree.tag_configure('status_sell', foreground='#dc3545')
         self.tree.tag_configure('status_neutral', foreground='white')
         
-    def _trigger_sound(self, sound_path_str, stop_event):
-        if not sound_path_str: return
-        sound_path = sound_path_str if os.path.isabs(sound_path_str) else os.path.join(get_application_path(), sound_path_str)
-        key = (sound_path, id(stop_event))
-        if self.sound_threads.get(key, {}).get('thread', threading.Thread()).is_alive(): return
-        thread = threading.Thread(target=self._play_sound_looped, args=(sound_path, stop_event, key), daemon=True)
-        self.sound_threads[key] = {'thread': thread, 'stop_event': stop_event}; thread.start()
-        
-    def _play_sound_looped(self, sound_path, stop_event, key):
-        if not os.path.exists(sound_path): print(f"Arquivo de som não encontrado: {sound_path}"); return
-        try:
-            while not stop_event.is_set(): winsound.PlaySound(sound_path, winsound.SND_FILENAME); time.sleep(0.1)
-        except Exception as e: print(f"Erro ao tocar som: {e}")
-        finally:
-            if key in self.sound_threads: del self.sound_threads[key]
-            
-    def trigger_alert(self, alert_data):
-        symbol, o_symbol = alert_data.get('symbol'), alert_data.get('original_symbol')
-        a_type = alert_data.get("type", "N/A"); notes = alert_data.get("notes", "Sem observações.")
-        price = self.current_prices.get(o_symbol, 0)
-        title = f"ALERTA: {symbol}"
-        if a_type in ['high', 'low']:
-            a_price = alert_data.get("price", 0)
-            msg = (f"{symbol} atingiu alvo de {a_type.upper()} em ${a_price:,.2f}!\nPreço: ${price:,.2f}\n\nObs: {notes}")
-            tg_msg = (f"🔔 *ALERTA PREÇO: {symbol}*\n\nAtingiu *{a_type.upper()}* em *${a_price:,.2f}*.\nPreço: `${price:,.2f}`\nObs: _{notes}_")
-            h_trigger = f"{a_type.upper()} @ ${a_price:,.2f}"
-        else: # status
-            a_value = alert_data.get("value", "N/A")
-            msg = (f"Sinal Técnico para {symbol}!\n\nStatus: {a_value}\nPreço: ${price:,.2f}\n\nObs: {notes}")
-            tg_msg = (f"📈 *SINAL TÉCNICO: {symbol}*\n\nStatus: *{a_value}*\nPreço: `${price:,.2f}`\nObs: _{notes}_")
-            h_trigger = f"Status: {a_value}"
-        stop_event = threading.Event(); alert_data['stop_event'] = stop_event
-        threading.Thread(target=show_windows_ok_popup, args=(title, msg, stop_event), daemon=True).start()
-        send_telegram_alert(self.config.get('telegram_bot_token'), self.config.get('telegram_chat_id'), tg_msg)
-        if alert_data.get("sound"): self._trigger_sound(alert_data.get("sound"), stop_event)
-        self.add_to_history(symbol, h_trigger, notes)
+    def _show_alert_popup(self, title, msg, stop_event):
+        show_windows_ok_popup(title, msg, stop_event)
+        self.audio.refresh()  # popup fechado: o som do alerta sai da mixagem
+
+    def _on_alert_triggered(self, alert_data, title, msg, record):
+        """Listener do serviço: popup do Windows, som em loop e nova linha no histórico.
+
+        O evento que para o som pertence só ao popup e à voz do mixer; nada é gravado em `alert_data`.
+        """
+        stop_event = threading.Event()
+        threading.Thread(target=self._show_alert_popup, args=(title, msg, stop_event), daemon=True).start()
+        if alert_data.get("sound"):
+            default_priority = PRICE_ALERT_PRIORITY if alert_data.get("type") in ('high', 'low') else STATUS_ALERT_PRIORITY
+            self.audio.play(alert_data["sound"], stop_event, priority=alert_data.get("priority", default_priority))
+        # Pode ser chamado pela thread do stream: a árvore só é alterada na thread do Tk.
+        self.post_to_ui(self._insert_history_record, record)
         
     def _save_config(self):
-        try:
-            with open(self.config_path, 'w', encoding='utf-8') as f: json.dump(self.config, f, indent=2, ensure_ascii=False); return True
-        except Exception as e: messagebox.showerror("Erro", f"Não foi possível salvar 'config.json':\n{e}"); return False
+        """Salva uma edição do usuário e grava o arquivo na hora, para que uma falha seja mostrada (e não um "Sucesso")."""
+        try: error = None if self.service.save_config(wait=True) else self.service.config_store.last_error
+        except Exception as e: error = e
+        if error is None: return True
+        messagebox.showerror("Erro", f"Não foi possível salvar 'config.json':\n{error}"); return False
         
     def create_history_widgets(self):
+        filter_frame = ttkb.Frame(self.history_frame, padding=(0, 5)); filter_frame.pack(fill='x', padx=5, pady=(5, 0))
         frame = ttkb.Frame(self.history_frame); frame.pack(expand=True, fill='both', padx=5, pady=5)
         ctrl_frame = ttkb.Frame(self.history_frame, padding=(0, 10)); ctrl_frame.pack(fill='x', padx=5, pady=5)
+
+        ttkb.Label(filter_frame, text="Símbolo:").pack(side='left', padx=(5, 5))
+        self.history_symbol_entry = ttkb.Entry(filter_frame, width=15); self.history_symbol_entry.pack(side='left')
+        ttkb.Label(filter_frame, text="De (AAAA-MM-DD):").pack(side='left', padx=(15, 5))
+        self.history_since_entry = ttkb.Entry(filter_frame, width=12); self.history_since_entry.pack(side='left')
+        ttkb.Label(filter_frame, text="Até:").pack(side='left', padx=(15, 5))
+        self.history_until_entry = ttkb.Entry(filter_frame, width=12); self.history_until_entry.pack(side='left')
+        ttkb.Button(filter_frame, text="Filtrar", command=self.apply_history_filters, bootstyle="info").pack(side='left', padx=(15, 5))
+        ttkb.Button(filter_frame, text="Limpar Filtros", command=self.reset_history_filters, bootstyle="secondary").pack(side='left', padx=5)
+        for entry in (self.history_symbol_entry, self.history_since_entry, self.history_until_entry): entry.bind('<Return>', self.apply_history_filters)
+
         cols = ('timestamp', 'symbol', 'trigger', 'notes'); self.history_tree = ttkb.Treeview(frame, columns=cols, show='headings', bootstyle="dark")
+        self.history_scrollbar = ttkb.Scrollbar(frame, orient='vertical', command=self.history_tree.yview)
+        self.history_tree.configure(yscrollcommand=self._on_history_scroll)
+        self.history_scrollbar.pack(side='right', fill='y')
         self.history_tree.heading('timestamp', text='Data e Hora'); self.history_tree.column('timestamp', width=150, anchor=tk.W)
         self.history_tree.heading('symbol', text='Símbolo'); self.history_tree.column('symbol', width=120, anchor=tk.CENTER)
         self.history_tree.heading('trigger', text='Alerta Disparado'); self.history_tree.column('trigger', width=250, anchor=tk.W)
         self.history_tree.heading('notes', text='Observações'); self.history_tree.column('notes', width=400, anchor=tk.W)
         self.history_tree.pack(expand=True, fill='both')
         ttkb.Button(ctrl_frame, text=" Limpar Histórico", image=self.icons.get("clear"), compound="left", command=self.clear_alert_history, bootstyle="danger").pack(side='left', padx=5)
+        self.history_count_label = ttkb.Label(ctrl_frame, text=""); self.history_count_label.pack(side='right', padx=5)
         
+    def create_status_widgets(self):
+        summary_frame = ttkb.Frame(self.status_frame, padding=(10, 10)); summary_frame.pack(fill='x', padx=5, pady=5)
+        self.status_labels = {}
+        fields = (('cycles', "Ciclos"), ('duration', "Duração (méd / p95 / máx)"), ('stages', "Etapas (média)"), ('symbols', "Símbolos no último ciclo"),
+                  ('last_cycle', "Último ciclo"), ('alerts', "Alertas (avaliações / disparos)"), ('notifier', "Telegram (fila / enviados / falhas)"),
+                  ('metrics', "Endpoint Prometheus"))
+        for i, (key, text) in enumerate(fields):
+            ttkb.Label(summary_frame, text=f"{text}:", bootstyle="secondary").grid(row=i, column=0, sticky='w', padx=(0, 15), pady=2)
+            self.status_labels[key] = ttkb.Label(summary_frame, text="-"); self.status_labels[key].grid(row=i, column=1, sticky='w', pady=2)
+        frame = ttkb.Frame(self.status_frame); frame.pack(expand=True, fill='both', padx=5, pady=5)
+        cols = ('endpoint', 'requests', 'errors', 'retries', 'weight', 'latency_avg', 'latency_max')
+        self.endpoints_tree = ttkb.Treeview(frame, columns=cols, show='headings', bootstyle="dark")
+        for col, text, width in (('endpoint', 'Endpoint', 320), ('requests', 'Requisições', 100), ('errors', 'Erros', 80), ('retries', 'Retries', 80),
+                                 ('weight', 'Peso', 80), ('latency_avg', 'Latência Média', 120), ('latency_max', 'Latência Máx.', 120)):
+            self.endpoints_tree.heading(col, text=text); self.endpoints_tree.column(col, width=width, anchor=tk.W if col == 'endpoint' else tk.E)
+        self.endpoints_tree.pack(expand=True, fill='both')
+        self.root.after(STATUS_REFRESH_MS, self._refresh_status_panel)
+
+    def _refresh_status_panel(self):
+        """Atualiza o painel de status com a janela móvel de ciclos e as métricas das APIs (thread do Tk)."""
+        if not self.root.winfo_exists(): return
+        status = self.service.status_snapshot()
+        cycles, notifier = status['cycles'], status['notifier']
+        def ms(value): return f"{value * 1000:.0f} ms" if value is not None else "-"
+        last = cycles['last'] or {}
+        texts = {'cycles': f"{cycles['cycles']} ({cycles['partial_cycles']} parciais); janela de {cycles['window']}",
+                 'duration': f"{ms(cycles['duration_avg'])} / {ms(cycles['duration_p95'])} / {ms(cycles['duration_max'])}",
+                 'stages': " | ".join(f"{stage}: {ms(value)}" for stage, value in cycles['stage_avg'].items()) or "-",
+                 'symbols': str(last.get('symbols', "-")),
+                 'last_cycle': datetime.fromtimestamp(cycles['last_cycle_at']).strftime('%H:%M:%S') if cycles['last_cycle_at'] else "-",
+                 'alerts': f"{cycles['alert_evaluations']} / {cycles['alerts_fired']}",
+                 'notifier': f"{notifier['queue_depth']} / {notifier['sent']} / {notifier['failed']}",
+                 'metrics': f"http://{self.service.metrics_server.host}:{self.service.metrics_server.port}/metrics" if self.service.metrics_server else "desligado ('metrics_port' no config.json)"}
+        for key, text in texts.items(): self.status_labels[key].config(text=text)
+        for endpoint, m in status['http'].items():
+            values = (endpoint, m['requests'], m['errors'], m['retries'], m['weight'], ms(m['latency_avg']), ms(m['latency_max']))
+            if self.endpoints_tree.exists(endpoint): self.endpoints_tree.item(endpoint, values=values)
+            else: self.endpoints_tree.insert('', tk.END, iid=endpoint, values=values)
+        self.root.after(STATUS_REFRESH_MS, self._refresh_status_panel)
+
     def create_legend_widgets(self):
         canvas = tk.Canvas(self.legend_frame, borderwidth=0, background="#222b31"); frame = ttkb.Frame(canvas, padding=(30, 20))
         scrollbar = ttkb.Scrollbar(self.legend_frame, orient="vertical", command=canvas.yview, bootstyle="round-dark")
@@ -493,7 +416,7 @@ class CryptoMonitorApp:
         tech_frame = ttkb.LabelFrame(frame, text=" Sinais de Análise Técnica ", bootstyle="info", padding=15); tech_frame.pack(fill='x', expand=True, pady=10, anchor='w')
         create_entry(tech_frame, "SOBRECOMPRADO/ACIMA DA BANDA", "#dc3545", "Indica que o ativo foi comprado em excesso (RSI>=70) ou está acima da sua volatilidade normal.\nAumenta a probabilidade de uma correção de preço (queda).")
         create_entry(tech_frame, "SOBREVENDIDO/ABAIXO DA BANDA", "#28a745", "Indica que o ativo foi vendido em excesso (RSI<=30) ou está abaixo da sua volatilidade normal.\nAumenta a probabilidade de uma recuperação de preço (alta).")
-        create_entry(tech_frame, "Sinal MACD (1D)", "white", "Cruzamento de Alta (otimista) ou de Baixa (pessimista) no gráfico diário.")
+        create_entry(tech_frame, "Sinal MACD (1D)", "white", "Cruzamento de Alta (otimista) ou de Baixa (pessimista) no timeframe selecionado (padrão: diário).")
         create_entry(tech_frame, "Cruzamento MME (1D)", "white", "Cruz Dourada (MME 50 > 200) é um forte sinal de alta. Cruz da Morte (MME 50 < 200) é um forte sinal de baixa.")
         fund_frame = ttkb.LabelFrame(frame, text=" Indicadores Fundamentais ", bootstyle="primary", padding=15); fund_frame.pack(fill='x', expand=True, pady=10, anchor='w')
         create_entry(fund_frame, "Market Cap (MCap)", "white", "Valor total de mercado do projeto (Preço x Fornecimento Circulante).")
@@ -501,27 +424,66 @@ class CryptoMonitorApp:
         create_entry(fund_frame, "MCap/FDV Ratio", "white", "Razão entre MCap e FDV. Próximo de 1.0 indica baixa inflação futura de tokens, o que é positivo.")
         
     def load_alert_history(self):
-        try:
-            with open(self.history_path, 'r', encoding='utf-8') as f: history = json.load(f)
-            for i in self.history_tree.get_children(): self.history_tree.delete(i)
-            for record in reversed(history): self.history_tree.insert('', 0, values=(record['timestamp'], record['symbol'], record['trigger'], record['notes']))
-        except (FileNotFoundError, json.JSONDecodeError): pass
-        
-    def add_to_history(self, symbol, trigger, notes):
-        history = []; 
-        try:
-            with open(self.history_path, 'r', encoding='utf-8') as f: history = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError): pass
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        history.append({'timestamp': timestamp, 'symbol': symbol, 'trigger': trigger, 'notes': notes})
-        with open(self.history_path, 'w', encoding='utf-8') as f: json.dump(history, f, indent=2)
-        self.history_tree.insert('', 0, values=(timestamp, symbol, trigger, notes))
+        """Recarrega a aba de histórico: só a primeira página é lida; as demais vêm sob demanda na rolagem."""
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.history_oldest_id, self.history_exhausted = None, False
+        self._load_history_page()
+        self._update_history_count()
+
+    def _load_history_page(self):
+        self.history_page_pending = False
+        if self.history_exhausted: return
+        page = self.service.query_history(before_id=self.history_oldest_id, limit=HISTORY_PAGE_SIZE, **self.history_filters)
+        for record in page: self.history_tree.insert('', tk.END, values=(record['timestamp'], record['symbol'], record['trigger'], record['notes']))
+        if page: self.history_oldest_id = page[-1]['id']
+        self.history_exhausted = len(page) < HISTORY_PAGE_SIZE
+
+    def _on_history_scroll(self, first, last):
+        self.history_scrollbar.set(first, last)
+        if not self.history_exhausted and not self.history_page_pending and float(last) >= HISTORY_PREFETCH_FRACTION:
+            self.history_page_pending = True
+            self.root.after_idle(self._load_history_page)
+
+    def _update_history_count(self):
+        total = self.service.count_history(**self.history_filters)
+        self.history_count_label.config(text=f"{total} alertas" + (" (filtrado)" if self.history_filters else ""))
+
+    def _history_record_matches(self, record):
+        f = self.history_filters
+        if f.get('symbol') and record['symbol'] != f['symbol']: return False
+        if f.get('since') and record['timestamp'] < f['since']: return False
+        if f.get('until') and record['timestamp'][:10] > f['until']: return False
+        return True
+
+    def _insert_history_record(self, record):
+        if not self._history_record_matches(record): return
+        self.history_tree.insert('', 0, values=(record['timestamp'], record['symbol'], record['trigger'], record['notes']))
+        self._update_history_count()
+
+    def apply_history_filters(self, event=None):
+        filters = {}
+        symbol = self.history_symbol_entry.get().strip().upper()
+        if symbol: filters['symbol'] = symbol
+        for key, entry in (('since', self.history_since_entry), ('until', self.history_until_entry)):
+            value = entry.get().strip()
+            if not value: continue
+            try: datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                messagebox.showerror("Erro", f"Data inválida: '{value}'. Use o formato AAAA-MM-DD.", parent=self.root); return
+            filters[key] = value
+        self.history_filters = filters
+        self.load_alert_history()
+
+    def reset_history_filters(self):
+        for entry in (self.history_symbol_entry, self.history_since_entry, self.history_until_entry): entry.delete(0, tk.END)
+        self.history_filters = {}
+        self.load_alert_history()
         
     def clear_alert_history(self):
         if not messagebox.askyesno("Confirmar", "Limpar permanentemente o histórico de alertas?", parent=self.root): return
         try:
-            with open(self.history_path, 'w', encoding='utf-8') as f: json.dump([], f)
-            for i in self.history_tree.get_children(): self.history_tree.delete(i)
+            self.service.clear_history()
+            self.load_alert_history()
             messagebox.showinfo("Sucesso", "Histórico de alertas limpo.", parent=self.root)
         except Exception as e: messagebox.showerror("Erro", f"Não foi possível limpar o histórico:\n{e}", parent=self.root)
         
@@ -529,32 +491,23 @@ class CryptoMonitorApp:
         selected = self.interval_combo.get()
         if (new_sec := self.interval_map.get(selected)):
             self.config['check_interval_seconds'] = new_sec
-            if self._save_config(): self.check_interval_ms = new_sec * 1000; print(f"Intervalo alterado para {selected}.")
-            self.force_update()
+            if self._save_config():
+                self.check_interval_ms = new_sec * 1000; logger.info(f"Intervalo alterado para {selected}.")
+                self.scheduler.reschedule()
             
+    def on_timeframe_change(self, event=None):
+        """Troca o timeframe das colunas de sinais e redesenha com os dados do último ciclo."""
+        self.config['display_timeframe'] = self.timeframe_combo.get()
+        if not self._save_config(): return
+        timeframe = self.service.display_timeframe
+        self._apply_row_views({row['symbol']: build_row_view(row, timeframe) for row in self.last_rows}, timeframe=timeframe)
+
     def force_update(self):
-        print("Sincronização de dados iniciada..."); 
-        if self.update_job: self.root.after_cancel(self.update_job)
-        threading.Thread(target=self.update_prices, daemon=True).start()
-        
-    def get_24hr_ticker_data(self, symbols):
-        if not symbols: return {}
-        try:
-            params = {'symbols': json.dumps(list(symbols), separators=(',', ':'))}
-            response = requests.get("https://api.binance.com/api/v3/ticker/24hr", params=params, timeout=10)
-            response.raise_for_status()
-            return {item['symbol']: item for item in response.json()}
-        except Exception as e: print(f"--> Erro ao buscar ticker 24h da Binance: {e}"); return {}
-        
-    def get_kline_data(self, symbol, interval='1d', limit=300):
-        try:
-            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
-            response = requests.get("https://api.binance.com/api/v3/klines", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e: print(f"--> Erro ao buscar klines da Binance para '{symbol}': {e}"); return None
+        logger.info("Sincronização de dados iniciada...")
+        self.scheduler.request_refresh()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # executável congelado: processos do ShardPool ('shard_processes')
     try:
         import pandas as pd
         from pystray import MenuItem as item, Icon
@@ -563,6 +516,7 @@ if __name__ == "__main__":
         messagebox.showerror("Biblioteca Faltando", f"Biblioteca necessária não encontrada: {e.name}.\nInstale com 'pip install {e.name}'")
         sys.exit()
     
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     root = ttkb.Window(themename="cyborg")
     app = CryptoMonitorApp(root)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,143 @@
+import json
+import logging
+import threading
+import time
+
+try:
+    import websocket  # pacote 'websocket-client'
+except ImportError:
+    websocket = None
+
+logger = logging.getLogger("monitor")
+
+# --- Feed de Mercado em Tempo Real (WebSocket da Binance) ---
+
+BINANCE_WS_URL = "wss://stream.binance.com:9443"
+SUBSCRIBE_CHUNK = 200          # streams por mensagem SUBSCRIBE/UNSUBSCRIBE
+SUBSCRIBE_MESSAGE_INTERVAL = 0.25  # a Binance aceita no máximo 5 mensagens por segundo
+TICKER_MAX_AGE_SECONDS = 30
+MAX_RECONNECT_DELAY = 60
+
+class BinanceMarketStream:
+    """Assina os streams combinados miniTicker/kline da Binance e repassa cada evento recebido.
+
+    Reconecta sozinho (com backoff) quando a conexão cai e ajusta as assinaturas com
+    SUBSCRIBE/UNSUBSCRIBE sempre que a lista de símbolos muda. `base_url` permite apontar
+    para um servidor WebSocket local nos testes.
+    """
+    def __init__(self, on_ticker, on_kline=None, base_url=BINANCE_WS_URL, kline_interval='1d'):
+        self.on_ticker, self.on_kline = on_ticker, on_kline
+        self.base_url, self.kline_interval = base_url.rstrip('/'), kline_interval
+        self.lock = threading.Lock(); self.sync_lock = threading.Lock()
+        self.symbols = frozenset(); self.subscribed = set(); self.tickers = {}
+        self.symbols_changed = threading.Event(); self.stop_event = threading.Event()
+        self.ws = None; self.connected = False; self.thread = None; self.request_id = 0
+
+    @staticmethod
+    def available():
+        return websocket is not None
+
+    def start(self):
+        if self.thread and self.thread.is_alive(): return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True); self.thread.start()
+
+    def stop(self):
+        self.stop_event.set(); self.symbols_changed.set()
+        ws = self.ws
+        if ws: ws.close()
+
+    def set_symbols(self, symbols):
+        """Define os símbolos acompanhados; as assinaturas são ajustadas em segundo plano."""
+        symbols = frozenset(s.upper() for s in symbols)
+        with self.lock:
+            if symbols == self.symbols: return
+            self.symbols = symbols
+            self.tickers = {s: v for s, v in self.tickers.items() if s in symbols}
+        self.symbols_changed.set()
+        if self.connected: threading.Thread(target=self._sync_subscriptions, daemon=True).start()
+
+    def fresh_tickers(self, symbols, max_age=TICKER_MAX_AGE_SECONDS):
+        """Retorna {símbolo: ticker} apenas dos símbolos com dados recebidos há menos de `max_age` segundos."""
+        now, fresh = time.monotonic(), {}
+        with self.lock:
+            for symbol in symbols:
+                entry = self.tickers.get(symbol)
+                if entry and now - entry[0] <= max_age: fresh[symbol] = entry[1]
+        return fresh
+
+    # --- Conexão ---
+
+    def _run(self):
+        delay = 1
+        while not self.stop_event.is_set():
+            with self.lock: has_symbols = bool(self.symbols)
+            if not has_symbols:
+                self.symbols_changed.wait(); self.symbols_changed.clear(); continue
+            self.ws = websocket.WebSocketApp(f"{self.base_url}/stream", on_open=self._on_open, on_message=self._on_message,
+                                             on_error=self._on_error, on_close=self._on_close)
+            started = time.monotonic()
+            try: self.ws.run_forever(ping_interval=60, ping_timeout=10)
+            except Exception as e: logger.error(f"--> Erro no stream da Binance: {e}")
+            self.ws = None; self.connected = False
+            with self.lock: self.subscribed = set()
+            if self.stop_event.is_set(): break
+            delay = 1 if time.monotonic() - started > MAX_RECONNECT_DELAY else min(delay * 2, MAX_RECONNECT_DELAY)
+            logger.warning(f"Stream da Binance desconectado; reconectando em {delay}s.")
+            self.stop_event.wait(delay)
+
+    def _streams_for(self, symbols):
+        streams = []
+        for symbol in sorted(symbols):
+            streams.append(f"{symbol.lower()}@miniTicker")
+            if self.on_kline: streams.append(f"{symbol.lower()}@kline_{self.kline_interval}")
+        return streams
+
+    def _sync_subscriptions(self):
+        with self.sync_lock:
+            ws = self.ws
+            if ws is None or not self.connected: return
+            with self.lock:
+                wanted = set(self._streams_for(self.symbols))
+                to_add, to_remove = sorted(wanted - self.subscribed), sorted(self.subscribed - wanted)
+                self.subscribed = wanted
+            try:
+                self._send_method(ws, "UNSUBSCRIBE", to_remove)
+                self._send_method(ws, "SUBSCRIBE", to_add)
+            except Exception as e: logger.error(f"--> Erro ao atualizar assinaturas do stream: {e}")
+
+    def _send_method(self, ws, method, streams):
+        for i in range(0, len(streams), SUBSCRIBE_CHUNK):
+            self.request_id += 1
+            ws.send(json.dumps({'method': method, 'params': streams[i:i + SUBSCRIBE_CHUNK], 'id': self.request_id}))
+            time.sleep(SUBSCRIBE_MESSAGE_INTERVAL)
+
+    def _on_open(self, ws):
+        self.connected = True
+        logger.info("Stream da Binance conectado.")
+        threading.Thread(target=self._sync_subscriptions, daemon=True).start()
+
+    def _on_close(self, ws, status_code=None, message=None):
+        self.connected = False
+
+    def _on_error(self, ws, error):
+        logger.error(f"--> Erro no stream da Binance: {error}")
+
+    # --- Mensagens ---
+
+    def _on_message(self, ws, message):
+        try: data = json.loads(message)
+        except ValueError: return
+        event = data.get('data', data) if isinstance(data, dict) else None
+        if not isinstance(event, dict): return
+        try:
+            if event.get('e') == '24hrMiniTicker':
+                close, open_price = float(event['c']), float(event['o'])
+                ticker = {'symbol': event['s'], 'lastPrice': event['c'],
+                          'priceChangePercent': (close - open_price) / open_price * 100 if open_price else 0.0,
+                          'highPrice': event['h'], 'lowPrice': event['l'], 'volume': event['v'], 'quoteVolume': event['q']}
+                with self.lock: self.tickers[event['s']] = (time.monotonic(), ticker)
+                self.on_ticker(event['s'], ticker)
+            elif event.get('e') == 'kline' and self.on_kline:
+                self.on_kline(event['s'], event['k'])
+        except Exception as e: logger.error(f"--> Erro ao processar evento do stream: {e}")
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("monitor")
+
+# --- Métricas do Serviço (ciclos, APIs, alertas e notificações) ---
+
+CYCLE_WINDOW = 60          # ciclos mantidos na janela móvel do painel de status
+DEFAULT_METRICS_HOST = "127.0.0.1"
+STAGES = ('fetch', 'indicators', 'alerts')
+
+class ServiceMetrics:
+    """Contadores acumulados e uma janela móvel dos últimos `window` ciclos do MonitorService."""
+    def __init__(self, window=CYCLE_WINDOW):
+        self.lock = threading.Lock()
+        self.cycles = deque(maxlen=window)
+        self.counters = {'cycles': 0, 'partial_cycles': 0, 'alert_evaluations': 0, 'alerts_fired': 0}
+        self.duration_sum = 0.0
+        self.stage_sums = dict.fromkeys(STAGES, 0.0)
+        self.last_cycle_at = None
+
+    def record_cycle(self, stats, alerts_fired=0):
+        """Registra as estatísticas de um ciclo (MonitorService.last_cycle_stats)."""
+        with self.lock:
+            self.cycles.append({**stats, 'alerts_fired': alerts_fired, 'finished_at': time.time()})
+            self.counters['cycles'] += 1
+            if stats.get('partial'): self.counters['partial_cycles'] += 1
+            self.duration_sum += stats.get('duration', 0.0)
+            for stage in STAGES: self.stage_sums[stage] += stats.get(stage, 0.0)
+            self.last_cycle_at = time.time()
+
+    def record_evaluation(self, count=1):
+        with self.lock: self.counters['alert_evaluations'] += count
+
+    def record_fired(self, count=1):
+        with self.lock: self.counters['alerts_fired'] += count
+
+    def snapshot(self):
+        """Contadores e resumo da janela: média, p95 e máximo da duração, média por etapa e último ciclo."""
+        with self.lock:
+            cycles = list(self.cycles)
+            data = {**self.counters, 'duration_sum': self.duration_sum, 'stage_sums': dict(self.stage_sums),
+                    'last_cycle_at': self.last_cycle_at, 'window': len(cycles)}
+        durations = sorted(c.get('duration', 0.0) for c in cycles)
+        data['last'] = cycles[-1] if cycles else None
+        data['duration_avg'] = sum(durations) / len(durations) if durations else None
+        data['duration_p95'] = durations[min(len(durations) - 1, int(0.95 * len(durations)))] if durations else None
+        data['duration_max'] = durations[-1] if durations else None
+        data['stage_avg'] = {stage: sum(c.get(stage, 0.0) for c in cycles) / len(cycles) for stage in STAGES} if cycles else {}
+        return data
+
+# --- Formato Prometheus ---
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    return "NaN" if value is None else repr(float(value))
+
+def render_prometheus(service_metrics, http_metrics, notifier_metrics):
+    """Converte os snapshots de ServiceMetrics, HttpClient.metrics() e NotificationDispatcher.metrics()
+    no formato texto de exposição do Prometheus."""
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}"); lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {_number(value)}" if label_text else f"{name} {_number(value)}")
+
+    s = service_metrics
+    last = s['last'] or {}
+    metric("monitor_cycles_total", "counter", "Ciclos de monitoramento concluídos.", [({}, s['cycles'])])
+    metric("monitor_cycles_partial_total", "counter", "Ciclos com alguma etapa cortada pelo prazo.", [({}, s['partial_cycles'])])
+    lines.append("# HELP monitor_cycle_duration_seconds Duração dos ciclos de monitoramento.")
+    lines.append("# TYPE monitor_cycle_duration_seconds summary")
+    lines.append(f"monitor_cycle_duration_seconds_sum {_number(s['duration_sum'])}")
+    lines.append(f"monitor_cycle_duration_seconds_count {_number(s['cycles'])}")
+    metric("monitor_cycle_stage_seconds_total", "counter", "Tempo acumulado por etapa do ciclo.",
+           [({'stage': stage}, value) for stage, value in s['stage_sums'].items()])
+    metric("monitor_last_cycle_duration_seconds", "gauge", "Duração do último ciclo.", [({}, last.get('duration'))])
+    metric("monitor_last_cycle_timestamp_seconds", "gauge", "Horário (epoch) do fim do último ciclo.", [({}, s['last_cycle_at'])])
+    metric("monitor_symbols_processed", "gauge", "Símbolos processados no último ciclo.", [({}, last.get('symbols'))])
+    metric("monitor_alert_evaluations_total", "counter", "Avaliações de alertas por símbolo (ciclos e stream).", [({}, s['alert_evaluations'])])
+    metric("monitor_alerts_fired_total", "counter", "Alertas disparados.", [({}, s['alerts_fired'])])
+
+    endpoints = sorted(http_metrics.items())
+    metric("monitor_http_requests_total", "counter", "Requisições REST por endpoint.", [({'endpoint': e}, m['requests']) for e, m in endpoints])
+    metric("monitor_http_errors_total", "counter", "Respostas de erro e falhas de rede por endpoint.", [({'endpoint': e}, m['errors']) for e, m in endpoints])
+    metric("monitor_http_retries_total", "counter", "Novas tentativas por endpoint.", [({'endpoint': e}, m['retries']) for e, m in endpoints])
+    metric("monitor_http_weight_total", "counter", "Peso de requisição consumido por endpoint.", [({'endpoint': e}, m['weight']) for e, m in endpoints])
+    lines.append("# HELP monitor_http_request_duration_seconds Latência das requisições REST por endpoint.")
+    lines.append("# TYPE monitor_http_request_duration_seconds summary")
+    for e, m in endpoints:
+        lines.append(f'monitor_http_request_duration_seconds_sum{{endpoint="{_label(e)}"}} {_number(m["latency_total"])}')
+        lines.append(f'monitor_http_request_duration_seconds_count{{endpoint="{_label(e)}"}} {_number(m["requests"])}')
+    metric("monitor_http_request_duration_max_seconds", "gauge", "Maior latência observada por endpoint.",
+           [({'endpoint': e}, m['latency_max']) for e, m in endpoints])
+
+    n = notifier_metrics
+    metric("monitor_notifications_sent_total", "counter", "Mensagens entregues ao Telegram.", [({}, n['sent'])])
+    metric("monitor_notifications_failed_total", "counter", "Mensagens descartadas após as tentativas.", [({}, n['failed'])])
+    metric("monitor_notifications_retries_total", "counter", "Novas tentativas de entrega.", [({}, n['retries'])])
+    metric("monitor_notification_queue_depth", "gauge", "Mensagens aguardando entrega.", [({}, n['queue_depth'])])
+    metric("monitor_notification_latency_seconds", "gauge", "Latência média entre enfileirar e entregar.", [({}, n['latency_avg'])])
+    return "\n".join(lines) + "\n"
+
+# --- Endpoint HTTP ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404); return
+        try: payload = self.server.render().encode('utf-8')
+        except Exception as e:
+            logger.error(f"--> Erro ao gerar métricas: {e}"); self.send_error(500); return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers(); self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+class MetricsServer:
+    """Servidor HTTP local que expõe `render()` em /metrics para o Prometheus."""
+    def __init__(self, render, port, host=DEFAULT_METRICS_HOST):
+        self.httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+        self.httpd.daemon_threads = True; self.httpd.render = render
+        self.host, self.port = host, self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="metrics")
+        self.thread.start()
+        logger.info(f"Métricas disponíveis em http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        self.httpd.shutdown(); self.httpd.server_close()
@@ -0,0 +1,102 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+import threading
+from collections import deque
+
+from monitor_service import MonitorService
+from scheduler import CycleScheduler
+from sharding import parse_shard, write_shard_snapshot
+
+# --- Modo Headless (serviço sem interface gráfica) ---
+#
+# Executa o mesmo ciclo do Monitor (preços, indicadores, alertas, Telegram e histórico)
+# a partir do config.json, registrando tudo em log. Encerra de forma limpa com SIGINT/SIGTERM.
+
+logger = logging.getLogger("monitor")
+
+class JsonLogFormatter(logging.Formatter):
+    """Formata cada registro de log como uma linha JSON."""
+    def format(self, record):
+        entry = {'time': self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), 'level': record.levelname,
+                 'logger': record.name, 'message': record.getMessage()}
+        for key in ('symbol', 'trigger', 'notes'):
+            if hasattr(record, key): entry[key] = getattr(record, key)
+        if record.exc_info: entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def setup_logging(log_format, level):
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == 'json': handler.setFormatter(JsonLogFormatter())
+    else: handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+def log_alert(alert_data, title, message, record):
+    logger.warning(f"{title}: {record['trigger']}", extra={'symbol': record['symbol'], 'trigger': record['trigger'], 'notes': record['notes']})
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor de criptomoedas em modo headless (sem interface gráfica).")
+    parser.add_argument('--config', help="caminho do config.json (padrão: pasta da aplicação)")
+    parser.add_argument('--once', action='store_true', help="executa um único ciclo e sai")
+    parser.add_argument('--log-format', choices=('text', 'json'), default='text')
+    parser.add_argument('--log-level', default='INFO', choices=('DEBUG', 'INFO', 'WARNING', 'ERROR'))
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                        help="monitora só o shard I de N (várias instâncias com o mesmo config.json, ex.: 0/4)")
+    parser.add_argument('--data-dir', help="pasta do cache de candles, do universo de símbolos e do histórico "
+                                           "(padrão: pasta da aplicação; com --shard, PASTA_DA_APLICAÇÃO/shard-I-of-N)")
+    parser.add_argument('--snapshot-dir', help="grava o resultado de cada ciclo em PASTA/shard-I-of-N.json (junte com sharding.py)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(args.log_format, args.log_level)
+
+    stop_event = threading.Event()
+    def handle_signal(signum, frame):
+        logger.info(f"Sinal {signum} recebido; encerrando após o ciclo atual.")
+        stop_event.set()
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, 'SIGTERM'): signal.signal(signal.SIGTERM, handle_signal)
+
+    service = MonitorService(config_path=args.config, shard=args.shard, data_dir=args.data_dir)
+    service.alert_listeners.append(log_alert)
+    fired = deque()  # alertas desde o último snapshot (o stream dispara fora do ciclo)
+    if args.snapshot_dir: service.alert_listeners.append(lambda alert_data, title, message, record: fired.append(record))
+    service.load_config()
+    # Sem cache em disco o ciclo não sabe classificar os símbolos: essa primeira busca (e a de --once) é síncrona;
+    # depois o universo é revalidado em segundo plano, sem atrasar os ciclos.
+    if args.once or not service.symbol_universe.loaded: service.fetch_all_symbols()
+    if not args.once: service.start_symbol_refresh()
+    shard_text = f" (shard {args.shard[0]}/{args.shard[1]})" if args.shard else ""
+    logger.info(f"Monitor headless iniciado{shard_text}: {len(service.monitored_symbols())} símbolos, intervalo de {service.check_interval_seconds}s.")
+
+    def run_cycle():
+        rows = service.run_cycle()
+        failed = [row['symbol'] for row in rows if row['error']]
+        if failed: logger.warning(f"Sem dados para: {', '.join(failed)}")
+        if args.snapshot_dir:
+            alerts = [fired.popleft() for _ in range(len(fired))]
+            write_shard_snapshot(args.snapshot_dir, args.shard or (0, 1), rows, service.last_cycle_stats, alerts)
+
+    try:
+        if args.once:
+            try: run_cycle()
+            except Exception: logger.exception("--> Erro no ciclo de monitoramento")
+        else:
+            scheduler = CycleScheduler(run_cycle, lambda: service.check_interval_seconds)
+            scheduler.start()
+            stop_event.wait()
+            scheduler.stop(timeout=service.stage_deadline('fetch'))
+    finally:
+        service.stop()
+        logger.info("Monitor headless encerrado.")
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # executável congelado: processos do ShardPool
+    sys.exit(main())
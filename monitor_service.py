@@ -0,0 +1,640 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app_paths import get_application_path
+from http_client import HttpClient
+from candle_store import CandleStore, CLOSE, OPEN_TIME, CLOCK_MARGIN_MS, INTERVAL_MS, MAX_KLINES_PER_REQUEST, is_multiple_of, resample_candles
+from indicators import IncrementalIndicators, compute_signal_table
+from market_stream import BinanceMarketStream, BINANCE_WS_URL
+from alert_engine import AlertEngine, DEFAULT_TIMEFRAME
+from config_store import ConfigStore
+from metrics import ServiceMetrics, MetricsServer, render_prometheus, DEFAULT_METRICS_HOST
+from history_store import AlertHistoryStore
+from notifier import NotificationDispatcher, TELEGRAM_API_URL
+from symbol_universe import SymbolUniverseCache, SymbolResolver
+from symbol_search import SymbolSearchIndex
+from sharding import ShardPool, partition_symbols, shard_name, SHARD_MIN_SYMBOLS
+
+# --- Serviço de Monitoramento (sem interface gráfica) ---
+#
+# Reúne a busca de dados, os indicadores, a avaliação de alertas, o Telegram e o histórico.
+# É usado tanto pela interface (main_app.py) quanto pelo modo headless (monitor_daemon.py);
+# popups e sons ficam a cargo de quem registra um listener em `alert_listeners`.
+
+logger = logging.getLogger("monitor")
+
+KLINE_FETCH_WORKERS = 8
+KLINE_REQUEST_WEIGHT = 2
+# Prazo (segundos) de cada etapa do ciclo; sobrescrevível por 'stage_deadlines' no config.json.
+STAGE_DEADLINES = {'fetch': 45, 'indicators': 15, 'alerts': 10}
+INDICATOR_CHUNK = 256
+FUNDAMENTALS_CHUNK = 250       # tamanho máximo de página de /coins/markets
+FUNDAMENTALS_WORKERS = 3
+FUNDAMENTALS_TTL_SECONDS = 900
+UNIVERSE_RETRY_SECONDS = 600   # nova tentativa de revalidar o universo de símbolos após uma falha
+INDICATOR_CANDLES = 300        # candles por timeframe usados nos indicadores (MME 200 + folga)
+MAX_BASE_CANDLES = 10_000      # limite do histórico no intervalo base (ex.: 1h para montar 1d)
+DEFAULT_CONFIG = {"telegram_bot_token": "SEU_TOKEN_AQUI", "telegram_chat_id": "SEU_CHAT_ID_AQUI", "check_interval_seconds": 300,
+                  "timeframes": [DEFAULT_TIMEFRAME], "display_timeframe": DEFAULT_TIMEFRAME, "streaming_mode": False, "cryptos_to_monitor": []}
+
+def status_signals(signals_by_timeframe):
+    """{timeframe: sinais} de uma linha -> conjunto de pares (timeframe, sinal) avaliado pelo AlertEngine."""
+    return {(timeframe, value) for timeframe, sig in signals_by_timeframe.items()
+            for value in (sig['rsi_signal'], sig['bollinger_signal'], f"MACD: {sig['macd']}", sig['mme'])}
+
+class MonitorService:
+    """Pipeline de monitoramento: config.json, busca de preços/klines, sinais, alertas, Telegram e histórico.
+
+    `run_cycle()` executa um ciclo completo e devolve uma linha por símbolo monitorado; cada alerta
+    disparado é repassado aos callbacks de `alert_listeners` como (alert_data, title, message, record).
+
+    Os arquivos de estado (cache de candles, universo de símbolos e histórico) ficam em `data_dir`; com
+    `shard` e sem `data_dir` cada shard usa a sua pasta (base_path/shard-I-of-N), para que instâncias na
+    mesma máquina não descartem nem sobrescrevam os dados umas das outras. O config.json é compartilhado.
+    """
+    def __init__(self, base_path=None, config_path=None, shard=None, data_dir=None):
+        base_path = base_path or get_application_path()
+        self.config_path = config_path or os.path.join(base_path, "config.json")
+        if data_dir is None: data_dir = os.path.join(base_path, shard_name(shard)) if shard else base_path
+        os.makedirs(data_dir, exist_ok=True)
+        self.data_dir = data_dir
+        # O alert_history.json antigo só é migrado para o histórico da pasta da aplicação (e não uma vez por shard).
+        legacy_json_path = os.path.join(base_path, "alert_history.json") if data_dir == base_path else None
+        self.history = AlertHistoryStore(os.path.join(data_dir, "alert_history.db"), legacy_json_path=legacy_json_path)
+        self.config = {}
+        self.current_prices = {}
+        self.ticker_24h_data = {}
+        self.fundamental_data = {}
+        self.fundamentals_cache = {}  # id da CoinGecko -> (buscado_em, dados de /coins/markets)
+        self.fundamentals_lock = threading.Lock()
+        self.symbol_resolver = SymbolResolver([], [])
+        self.symbol_search_index = SymbolSearchIndex()
+        self.symbol_universe = SymbolUniverseCache(os.path.join(data_dir, "symbol_universe.json"))
+        self.universe_thread = None
+        self.universe_stop = threading.Event()
+        self.alert_listeners = []
+        self.http = HttpClient(pool_size=KLINE_FETCH_WORKERS + 2)
+        self.base_path = base_path
+        self.timeframes = [DEFAULT_TIMEFRAME]
+        self.candle_store = None
+        self._configure_candle_store()
+        self.market_stream = None
+        self.indicator_engines = {}   # (símbolo, timeframe) -> IncrementalIndicators, para os alertas de status no stream
+        self.alert_engine = AlertEngine()
+        # O AlertEngine grava 'triggered_now' nos alertas do config: os snapshots usam o mesmo lock.
+        self.config_store = ConfigStore(self.config_path, lock=self.alert_engine.lock, on_reload=self._on_config_file_changed)
+        self.config_listeners = []
+        # Executor persistente: buscas que estouram o prazo continuam em segundo plano sem travar o ciclo.
+        self.fetch_executor = ThreadPoolExecutor(max_workers=KLINE_FETCH_WORKERS + 2, thread_name_prefix="fetch")
+        self.last_cycle_stats = {}
+        self.metrics = ServiceMetrics()
+        self.metrics_server = None
+        self.shard = shard            # (índice, total): esta instância monitora só os símbolos do seu shard
+        self.shard_pool = None        # processos de indicadores ('shard_processes' no config.json)
+        # Aplicar o config (inclusive recargas vindas da thread do ConfigStore) troca cache, stream e pool;
+        # o ciclo lê esses objetos sob o mesmo lock e usa as suas cópias locais até o fim.
+        self.apply_lock = threading.RLock()
+        self.notifier = NotificationDispatcher()
+        # Com o cache em disco o primeiro ciclo já classifica os símbolos, mesmo offline.
+        if self.symbol_universe.loaded: self._apply_symbol_universe()
+
+    def stage_deadline(self, stage):
+        return self.config.get("stage_deadlines", {}).get(stage, STAGE_DEADLINES[stage])
+
+    @property
+    def check_interval_seconds(self):
+        return self.config.get("check_interval_seconds", 300)
+
+    # --- Configuração ---
+
+    def load_config(self):
+        """Lê o config.json (criando um padrão se necessário), rearma os alertas e recompila o índice."""
+        try: self.config = self.config_store.load()
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.config = json.loads(json.dumps(DEFAULT_CONFIG))
+            self.config_store.save(self.config)
+            if not self.config_store.flush(): logger.error("--> Erro ao criar 'config.json'.")
+        for crypto in self.config.get("cryptos_to_monitor", []):
+            for alert in crypto.get("alerts", []): alert['triggered_now'] = False
+        with self.apply_lock: self._apply_config()
+        self.config_store.start()
+
+    def _apply_config(self):
+        """Propaga o config atual para o índice de alertas, o universo de símbolos, o cache e o stream (com `apply_lock`)."""
+        self.alert_engine.rebuild(self.config.get("cryptos_to_monitor", []))
+        self.indicator_engines = {}
+        if self.symbol_universe.loaded: self._apply_symbol_universe()  # aplica 'coingecko_id_overrides'
+        self.notifier.base_url = self.config.get("telegram_api_url", TELEGRAM_API_URL).rstrip('/')
+        self.history.set_retention(self.config.get("history_retention_days"), self.config.get("history_max_records"))
+        self._configure_candle_store()
+        self.candle_store.discard(self.monitored_symbols())
+        self.configure_market_stream()
+        self.configure_metrics_server()
+        self.configure_shard_pool()
+
+    def save_config(self, wait=False):
+        """Agenda a gravação do config.json (atômica, agrupada com edições próximas) e recompila o índice de alertas.
+
+        Com `wait=True` (edições feitas pelo usuário) grava imediatamente e retorna False se a gravação
+        falhou; o motivo fica em `config_store.last_error`. O config em memória já é o novo de qualquer forma.
+        """
+        self.config_store.save(self.config)
+        self.alert_engine.rebuild(self.config.get("cryptos_to_monitor", []))
+        self.indicator_engines = {}
+        if self.candle_store is not None:
+            with self.apply_lock:
+                self._configure_candle_store()  # novos alertas podem exigir outro timeframe
+                self.candle_store.discard(self.monitored_symbols())
+                self.configure_market_stream()
+        return self.config_store.flush() if wait else True
+
+    def _on_config_file_changed(self, config):
+        """Recarga a quente de um config.json editado por outro programa (thread do ConfigStore).
+
+        Alertas que continuam iguais herdam 'triggered_now', para não dispararem de novo só pela recarga.
+        """
+        def key(symbol, alert): return symbol, json.dumps({k: v for k, v in alert.items() if k != 'triggered_now'}, sort_keys=True)
+        with self.alert_engine.lock:
+            triggered = {key(c['symbol'], a) for c in self.config.get("cryptos_to_monitor", []) for a in c.get("alerts", []) if a.get('triggered_now')}
+        for crypto in config.get("cryptos_to_monitor", []):
+            for alert in crypto.get("alerts", []): alert['triggered_now'] = key(crypto['symbol'], alert) in triggered
+        with self.apply_lock:
+            self.config = config
+            self._apply_config()
+        for listener in list(self.config_listeners):
+            try: listener(config)
+            except Exception as e: logger.error(f"--> Erro ao aplicar o config recarregado: {e}")
+
+    # --- Timeframes ---
+
+    @property
+    def display_timeframe(self):
+        """Timeframe dos sinais exibidos nas colunas do Monitor."""
+        timeframe = self.config.get("display_timeframe", DEFAULT_TIMEFRAME)
+        return timeframe if timeframe in self.timeframes else self.timeframes[-1]
+
+    def _wanted_timeframes(self):
+        """Timeframes do config.json mais os usados por alertas de status, do menor para o maior."""
+        wanted = set(self.config.get("timeframes", [DEFAULT_TIMEFRAME]))
+        wanted.add(self.config.get("display_timeframe", DEFAULT_TIMEFRAME))
+        for crypto in self.config.get("cryptos_to_monitor", []):
+            for alert in crypto.get("alerts", []):
+                if alert.get("type") == "status": wanted.add(alert.get("timeframe", DEFAULT_TIMEFRAME))
+        invalid = sorted(t for t in wanted if t not in INTERVAL_MS)
+        if invalid: logger.warning(f"Aviso: timeframes desconhecidos ignorados: {', '.join(invalid)}")
+        return sorted((t for t in wanted if t in INTERVAL_MS), key=INTERVAL_MS.get) or [DEFAULT_TIMEFRAME]
+
+    def _configure_candle_store(self):
+        """Escolhe o intervalo base (o maior do qual todos os timeframes são múltiplos) e ajusta o cache.
+
+        Só o intervalo base é baixado da Binance; os demais timeframes são montados localmente.
+        """
+        self.timeframes = self._wanted_timeframes()
+        base = next(c for c in sorted(INTERVAL_MS, key=INTERVAL_MS.get, reverse=True)
+                    if all(is_multiple_of(t, c) for t in self.timeframes))
+        needed = max((INDICATOR_CANDLES + 1) * INTERVAL_MS[t] // INTERVAL_MS[base] for t in self.timeframes)
+        if needed > MAX_BASE_CANDLES:
+            logger.warning(f"Aviso: histórico em {base} limitado a {MAX_BASE_CANDLES} candles; timeframes maiores terão menos candles.")
+        max_candles = min(needed, MAX_BASE_CANDLES)
+        store = self.candle_store
+        if store is None or store.interval != base:
+            if store is not None: store.save()
+            self.candle_store = CandleStore(os.path.join(self.data_dir, f"kline_cache_{base}.npz"), interval=base, max_candles=max_candles)
+        else: store.max_candles = max_candles
+
+    def monitored_symbols(self):
+        symbols = list({c['symbol'] for c in self.config.get("cryptos_to_monitor", [])})
+        if self.shard: symbols = partition_symbols(symbols, self.shard[1])[self.shard[0]]
+        return symbols
+
+    # --- Universo de Símbolos ---
+
+    def fetch_all_symbols(self, force=False):
+        """Revalida o cache do universo de símbolos (se vencido) e aplica o resultado."""
+        if self.symbol_universe.refresh(self.http, force=force) or not self.all_symbols_list:
+            self._apply_symbol_universe()
+
+    def start_symbol_refresh(self):
+        """Inicia a thread que revalida o universo de símbolos quando o cache vence, fora do ciclo e da interface."""
+        if self.universe_thread and self.universe_thread.is_alive(): return
+        self.universe_stop.clear()
+        self.universe_thread = threading.Thread(target=self._symbol_refresh_loop, name="symbol-universe", daemon=True)
+        self.universe_thread.start()
+
+    def _symbol_refresh_loop(self):
+        while not self.universe_stop.is_set():
+            if self.symbol_universe.is_stale() or not self.all_symbols_list:
+                try: self.fetch_all_symbols()
+                except Exception as e: logger.error(f"--> Erro ao revalidar o universo de símbolos: {e}")
+            # Dorme até o cache vencer; se a revalidação falhou (cache ainda vencido), tenta de novo mais tarde.
+            self.universe_stop.wait(self.symbol_universe.seconds_until_stale() or UNIVERSE_RETRY_SECONDS)
+
+    def _apply_symbol_universe(self):
+        with self.apply_lock:
+            self.symbol_resolver = self.symbol_universe.resolver(self.config.get("coingecko_id_overrides"))
+            self.symbol_search_index = SymbolSearchIndex(self.symbol_resolver.all_symbols)
+            if self.market_stream: self.configure_market_stream()
+
+    @property
+    def all_symbols_list(self): return self.symbol_resolver.all_symbols
+
+    @property
+    def symbol_source_map(self): return self.symbol_resolver.source_map
+
+    @property
+    def coin_gecko_ids(self): return self.symbol_resolver.coin_gecko_ids
+
+    def get_coingecko_id(self, symbol):
+        return self.symbol_resolver.get_coingecko_id(symbol)
+
+    # --- Busca de Dados ---
+
+    def _fetch_fundamental_data(self, coingecko_ids, price_ids=()):
+        """Retorna {id: dados de /coins/markets}, buscando só os ids vencidos no cache.
+
+        Market cap e FDV mudam devagar e ficam em cache por 'fundamentals_ttl_seconds'; os ids em
+        `price_ids` (moedas monitoradas pela CoinGecko, cujo preço vem daqui) são sempre buscados.
+        Os ids vencidos são pedidos em lotes de FUNDAMENTALS_CHUNK, em paralelo; se um lote falhar,
+        os dados anteriores desses ids continuam valendo.
+        """
+        if not coingecko_ids: return {}
+        ttl, now = self.config.get("fundamentals_ttl_seconds", FUNDAMENTALS_TTL_SECONDS), time.time()
+        wanted, price_ids = set(coingecko_ids), set(price_ids)
+        with self.fundamentals_lock:
+            stale = sorted(cg_id for cg_id in wanted
+                           if cg_id in price_ids or now - self.fundamentals_cache.get(cg_id, (0.0, None))[0] >= ttl)
+        chunks = [stale[i:i + FUNDAMENTALS_CHUNK] for i in range(0, len(stale), FUNDAMENTALS_CHUNK)]
+        if chunks:
+            with ThreadPoolExecutor(max_workers=min(FUNDAMENTALS_WORKERS, len(chunks))) as executor:
+                for items in executor.map(self._fetch_fundamentals_chunk, chunks):
+                    with self.fundamentals_lock:
+                        for item in items: self.fundamentals_cache[item['id']] = (now, item)
+        with self.fundamentals_lock:
+            return {cg_id: self.fundamentals_cache[cg_id][1] for cg_id in wanted if cg_id in self.fundamentals_cache}
+
+    def _fetch_fundamentals_chunk(self, ids):
+        try:
+            params = {'vs_currency': 'usd', 'ids': ",".join(ids), 'per_page': FUNDAMENTALS_CHUNK, 'price_change_percentage': '24h'}
+            return self.http.get_json("https://api.coingecko.com/api/v3/coins/markets", params=params, timeout=15)
+        except Exception as e:
+            logger.error(f"--> Erro ao buscar dados fundamentais da CoinGecko: {e}"); return []
+
+    def get_24hr_ticker_data(self, symbols):
+        if not symbols: return {}
+        try:
+            params = {'symbols': json.dumps(list(symbols), separators=(',', ':'))}
+            weight = 2 if len(symbols) <= 20 else 40 if len(symbols) <= 100 else 80
+            data = self.http.get_json("https://api.binance.com/api/v3/ticker/24hr", params=params, timeout=10, weight=weight)
+            return {item['symbol']: item for item in data}
+        except Exception as e: logger.error(f"--> Erro ao buscar ticker 24h da Binance: {e}"); return {}
+
+    def get_kline_data(self, symbol, interval='1d', limit=300, start_time=None):
+        try:
+            params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+            if start_time is not None: params['startTime'] = start_time
+            return self.http.get_json("https://api.binance.com/api/v3/klines", params=params, timeout=10, weight=KLINE_REQUEST_WEIGHT)
+        except Exception as e: logger.error(f"--> Erro ao buscar klines da Binance para '{symbol}': {e}"); return None
+
+    def _fetch_klines(self, symbol, interval, limit, start_time=None):
+        """Como get_kline_data, mas pagina pedidos acima de MAX_KLINES_PER_REQUEST candles."""
+        if limit <= MAX_KLINES_PER_REQUEST or start_time is None: return self.get_kline_data(symbol, interval, min(limit, MAX_KLINES_PER_REQUEST), start_time)
+        klines = []
+        while limit > 0:
+            page = self.get_kline_data(symbol, interval, min(limit, MAX_KLINES_PER_REQUEST), start_time)
+            if page is None: return klines or None
+            klines.extend(page)
+            if len(page) < MAX_KLINES_PER_REQUEST: break
+            limit -= len(page); start_time = int(page[-1][0]) + INTERVAL_MS[interval]
+        return klines
+
+    def fetch_klines_batch(self, symbols, timeout=None, store=None):
+        """Atualiza em paralelo o cache de candles dos símbolos, baixando só os candles novos.
+
+        Devolve {símbolo: matriz de candles} (None quando a busca do símbolo falhou). Se `timeout`
+        vencer, os símbolos pendentes usam os candles já em cache; a resposta atrasada ainda é
+        incorporada ao cache quando chegar.
+        """
+        if not symbols: return {}
+        store = store or self.candle_store
+        futures = {symbol: self.fetch_executor.submit(self._fetch_klines, symbol, store.interval, **store.build_request(symbol)) for symbol in symbols}
+        wait(futures.values(), timeout=timeout)
+        candles_by_symbol, late = {}, []
+        for symbol, future in futures.items():
+            if not future.done():
+                late.append(symbol)
+                future.add_done_callback(lambda f, symbol=symbol: f.result() is not None and store.merge(symbol, f.result()))
+                candles_by_symbol[symbol] = store.get_candles(symbol); continue
+            klines = future.result()
+            if klines is None: candles_by_symbol[symbol] = None; continue
+            store.merge(symbol, klines)
+            candles_by_symbol[symbol] = store.get_candles(symbol)
+        if late: logger.warning(f"Prazo de busca de klines excedido; {len(late)} símbolo(s) usam candles em cache.")
+        store.save()
+        return candles_by_symbol
+
+    # --- Ciclo de Monitoramento ---
+
+    def run_cycle(self):
+        """Executa um ciclo completo (busca, indicadores e alertas) e devolve as linhas do Monitor.
+
+        Cada linha é um dicionário com 'symbol', 'd_symbol', 'error' e, quando há dados, 'price',
+        'change_24h', 'rsi_signal', 'bollinger_signal', 'macd', 'mme' (do timeframe exibido),
+        'signals' ({timeframe: sinais}), 'market_cap' e 'fdv'.
+        """
+        cycle_start = time.perf_counter()
+        # O config pode mudar durante o ciclo (diálogos, recarga do arquivo): cache, timeframes, stream e pool são fixados aqui.
+        with self.apply_lock:
+            store, timeframes, market_stream, shard_pool = self.candle_store, list(self.timeframes), self.market_stream, self.shard_pool
+            all_symbols_to_monitor = self.monitored_symbols()
+        if not all_symbols_to_monitor: return []
+
+        binance_symbols = [s for s in all_symbols_to_monitor if self.symbol_source_map.get(s) == 'binance']
+        coingecko_ids = [s for s in all_symbols_to_monitor if self.symbol_source_map.get(s) == 'coingecko']
+
+        # Etapa de busca: fundamentos, ticker 24h e klines em paralelo, limitados ao prazo da etapa.
+        fetch_deadline = cycle_start + self.stage_deadline('fetch')
+        all_cg_ids_for_fundamentals = [cg_id for symbol in all_symbols_to_monitor if (cg_id := self.get_coingecko_id(symbol))]
+        fundamentals_future = self.fetch_executor.submit(self._fetch_fundamental_data, all_cg_ids_for_fundamentals, coingecko_ids)
+        if market_stream: market_stream.set_symbols(binance_symbols)
+        streamed = market_stream.fresh_tickers(binance_symbols) if market_stream else {}
+        ticker_future = self.fetch_executor.submit(self.get_24hr_ticker_data, [s for s in binance_symbols if s not in streamed])
+        candles_by_symbol = self.fetch_klines_batch(binance_symbols, timeout=max(0, fetch_deadline - time.perf_counter()), store=store)
+        partial = []
+        done, _ = wait([fundamentals_future, ticker_future], timeout=max(0, fetch_deadline - time.perf_counter()))
+        # Etapas que não terminaram no prazo mantêm os dados do ciclo anterior.
+        if fundamentals_future in done: self.fundamental_data = fundamentals_future.result()
+        else: partial.append('fundamentos')
+        if ticker_future in done: self.ticker_24h_data = {**ticker_future.result(), **streamed}
+        else: self.ticker_24h_data = {**self.ticker_24h_data, **streamed}; partial.append('ticker 24h')
+        if partial: logger.warning(f"Prazo da etapa de busca excedido ({', '.join(partial)}); usando dados do ciclo anterior.")
+        fetch_elapsed = time.perf_counter() - cycle_start
+
+        ready = [s for s in binance_symbols if candles_by_symbol.get(s) is not None and s in self.ticker_24h_data]
+        # Etapa de indicadores: em blocos, para que um estouro de prazo ainda entregue os blocos prontos.
+        indicators_start = time.perf_counter()
+        indicators_deadline = indicators_start + self.stage_deadline('indicators')
+        signal_tables = {timeframe: {} for timeframe in timeframes}
+        base = store.interval
+        if shard_pool and len(ready) >= SHARD_MIN_SYMBOLS:
+            complete = self._compute_signals_sharded(shard_pool, ready, candles_by_symbol, base, timeframes, signal_tables, indicators_deadline)
+            if complete is not None:
+                if not complete: partial.append('indicadores')
+                ready = []  # já calculados (ou descartados pelo prazo) nos processos dos shards
+        for i in range(0, len(ready), INDICATOR_CHUNK):
+            if time.perf_counter() > indicators_deadline:
+                logger.warning(f"Prazo da etapa de indicadores excedido; {len(ready) - i} símbolo(s) sem sinais neste ciclo.")
+                partial.append('indicadores'); break
+            chunk = ready[i:i + INDICATOR_CHUNK]
+            prices = [float(self.ticker_24h_data[s].get('lastPrice', 0)) for s in chunk]
+            for timeframe in timeframes:
+                closes = [resample_candles(candles_by_symbol[s], base, timeframe)[-INDICATOR_CANDLES:, CLOSE] for s in chunk]
+                signal_tables[timeframe].update(compute_signal_table(chunk, closes, prices))
+        indicators_elapsed = time.perf_counter() - indicators_start
+
+        for cg_id in coingecko_ids:
+            if cg_id in self.fundamental_data:
+                item = self.fundamental_data[cg_id]
+                self.ticker_24h_data[item['id']] = {
+                    'symbol': item['id'],
+                    'lastPrice': item.get('current_price', 0),
+                    'priceChangePercent': item.get('price_change_percentage_24h_in_currency', 0)
+                }
+
+        rows = []
+        for symbol in all_symbols_to_monitor:
+            source_data = self.ticker_24h_data.get(symbol)
+            if not source_data:
+                rows.append({'symbol': symbol, 'd_symbol': symbol, 'error': True}); continue
+
+            price = float(source_data.get('lastPrice', 0))
+            change_24h = float(source_data.get('priceChangePercent', 0)) if source_data.get('priceChangePercent') is not None else 0.0
+            self.current_prices[symbol] = price
+
+            fund_data = self.fundamental_data.get(self.get_coingecko_id(symbol))
+            signals_by_timeframe = {}
+            if self.symbol_source_map.get(symbol) == 'binance':
+                for timeframe, table in signal_tables.items():
+                    if symbol not in table: continue
+                    signals = table[symbol]
+                    signals_by_timeframe[timeframe] = {'rsi_signal': signals['rsi_signal'], 'bollinger_signal': signals['bollinger_signal'],
+                                                       'macd': signals['macd'], 'mme': signals['mme'] or "N/A"}
+            shown = signals_by_timeframe.get(self.display_timeframe, {'rsi_signal': "", 'bollinger_signal': "", 'macd': "N/A", 'mme': "N/A"})
+
+            d_symbol = symbol.upper() if self.symbol_source_map.get(symbol) == 'binance' else f"{fund_data.get('symbol', symbol).upper()} (CG)"
+            rows.append({'symbol': symbol, 'd_symbol': d_symbol, 'error': False, 'price': price, 'change_24h': change_24h,
+                         **shown, 'signals': signals_by_timeframe,
+                         'market_cap': fund_data.get('market_cap') if fund_data else None,
+                         'fdv': fund_data.get('fully_diluted_valuation') if fund_data else None})
+
+        alerts_start = time.perf_counter()
+        alerts_deadline = alerts_start + self.stage_deadline('alerts')
+        evaluated = fired = 0
+        for row in rows:
+            if time.perf_counter() > alerts_deadline:
+                logger.warning(f"Prazo da etapa de alertas excedido; {len(rows) - evaluated} símbolo(s) ficam para o próximo ciclo.")
+                break
+            evaluated += 1
+            if not row['error']:
+                fired += self.evaluate_alerts(row['symbol'], row['d_symbol'], row['price'], status_signals(row['signals']))
+        self.notifier.flush()  # um único envio por chat com todos os alertas do ciclo
+        duration = time.perf_counter() - cycle_start
+        self.last_cycle_stats = {'duration': duration, 'fetch': fetch_elapsed, 'indicators': indicators_elapsed,
+                                 'alerts': time.perf_counter() - alerts_start, 'symbols': len(all_symbols_to_monitor),
+                                 'partial': bool(partial) or evaluated < len(rows)}
+        self.metrics.record_cycle(self.last_cycle_stats, alerts_fired=fired)
+        logger.info(f"Ciclo concluído em {duration:.2f}s "
+                    f"(busca: {fetch_elapsed:.2f}s, {len(all_symbols_to_monitor)} símbolos).")
+        return rows
+
+    def _compute_signals_sharded(self, shard_pool, symbols, candles_by_symbol, base, timeframes, signal_tables, deadline):
+        """Etapa de indicadores no ShardPool: reamostra aqui e calcula os sinais de cada shard em outro processo.
+
+        Preenche `signal_tables` com os shards que terminaram até `deadline` e retorna False se algum ficou
+        de fora. Retorna None se o pool não está disponível (o ciclo calcula os sinais no próprio processo),
+        inclusive quando uma recarga do config o fechou durante o ciclo.
+        """
+        prices = [float(self.ticker_24h_data[s].get('lastPrice', 0)) for s in symbols]
+        closes = {timeframe: [resample_candles(candles_by_symbol[s], base, timeframe)[-INDICATOR_CANDLES:, CLOSE] for s in symbols]
+                  for timeframe in timeframes}
+        try: futures = shard_pool.submit(symbols, closes, prices, INDICATOR_CHUNK)
+        except (BrokenProcessPool, RuntimeError) as e:
+            if self._replace_broken_shard_pool(shard_pool): logger.error(f"--> Erro no pool de shards ({e}); recriando o pool.")
+            return None
+        done, pending = wait(futures, timeout=max(0, deadline - time.perf_counter()))
+        broken = False
+        missing = sum(len(futures[f]) for f in pending)
+        for future in done:
+            try: tables = future.result()
+            except BrokenProcessPool as e:
+                logger.error(f"--> Erro no processo de um shard: {e}"); missing += len(futures[future]); broken = True; continue
+            for timeframe, table in tables.items(): signal_tables[timeframe].update(table)
+        for future in pending: future.cancel()
+        if broken: self._replace_broken_shard_pool(shard_pool)
+        elif missing: logger.warning(f"Prazo da etapa de indicadores excedido; {missing} símbolo(s) sem sinais neste ciclo.")
+        return not missing
+
+    # --- Alertas ---
+
+    def evaluate_alerts(self, symbol, d_symbol, price, signals=None):
+        """Avalia os alertas do símbolo e dispara os que acabaram de ser atingidos.
+
+        Com `signals=None` (ticks do stream) só os alertas de preço são avaliados; os de status
+        mantêm o estado do último ciclo completo. Retorna quantos alertas dispararam.
+        """
+        if signals is not None and self.symbol_source_map.get(symbol) != 'binance': signals = ()
+        fired = self.alert_engine.evaluate(symbol, price, signals)
+        self.metrics.record_evaluation()
+        for alert in fired:
+            self.trigger_alert({**alert, 'symbol': d_symbol, 'original_symbol': symbol})
+        return len(fired)
+
+    def trigger_alert(self, alert_data):
+        symbol, o_symbol = alert_data.get('symbol'), alert_data.get('original_symbol')
+        a_type = alert_data.get("type", "N/A"); notes = alert_data.get("notes", "Sem observações.")
+        price = self.current_prices.get(o_symbol, 0)
+        title = f"ALERTA: {symbol}"
+        if a_type in ['high', 'low']:
+            a_price = alert_data.get("price", 0)
+            msg = (f"{symbol} atingiu alvo de {a_type.upper()} em ${a_price:,.2f}!\nPreço: ${price:,.2f}\n\nObs: {notes}")
+            tg_msg = (f"🔔 *ALERTA PREÇO: {symbol}*\n\nAtingiu *{a_type.upper()}* em *${a_price:,.2f}*.\nPreço: `${price:,.2f}`\nObs: _{notes}_")
+            h_trigger = f"{a_type.upper()} @ ${a_price:,.2f}"
+        else: # status
+            a_value = alert_data.get("value", "N/A")
+            timeframe = alert_data.get("timeframe", DEFAULT_TIMEFRAME)
+            if timeframe != DEFAULT_TIMEFRAME: a_value = f"{a_value} [{timeframe}]"
+            msg = (f"Sinal Técnico para {symbol}!\n\nStatus: {a_value}\nPreço: ${price:,.2f}\n\nObs: {notes}")
+            tg_msg = (f"📈 *SINAL TÉCNICO: {symbol}*\n\nStatus: *{a_value}*\nPreço: `${price:,.2f}`\nObs: _{notes}_")
+            h_trigger = f"Status: {a_value}"
+        logger.info(f"Alerta disparado: {symbol} - {h_trigger}")
+        self.metrics.record_fired()
+        record = self.add_to_history(symbol, h_trigger, notes)
+        for listener in list(self.alert_listeners):
+            try: listener(alert_data, title, msg, record)
+            except Exception as e: logger.error(f"--> Erro ao notificar alerta: {e}")
+        self.notifier.enqueue(self.config.get('telegram_bot_token'), self.config.get('telegram_chat_id'), tg_msg)
+
+    # --- Histórico ---
+
+    def load_history(self, limit=None):
+        """Retorna o histórico em ordem cronológica (os `limit` alertas mais recentes, se informado)."""
+        return self.history.query(limit=limit)[::-1]
+
+    def query_history(self, symbol=None, since=None, until=None, before_id=None, limit=None):
+        """Página do histórico, do alerta mais recente para o mais antigo (ver AlertHistoryStore.query)."""
+        return self.history.query(symbol=symbol, since=since, until=until, before_id=before_id, limit=limit)
+
+    def count_history(self, symbol=None, since=None, until=None):
+        return self.history.count(symbol=symbol, since=since, until=until)
+
+    def add_to_history(self, symbol, trigger, notes):
+        return self.history.append(symbol, trigger, notes)
+
+    def clear_history(self):
+        self.history.clear()
+
+    # --- Streaming ---
+
+    def configure_market_stream(self):
+        """Liga ou desliga o modo streaming conforme 'streaming_mode' no config.json."""
+        enabled = self.config.get("streaming_mode", False)
+        if self.market_stream and self.market_stream.kline_interval != self.candle_store.interval:
+            self.market_stream.stop(); self.market_stream = None  # intervalo base mudou: reassina os streams
+        if enabled and not self.market_stream:
+            if not BinanceMarketStream.available():
+                logger.warning("Aviso: o modo streaming requer a biblioteca 'websocket-client' (pip install websocket-client)."); return
+            self.market_stream = BinanceMarketStream(self._on_stream_ticker, self._on_stream_kline,
+                                                     base_url=self.config.get("binance_ws_url", BINANCE_WS_URL),
+                                                     kline_interval=self.candle_store.interval)
+            self.market_stream.start()
+        elif not enabled and self.market_stream:
+            self.market_stream.stop(); self.market_stream = None
+        if self.market_stream:
+            self.market_stream.set_symbols([s for s in self.monitored_symbols() if self.symbol_source_map.get(s) == 'binance'])
+
+    def _on_stream_ticker(self, symbol, ticker):
+        # Thread do stream: ticker_24h_data é só do ciclo, que lê os tickers do stream via fresh_tickers() (sob o lock do stream).
+        price = float(ticker['lastPrice']); self.current_prices[symbol] = price
+        self.evaluate_alerts(symbol, symbol.upper(), price)
+
+    def _on_stream_kline(self, symbol, kline):
+        store = self.candle_store
+        if kline.get('i', store.interval) != store.interval: return  # stream antigo, de outro intervalo
+        if not len(store.get_closed(symbol)): return  # histórico ainda não baixado pelo ciclo de polling
+        row = [kline['t'], kline['o'], kline['h'], kline['l'], kline['c'], kline['v'], kline['T']]
+        # Candle final (x=True): força a classificação como fechado para entrar no histórico.
+        store.merge(symbol, [row], now_ms=kline['T'] + CLOCK_MARGIN_MS + 1 if kline.get('x') else None)
+        self._evaluate_stream_signals(symbol)
+
+    def _evaluate_stream_signals(self, symbol):
+        """Reavalia os alertas de status de `symbol` a cada kline do stream, sem esperar o próximo ciclo.
+
+        Os indicadores vêm de um IncrementalIndicators por timeframe, alimentado só com os candles
+        fechados novos; o candle aberto entra como pendente, como no ciclo (últimos INDICATOR_CANDLES).
+        """
+        timeframes = self.alert_engine.status_timeframes(symbol)
+        if not timeframes: return
+        store, engines = self.candle_store, self.indicator_engines
+        candles = store.get_candles(symbol)
+        if candles is None: return
+        price = self.current_prices.get(symbol, float(candles[-1, CLOSE]))
+        signals_by_timeframe = {}
+        for timeframe in timeframes:
+            resampled = resample_candles(candles, store.interval, timeframe)
+            if not len(resampled): return  # sem histórico suficiente: os alertas de status ficam para o ciclo
+            engine = engines.get((symbol, timeframe))
+            if engine is None: engine = engines[(symbol, timeframe)] = IncrementalIndicators(window=INDICATOR_CANDLES)
+            engine.sync(resampled[:-1, OPEN_TIME].tolist(), resampled[:-1, CLOSE])
+            signals = engine.signals(resampled[-1:, CLOSE], price)
+            signals_by_timeframe[timeframe] = {**signals, 'mme': signals['mme'] or "N/A"}
+        self.evaluate_alerts(symbol, symbol.upper(), price, status_signals(signals_by_timeframe))
+
+    # --- Métricas ---
+
+    def metrics_text(self):
+        """Métricas do serviço no formato de exposição do Prometheus."""
+        return render_prometheus(self.metrics.snapshot(), self.http.metrics(), self.notifier.metrics())
+
+    def status_snapshot(self):
+        """Resumo para o painel de status: janela de ciclos, uso das APIs e fila de notificações."""
+        return {'cycles': self.metrics.snapshot(), 'http': self.http.metrics(), 'notifier': self.notifier.metrics()}
+
+    def configure_metrics_server(self):
+        """Liga, troca de porta ou desliga o endpoint /metrics conforme 'metrics_port' no config.json."""
+        port, host = self.config.get("metrics_port"), self.config.get("metrics_host", DEFAULT_METRICS_HOST)
+        server = self.metrics_server
+        if server and (not port or (server.host, server.port) != (host, port)):
+            server.stop(); self.metrics_server = server = None
+        if port and not server:
+            try: self.metrics_server = MetricsServer(self.metrics_text, port, host)
+            except OSError as e: logger.error(f"--> Erro ao abrir o endpoint de métricas em {host}:{port}: {e}")
+
+    def configure_shard_pool(self):
+        """Cria, redimensiona ou desliga o pool de processos de indicadores conforme 'shard_processes' no config.json."""
+        processes = int(self.config.get("shard_processes") or 0)
+        if self.shard_pool and self.shard_pool.processes != processes:
+            self.shard_pool.close(); self.shard_pool = None
+        if processes > 1 and not self.shard_pool: self.shard_pool = ShardPool(processes)
+
+    def _replace_broken_shard_pool(self, shard_pool):
+        """Recria o pool que falhou; retorna False se uma recarga do config já o substituiu ou desligou."""
+        with self.apply_lock:
+            if self.shard_pool is not shard_pool: return False
+            shard_pool.close(); self.shard_pool = None; self.configure_shard_pool()
+            return True
+
+    def stop(self):
+        self.universe_stop.set()
+        self.config_store.stop()
+        if self.shard_pool: self.shard_pool.close(); self.shard_pool = None
+        if self.metrics_server: self.metrics_server.stop(); self.metrics_server = None
+        if self.market_stream: self.market_stream.stop(); self.market_stream = None
+        self.candle_store.save()
+        self.notifier.stop()
+        self.fetch_executor.shutdown(wait=False)
+        self.http.close()
+        self.history.close()
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from collections import deque
+import requests
+
+logger = logging.getLogger("monitor")
+
+# --- Despacho de Notificações (Telegram) ---
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+COALESCE_WINDOW_SECONDS = 2.0   # alertas fora de um ciclo (ex.: stream) esperam isto para serem agrupados
+MAX_DELIVERY_ATTEMPTS = 5
+MAX_BACKOFF_SECONDS = 60
+LATENCY_SAMPLES = 100
+
+def telegram_configured(bot_token, chat_id):
+    return bool(bot_token) and "AQUI" not in str(bot_token) and bool(chat_id) and "AQUI" not in str(chat_id)
+
+def split_message(text, limit=TELEGRAM_MAX_MESSAGE_LENGTH):
+    """Divide um texto longo em partes de até `limit` caracteres, preferindo quebrar entre alertas.
+
+    Um alerta maior que `limit` é quebrado no último espaço ou quebra de linha, para não cortar uma
+    palavra (ou uma entidade Markdown) ao meio; só um trecho sem nenhum espaço é cortado em `limit`.
+    """
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit)
+        if cut <= 0: cut = max(text.rfind("\n", 0, limit), text.rfind(" ", 0, limit))
+        if cut <= 0: cut = limit
+        parts.append(text[:cut]); text = text[cut:].lstrip()
+    if text: parts.append(text)
+    return parts
+
+class NotificationDispatcher:
+    """Entrega as mensagens do Telegram em uma thread própria, fora do ciclo de atualização.
+
+    As mensagens enfileiradas para o mesmo bot/chat são agrupadas em uma só (separadas por uma
+    linha em branco) quando `flush()` é chamado ao fim do ciclo, ou após `coalesce_window`
+    segundos para alertas que chegam fora de um ciclo. Respostas 429 respeitam o `retry_after`
+    informado pelo Telegram; 5xx e falhas de rede são repetidas com backoff exponencial. Uma mensagem
+    recusada por Markdown inválido é reenviada uma vez como texto simples, sem perder o lote.
+    `base_url` permite apontar para um servidor HTTP local nos testes.
+    """
+    def __init__(self, base_url=TELEGRAM_API_URL, session=None, coalesce_window=COALESCE_WINDOW_SECONDS,
+                 max_attempts=MAX_DELIVERY_ATTEMPTS):
+        self.base_url = base_url.rstrip('/')
+        self.session = session or requests.Session()
+        self.coalesce_window, self.max_attempts = coalesce_window, max_attempts
+        self.lock = threading.Lock()
+        self.pending = {}              # (bot_token, chat_id) -> [(enfileirado_em, mensagem), ...]
+        self.pending_since = None
+        self.flush_requested = False
+        self.wake_event = threading.Event(); self.stop_event = threading.Event()
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'coalesced': 0}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.thread = threading.Thread(target=self._run, daemon=True); self.thread.start()
+
+    def enqueue(self, bot_token, chat_id, message):
+        """Enfileira uma mensagem; ignorada se o bot/chat ainda não foi configurado."""
+        if not telegram_configured(bot_token, chat_id): return
+        with self.lock:
+            self.pending.setdefault((bot_token, chat_id), []).append((time.monotonic(), message))
+            if self.pending_since is None: self.pending_since = time.monotonic()
+        self.wake_event.set()
+
+    def flush(self):
+        """Pede a entrega imediata do que estiver enfileirado (chamado ao fim de cada ciclo)."""
+        with self.lock: self.flush_requested = True
+        self.wake_event.set()
+
+    def metrics(self):
+        """Profundidade da fila, contadores de entrega e latência (segundos entre enfileirar e entregar)."""
+        with self.lock:
+            latencies = list(self.latencies)
+            data = dict(self.stats, queue_depth=sum(len(m) for m in self.pending.values()))
+        data['latency_last'] = latencies[-1] if latencies else None
+        data['latency_avg'] = sum(latencies) / len(latencies) if latencies else None
+        data['latency_max'] = max(latencies) if latencies else None
+        return data
+
+    def stop(self, timeout=10):
+        """Entrega o que restar na fila e encerra a thread."""
+        self.stop_event.set(); self.wake_event.set()
+        self.thread.join(timeout=timeout)
+
+    # --- Entrega ---
+
+    def _run(self):
+        while True:
+            if not self.stop_event.is_set(): self.wake_event.wait()
+            self.wake_event.clear()
+            while not self.stop_event.is_set():
+                with self.lock:
+                    if not self.pending or self.flush_requested: break
+                    remaining = self.coalesce_window - (time.monotonic() - self.pending_since)
+                if remaining <= 0: break
+                self.wake_event.wait(remaining); self.wake_event.clear()
+            with self.lock:
+                batches, self.pending, self.pending_since, self.flush_requested = self.pending, {}, None, False
+            for (bot_token, chat_id), messages in batches.items():
+                with self.lock: self.stats['coalesced'] += len(messages) - 1
+                text = "\n\n".join(message for _, message in messages)
+                for part in split_message(text):
+                    self._deliver(bot_token, chat_id, part, messages[0][0])
+            if self.stop_event.is_set():
+                with self.lock:
+                    if not self.pending: return
+
+    def _deliver(self, bot_token, chat_id, text, enqueued_at, parse_mode='Markdown'):
+        url = f"{self.base_url}/bot{bot_token}/sendMessage"
+        payload = {'chat_id': chat_id, 'text': text}
+        if parse_mode: payload['parse_mode'] = parse_mode
+        delay = 1
+        for attempt in range(1, self.max_attempts + 1):
+            wait = None
+            try:
+                response = self.session.post(url, data=payload, timeout=10)
+                if response.status_code == 429:
+                    wait = self._retry_after(response, delay)
+                elif response.status_code >= 500:
+                    wait = delay
+                elif parse_mode and self._is_parse_error(response):
+                    # Um '_', '*', '[' ou '`' solto (ex.: nas observações de um alerta) invalida o Markdown do lote inteiro.
+                    logger.warning("Aviso: o Telegram recusou a formatação da mensagem; reenviando como texto simples.")
+                    return self._deliver(bot_token, chat_id, text, enqueued_at, parse_mode=None)
+                else:
+                    response.raise_for_status()
+                    with self.lock:
+                        self.stats['sent'] += 1; self.latencies.append(time.monotonic() - enqueued_at)
+                    logger.info("Alerta enviado para o Telegram.")
+                    return True
+            except requests.HTTPError as e:
+                logger.error(f"--> Erro ao enviar para o Telegram: {e}"); break  # 4xx: repetir não resolve
+            except requests.RequestException as e:
+                logger.warning(f"Aviso: falha de rede ao enviar para o Telegram ({e}).")
+                wait = delay
+            if attempt == self.max_attempts: break
+            with self.lock: self.stats['retries'] += 1
+            logger.warning(f"Telegram indisponível (tentativa {attempt}); nova tentativa em {wait:.0f}s.")
+            # Mesmo durante o encerramento a espera é respeitada, limitada ao backoff máximo.
+            time.sleep(min(wait, MAX_BACKOFF_SECONDS))
+            delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+        with self.lock: self.stats['failed'] += 1
+        logger.error("--> Erro ao enviar para o Telegram: mensagem descartada.")
+        return False
+
+    @staticmethod
+    def _is_parse_error(response):
+        """400 "Bad Request: can't parse entities" do Telegram (Markdown inválido)."""
+        if response.status_code != 400: return False
+        try: description = str(response.json().get('description', ''))
+        except (ValueError, AttributeError): return False
+        return "can't parse entities" in description
+
+    @staticmethod
+    def _retry_after(response, default):
+        try: return float(response.json().get('parameters', {}).get('retry_after'))
+        except (ValueError, TypeError, AttributeError): pass
+        try: return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError): return default
@@ -0,0 +1,182 @@
+import bisect
+import functools
+from enum import IntEnum
+
+from indicators import RSI_OVERBOUGHT, RSI_OVERSOLD, BB_ABOVE, BB_BELOW, GOLDEN_CROSS, DEATH_CROSS
+
+# --- Modelo Tipado da Tabela do Monitor ---
+#
+# Guarda, por símbolo, os valores brutos exibidos na tabela (floats e sinais como enum) para que a
+# ordenação não dependa do texto formatado das células, e mantém a ordem escolhida entre os ciclos.
+
+MONITOR_COLUMNS = ('symbol', 'current_price', 'price_change_24h',
+                   'rsi_signal', 'bollinger_signal', 'macd_signal', 'mme_cross',
+                   'market_cap', 'fdv', 'mcap_fdv_ratio')
+EMPTY_SIGNALS = {'rsi_signal': "", 'bollinger_signal': "", 'macd': "N/A", 'mme': "N/A"}
+
+class Signal(IntEnum):
+    """Leitura de um sinal técnico, na ordem usada para ordenar as colunas de sinais."""
+    BUY = 0
+    NEUTRAL = 1
+    SELL = 2
+    UNAVAILABLE = 3
+
+SIGNAL_COLUMNS = {
+    'rsi_signal': {RSI_OVERSOLD: Signal.BUY, "": Signal.NEUTRAL, RSI_OVERBOUGHT: Signal.SELL},
+    'bollinger_signal': {BB_BELOW: Signal.BUY, "": Signal.NEUTRAL, BB_ABOVE: Signal.SELL},
+    'macd_signal': {"Cruzamento de Alta": Signal.BUY, "Nenhum": Signal.NEUTRAL, "Cruzamento de Baixa": Signal.SELL},
+    'mme_cross': {GOLDEN_CROSS: Signal.BUY, "N/A": Signal.NEUTRAL, DEATH_CROSS: Signal.SELL},
+}
+
+def signal_of(column, text):
+    return SIGNAL_COLUMNS[column].get(text, Signal.UNAVAILABLE)
+
+class MonitorRow:
+    """Valores brutos de uma linha do Monitor; os atributos têm os nomes das colunas (MONITOR_COLUMNS)."""
+    __slots__ = ('symbol', 'current_price', 'price_change_24h', 'rsi_signal', 'bollinger_signal', 'macd_signal',
+                 'mme_cross', 'market_cap', 'fdv', 'mcap_fdv_ratio')
+
+    def __init__(self, symbol, current_price=None, price_change_24h=None, rsi_signal=None, bollinger_signal=None,
+                 macd_signal=None, mme_cross=None, market_cap=None, fdv=None, mcap_fdv_ratio=None):
+        self.symbol, self.current_price, self.price_change_24h = symbol, current_price, price_change_24h
+        self.rsi_signal, self.bollinger_signal, self.macd_signal, self.mme_cross = rsi_signal, bollinger_signal, macd_signal, mme_cross
+        self.market_cap, self.fdv, self.mcap_fdv_ratio = market_cap, fdv, mcap_fdv_ratio
+
+    @classmethod
+    def from_service_row(cls, row, signals):
+        """Linha do MonitorService (sem erro) + sinais do timeframe exibido -> MonitorRow."""
+        mcap, fdv = row.get('market_cap'), row.get('fdv')
+        return cls(row['d_symbol'], float(row['price']), float(row['change_24h']),
+                   signal_of('rsi_signal', signals['rsi_signal']), signal_of('bollinger_signal', signals['bollinger_signal']),
+                   signal_of('macd_signal', signals['macd']), signal_of('mme_cross', signals['mme']),
+                   float(mcap) if mcap is not None else None, float(fdv) if fdv is not None else None,
+                   mcap / fdv if mcap and fdv and fdv > 0 else None)
+
+    def sort_value(self, column):
+        if column == 'symbol': return self.symbol.lower()
+        return getattr(self, column)
+
+@functools.total_ordering
+class _Descending:
+    """Inverte a comparação de um valor (ordem decrescente dentro de uma chave crescente)."""
+    __slots__ = ('value',)
+
+    def __init__(self, value): self.value = value
+    def __eq__(self, other): return self.value == other.value
+    def __lt__(self, other): return self.value > other.value
+
+class MonitorTableModel:
+    """Linhas tipadas do Monitor e a ordem de exibição, mantida a cada atualização.
+
+    Com uma coluna de ordenação ativa, a ordem fica em uma lista de chaves ordenada; a cada ciclo só
+    as linhas cuja chave mudou são reposicionadas (bisect). Valores ausentes ficam sempre no fim.
+    Sem ordenação, a ordem é a de inserção (alfabética, ao popular a tabela).
+    """
+    def __init__(self):
+        self.rows = {}
+        self.sort_column, self.reverse = None, False
+        self.insertion_order = []
+        self.sorted_keys = []  # chaves completas em ordem crescente; o último elemento é o símbolo
+        self.keys = {}         # símbolo -> chave atual em sorted_keys
+
+    def reset(self, symbols):
+        """Recomeça com linhas vazias para `symbols` (mantém a coluna de ordenação escolhida)."""
+        self.rows = {symbol: MonitorRow(symbol) for symbol in symbols}
+        self.insertion_order = list(symbols)
+        self._resort()
+
+    def order(self):
+        if self.sort_column is None: return list(self.insertion_order)
+        return [key[-1] for key in self.sorted_keys]
+
+    def sort_by(self, column, reverse=False):
+        self.sort_column, self.reverse = column, reverse
+        self._resort()
+        return self.order()
+
+    def update(self, service_rows, timeframe=None, empty_signals=None):
+        """Atualiza as linhas a partir do resultado de um ciclo e reposiciona só as que mudaram de chave.
+
+        Linhas com erro mantêm os últimos valores, como na tabela. Retorna a nova ordem.
+        """
+        for row in service_rows:
+            symbol = row['symbol']
+            if row['error'] or symbol not in self.rows: continue
+            signals = row['signals'].get(timeframe, empty_signals) if timeframe else row
+            self.rows[symbol] = MonitorRow.from_service_row(row, signals)
+            if self.sort_column is None: continue
+            new_key = self._key(symbol)
+            old_key = self.keys.get(symbol)
+            if new_key == old_key: continue
+            if old_key is not None: del self.sorted_keys[bisect.bisect_left(self.sorted_keys, old_key)]
+            bisect.insort(self.sorted_keys, new_key); self.keys[symbol] = new_key
+        return self.order()
+
+    def _key(self, symbol):
+        value = self.rows[symbol].sort_value(self.sort_column)
+        if value is None: return (1, 0, symbol)
+        return (0, _Descending(value) if self.reverse else value, symbol)
+
+    def _resort(self):
+        if self.sort_column is None:
+            self.sorted_keys, self.keys = [], {}; return
+        self.keys = {symbol: self._key(symbol) for symbol in self.rows}
+        self.sorted_keys = sorted(self.keys.values())
+
+def rows_to_move(current, order):
+    """Símbolos (na ordem de `order`) que precisam ser movidos para a tabela passar de `current` a `order`.
+
+    As linhas que formam a maior subsequência já em ordem ficam paradas; só as demais são movidas,
+    de modo que uma linha que mudou de posição custa um único `move` no Treeview.
+    """
+    position = {symbol: i for i, symbol in enumerate(current)}
+    sequence = [position[symbol] for symbol in order]
+    tails, tail_index, previous = [], [], [-1] * len(sequence)
+    for i, value in enumerate(sequence):
+        k = bisect.bisect_left(tails, value)
+        if k: previous[i] = tail_index[k - 1]
+        if k == len(tails): tails.append(value); tail_index.append(i)
+        else: tails[k], tail_index[k] = value, i
+    stable, i = set(), tail_index[-1] if tail_index else -1
+    while i >= 0: stable.add(i); i = previous[i]
+    return [symbol for i, symbol in enumerate(order) if i not in stable]
+
+# --- Formatação das Linhas ---
+
+def format_large_number(num):
+    """Formata números grandes para uma leitura mais fácil (K, M, B, T)."""
+    if num is None or not isinstance(num, (int, float)):
+        return "N/A"
+    if num < 1_000:
+        return f"${num:,.2f}"
+    if num < 1_000_000:
+        return f"${num/1_000:,.2f} K"
+    if num < 1_000_000_000:
+        return f"${num/1_000_000:,.2f} M"
+    if num < 1_000_000_000_000:
+        return f"${num/1_000_000_000:,.2f} B"
+    return f"${num/1_000_000_000_000:,.2f} T"
+
+def build_row_view(row, timeframe=None):
+    """Converte uma linha do MonitorService em (valores na ordem de MONITOR_COLUMNS, tags), ambos tuplas.
+
+    `timeframe` escolhe de qual timeframe vêm os sinais (padrão: o timeframe exibido pelo serviço).
+    Linhas com erro viram (None, None): a tabela mantém os últimos valores e mostra "Erro" no preço.
+    """
+    if row['error']: return None, None
+    price, change_24h = row['price'], row['change_24h']
+    signals = row['signals'].get(timeframe, EMPTY_SIGNALS) if timeframe else row
+    rsi_signal, bollinger_signal, macd, mme = signals['rsi_signal'], signals['bollinger_signal'], signals['macd'], signals['mme']
+    s_tag, mme_tag = 'status_neutral', 'status_neutral'
+
+    if "SOBREVENDIDO" in rsi_signal or "ABAIXO" in bollinger_signal: s_tag = 'status_buy'
+    elif "SOBRECOMPRADO" in rsi_signal or "ACIMA" in bollinger_signal: s_tag = 'status_sell'
+
+    if "Alta" in str(macd) or "Dourada" in str(mme): mme_tag = 'status_buy'
+    elif "Baixa" in str(macd) or "Morte" in str(mme): mme_tag = 'status_sell'
+
+    mcap_val, fdv_val = row['market_cap'], row['fdv']
+    ratio = f"{(mcap_val / fdv_val):.2f}" if mcap_val and fdv_val and fdv_val > 0 else "N/A"
+    values = (row['d_symbol'], f"${price:,.8f}".rstrip('0').rstrip('.'), f"{change_24h:+.2f}%", rsi_signal, bollinger_signal,
+              macd, mme, format_large_number(mcap_val), format_large_number(fdv_val), ratio)
+    return values, ('price_up' if change_24h >= 0 else 'price_down', s_tag, mme_tag)
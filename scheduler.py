@@ -0,0 +1,86 @@
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger("monitor")
+
+# --- Agendador de Ciclos ---
+
+DEFAULT_JITTER_FRACTION = 0.05
+
+class CycleScheduler:
+    """Executa `run_cycle` em uma thread própria, com no máximo um ciclo em andamento.
+
+    Os ciclos seguem uma cadência fixa (o próximo horário é calculado a partir do horário
+    previsto do anterior, não do fim dele) com um pequeno jitter aleatório de ±`jitter_fraction`
+    do intervalo. Pedidos manuais (`request_refresh`) feitos durante um ciclo são agrupados
+    em uma única execução logo após o término dele; um pedido manual reinicia a cadência.
+    """
+    def __init__(self, run_cycle, interval_seconds, jitter_fraction=DEFAULT_JITTER_FRACTION, name="monitor-cycle"):
+        self.run_cycle = run_cycle
+        self.interval_seconds = interval_seconds  # função: o intervalo pode mudar entre ciclos
+        self.jitter_fraction = jitter_fraction
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event(); self.stop_event = threading.Event()
+        self.refresh_requested = False
+        self.in_flight = False
+        self.base_due = None
+        self.cycles_run = 0
+        self.thread = threading.Thread(target=self._run, daemon=True, name=name)
+
+    def start(self, initial_delay=0.0):
+        with self.lock: self.base_due = time.monotonic() + initial_delay
+        self.thread.start()
+
+    def stop(self, timeout=None):
+        self.stop_event.set(); self.wake_event.set()
+        if timeout is not None: self.thread.join(timeout=timeout)
+
+    def request_refresh(self):
+        """Pede um ciclo imediato; vários pedidos seguidos resultam em um único ciclo."""
+        with self.lock:
+            if self.refresh_requested: return
+            self.refresh_requested = True
+        self.wake_event.set()
+
+    def reschedule(self):
+        """Recalcula o próximo ciclo a partir de agora (ex.: após mudar o intervalo)."""
+        with self.lock: self.base_due = time.monotonic() + self.interval_seconds()
+        self.wake_event.set()
+
+    def _jitter(self, interval):
+        return random.uniform(-self.jitter_fraction, self.jitter_fraction) * interval
+
+    def _run(self):
+        jitter = 0.0
+        while not self.stop_event.is_set():
+            with self.lock:
+                manual = self.refresh_requested
+                due = self.base_due + jitter
+            if not manual:
+                timeout = due - time.monotonic()
+                if timeout > 0:
+                    self.wake_event.wait(timeout); self.wake_event.clear()
+                    continue  # reavalia: pode ter sido acordado por stop, refresh ou reschedule
+            if self.stop_event.is_set(): break
+
+            with self.lock: self.refresh_requested = False; self.in_flight = True
+            started = time.monotonic()
+            try: self.run_cycle()
+            except Exception: logger.exception("--> Erro no ciclo de monitoramento")
+            finally:
+                with self.lock: self.in_flight = False
+            self.cycles_run += 1
+
+            interval = max(1.0, float(self.interval_seconds()))
+            with self.lock:
+                if manual: self.base_due = started + interval
+                else:
+                    self.base_due += interval
+                    # Ciclos que não couberam no período são pulados em vez de executados em sequência.
+                    if self.base_due <= time.monotonic():
+                        skipped = int((time.monotonic() - self.base_due) // interval) + 1
+                        self.base_due += skipped * interval
+                        logger.warning(f"Ciclo mais longo que o intervalo; {skipped} execução(ões) pulada(s).")
+            jitter = self._jitter(interval)
@@ -0,0 +1,139 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from indicators import compute_signal_table
+
+logger = logging.getLogger("monitor")
+
+# --- Monitoramento em Shards ---
+#
+# Duas formas de dividir uma lista grande de símbolos, que podem ser combinadas:
+#  - monitor_daemon.py --shard I/N: cada instância (inclusive em máquinas diferentes, com o mesmo
+#    config.json) monitora só o seu shard e grava um snapshot; merge_shard_snapshots junta os snapshots.
+#    A atribuição símbolo -> shard é o crc32 do símbolo módulo N, estável entre execuções e máquinas.
+#    Cache de candles, universo de símbolos e histórico de cada instância ficam em shard-I-of-N/ (ou --data-dir).
+#  - 'shard_processes' no config.json: o MonitorService busca tudo e calcula os indicadores em
+#    processos separados (ShardPool), fora do GIL; alertas e histórico seguem no processo principal.
+#    Os símbolos prontos do ciclo são distribuídos em rodízio, e não pelo crc32: dentro de uma instância
+#    --shard I/N todos os símbolos têm o mesmo crc32 % N e cairiam em poucos processos.
+
+SHARD_MIN_SYMBOLS = 256        # abaixo disto o custo de enviar os dados aos processos não compensa
+SNAPSHOT_PATTERN = "shard-*-of-*.json"
+
+def shard_of(symbol, shard_count):
+    """Shard do símbolo (0..shard_count-1), determinístico entre processos, execuções e máquinas."""
+    if shard_count <= 1: return 0
+    return zlib.crc32(symbol.encode('utf-8')) % shard_count
+
+def partition_symbols(symbols, shard_count):
+    """Divide `symbols` em `shard_count` listas, mantendo a ordem original dentro de cada shard."""
+    shards = [[] for _ in range(max(1, shard_count))]
+    for symbol in symbols: shards[shard_of(symbol, shard_count)].append(symbol)
+    return shards
+
+def shard_name(shard):
+    """Nome do shard (índice, total) usado nos arquivos e pastas de cada instância: 'shard-I-of-N'."""
+    index, count = shard
+    return f"shard-{index}-of-{count}"
+
+def parse_shard(text):
+    """Converte 'I/N' (ex.: '0/4') em (índice, total); usado como `type` do argparse."""
+    try: index, count = (int(part) for part in text.split('/'))
+    except ValueError: raise argparse.ArgumentTypeError(f"shard inválido '{text}' (use ÍNDICE/TOTAL, ex.: 0/4)")
+    if count < 1 or not 0 <= index < count: raise argparse.ArgumentTypeError(f"shard inválido '{text}': índice fora de 0..{count - 1}")
+    return index, count
+
+# --- Pool de Processos de Indicadores ---
+
+def compute_shard_signals(symbols, closes_by_timeframe, prices, chunk):
+    """Executado no processo do shard: {timeframe: {símbolo: sinais}}, calculado em blocos de `chunk`."""
+    tables = {timeframe: {} for timeframe in closes_by_timeframe}
+    for i in range(0, len(symbols), chunk):
+        for timeframe, closes in closes_by_timeframe.items():
+            tables[timeframe].update(compute_signal_table(symbols[i:i + chunk], closes[i:i + chunk], prices[i:i + chunk]))
+    return tables
+
+class ShardPool:
+    """Calcula os sinais de cada shard em um processo separado (um processo por shard no máximo).
+
+    Os fechamentos já reamostrados são enviados prontos (INDICATOR_CANDLES por timeframe), de modo
+    que só a matemática dos indicadores, a parte que disputa o GIL, sai do processo principal.
+    """
+    def __init__(self, processes):
+        self.processes = processes
+        self.executor = ProcessPoolExecutor(max_workers=processes)
+
+    def submit(self, symbols, closes_by_timeframe, prices, chunk):
+        """Divide `symbols` em rodízio entre os processos e envia um pedido por parte; retorna {future: símbolos da parte}."""
+        futures = {}
+        for i in range(min(self.processes, len(symbols))):
+            rows = range(i, len(symbols), self.processes)  # rodízio: partes do mesmo tamanho (±1)
+            shard_symbols = [symbols[r] for r in rows]
+            shard_closes = {timeframe: [closes[r] for r in rows] for timeframe, closes in closes_by_timeframe.items()}
+            futures[self.executor.submit(compute_shard_signals, shard_symbols, shard_closes, [prices[r] for r in rows], chunk)] = shard_symbols
+        return futures
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+# --- Snapshots por Shard (várias instâncias do daemon) ---
+
+def snapshot_path(directory, shard):
+    return os.path.join(directory, f"{shard_name(shard)}.json")
+
+def write_shard_snapshot(directory, shard, rows, stats, alerts):
+    """Grava (de forma atômica) o resultado do último ciclo de um shard."""
+    snapshot = {'shard': shard[0], 'shard_count': shard[1], 'generated_at': time.time(),
+                'stats': stats, 'rows': rows, 'alerts': alerts}
+    path = snapshot_path(directory, shard)
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e: logger.error(f"--> Erro ao gravar o snapshot do shard {shard[0]}/{shard[1]}: {e}")
+
+def merge_shard_snapshots(directory, max_age=None):
+    """Junta os snapshots dos shards de `directory` em um único snapshot.
+
+    Usa o maior total de shards encontrado (snapshots de uma divisão antiga são ignorados). Shards
+    sem snapshot, ou com snapshot mais velho que `max_age` segundos, aparecem em 'missing'/'stale'.
+    """
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, SNAPSHOT_PATTERN)):
+        try:
+            with open(path, 'r', encoding='utf-8') as f: snapshots.append(json.load(f))
+        except (OSError, json.JSONDecodeError) as e: logger.warning(f"Aviso: snapshot '{path}' ignorado. {e}")
+    shard_count = max((s['shard_count'] for s in snapshots), default=0)
+    snapshots = sorted((s for s in snapshots if s['shard_count'] == shard_count), key=lambda s: s['shard'])
+    now = time.time()
+    stale = [s['shard'] for s in snapshots if max_age is not None and now - s['generated_at'] > max_age]
+    return {'shard_count': shard_count,
+            'shards': {s['shard']: {'generated_at': s['generated_at'], 'stats': s['stats']} for s in snapshots},
+            'missing': sorted(set(range(shard_count)) - {s['shard'] for s in snapshots}), 'stale': stale,
+            'rows': sorted((row for s in snapshots for row in s['rows']), key=lambda row: row['symbol']),
+            'alerts': sorted((alert for s in snapshots for alert in s['alerts']), key=lambda alert: alert.get('timestamp', ''))}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Junta os snapshots gravados por monitor_daemon.py --shard em um único snapshot.")
+    parser.add_argument('snapshot_dir', help="pasta informada em --snapshot-dir dos daemons")
+    parser.add_argument('--max-age', type=float, help="segundos após os quais o snapshot de um shard é considerado atrasado")
+    parser.add_argument('--output', help="arquivo de saída (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+    merged = merge_shard_snapshots(args.snapshot_dir, args.max_age)
+    text = json.dumps(merged, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: f.write(text)
+    else: print(text)
+    if merged['missing']: print(f"Aviso: sem snapshot dos shards {merged['missing']}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import bisect
+
+# --- Índice de Busca de Símbolos ---
+
+SEARCH_DEBOUNCE_MS = 150
+
+class SymbolSearchIndex:
+    """Índice em memória para a busca incremental de símbolos nos diálogos.
+
+    Construído uma vez por universo de símbolos: uma lista ordenada (busca por prefixo com
+    bisect) e um índice de trigramas (busca por substring). Os resultados vêm ranqueados:
+    correspondência exata, depois prefixo, depois substring, cada grupo em ordem alfabética.
+    """
+    def __init__(self, symbols=()):
+        self.symbols = sorted(set(symbols), key=str.upper)
+        self.keys = [s.upper() for s in self.symbols]
+        self.trigrams = {}
+        for i, key in enumerate(self.keys):
+            for gram in {key[j:j + 3] for j in range(len(key) - 2)}: self.trigrams.setdefault(gram, []).append(i)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def search(self, term, limit=None, exclude=None):
+        """Retorna os símbolos que contêm `term` (sem diferenciar maiúsculas), ranqueados.
+
+        `exclude` é um conjunto de símbolos a omitir (ex.: os já monitorados).
+        """
+        term = term.strip().upper()
+        exclude = exclude or ()
+        if not term:
+            matches = (s for s in self.symbols if s not in exclude)
+            return list(matches) if limit is None else [s for _, s in zip(range(limit), matches)]
+
+        results, seen = [], set()
+        def add(i):
+            if i in seen: return False
+            seen.add(i)
+            if self.symbols[i] not in exclude: results.append(self.symbols[i])
+            return limit is not None and len(results) >= limit
+
+        start = bisect.bisect_left(self.keys, term)
+        end = bisect.bisect_left(self.keys, term + "￿", start)
+        # Exato primeiro; o restante do intervalo já está em ordem alfabética.
+        if start < end and self.keys[start] == term and add(start): return results
+        for i in range(start, end):
+            if add(i): return results
+
+        for i in self._substring_candidates(term):
+            if term in self.keys[i] and add(i): return results
+        return results
+
+    def _substring_candidates(self, term):
+        if len(term) < 3: return range(len(self.keys))
+        grams = {term[j:j + 3] for j in range(len(term) - 2)}
+        postings = sorted((self.trigrams.get(g, []) for g in grams), key=len)
+        if not postings[0]: return ()
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates: return ()
+        return sorted(candidates)
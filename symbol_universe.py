@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("monitor")
+
+# --- Universo de Símbolos (Binance + CoinGecko) com cache em disco ---
+
+BINANCE_EXCHANGE_INFO_URL = "https://api.binance.com/api/v3/exchangeInfo"
+COINGECKO_COINS_LIST_URL = "https://api.coingecko.com/api/v3/coins/list?include_platform=false"
+COINGECKO_MARKETS_URL = "https://api.coingecko.com/api/v3/coins/markets"
+EXCHANGE_INFO_WEIGHT = 20
+RANKED_PAGES = 4  # 4 x 250 moedas de maior capitalização desempatam os tickers repetidos
+UNIVERSE_TTL_SECONDS = 24 * 3600
+CACHE_VERSION = 2
+
+class SymbolResolver:
+    """Índice Binance/CoinGecko construído uma vez por universo: origem de cada símbolo e id da CoinGecko.
+
+    Vários ids da CoinGecko costumam usar o mesmo ticker (ex.: dezenas de "ETH"); o par da Binance
+    é associado ao id de maior capitalização segundo `ranks` (market_cap_rank de /coins/markets),
+    e ids sem ranking perdem para os ranqueados. `overrides` ({par ou id: id da CoinGecko}, vindo de
+    'coingecko_id_overrides' no config.json) tem prioridade sobre o ranking.
+    """
+    def __init__(self, binance_symbols, coingecko_coins, ranks=None, overrides=None):
+        ranks, overrides = ranks or {}, overrides or {}
+        candidates = {}
+        for cg_id, cg_symbol in coingecko_coins: candidates.setdefault(cg_symbol, []).append(cg_id)
+        unranked = float('inf')
+        self.ambiguous = {}
+        best_by_ticker = {}
+        for cg_symbol, ids in candidates.items():
+            if len(ids) > 1:
+                ids = sorted(ids, key=lambda cg_id: (ranks.get(cg_id, unranked), cg_id))
+                self.ambiguous[cg_symbol] = ids
+            best_by_ticker[cg_symbol] = ids[0]
+
+        # Só pares cotados em USDT (ex.: BTCUSDT) têm moeda base; USDTBRL e afins ficam sem id.
+        binance_bases = {symbol[:-4]: symbol for symbol in binance_symbols if symbol.endswith('USDT') and len(symbol) > 4}
+        self.source_map = {symbol: 'binance' for symbol in binance_symbols}
+        self.coin_gecko_ids = {symbol: best_by_ticker[base] for base, symbol in binance_bases.items() if base in best_by_ticker}
+        for cg_id, cg_symbol in coingecko_coins:
+            if cg_symbol not in binance_bases:
+                self.source_map[cg_id] = 'coingecko'; self.coin_gecko_ids[cg_id] = cg_id
+        for symbol, cg_id in overrides.items(): self.coin_gecko_ids[symbol] = cg_id
+        self.all_symbols = sorted(self.source_map)
+
+    def get_coingecko_id(self, symbol):
+        return self.coin_gecko_ids.get(symbol)
+
+    def source(self, symbol):
+        return self.source_map.get(symbol)
+
+class SymbolUniverseCache:
+    """Guarda em disco as listas de símbolos da Binance e da CoinGecko e as revalida em segundo plano.
+
+    Com o cache carregado o universo fica disponível imediatamente na abertura (inclusive offline).
+    Depois de `ttl` segundos `refresh()` revalida cada fonte com If-None-Match/If-Modified-Since;
+    uma resposta 304 só renova o horário da verificação, sem baixar a lista de novo.
+    """
+    def __init__(self, path, ttl=UNIVERSE_TTL_SECONDS):
+        self.path, self.ttl = path, ttl
+        self.lock = threading.Lock()
+        self.binance_symbols, self.coingecko_coins = [], []
+        self.coingecko_ranks = {}
+        self.validators = {'binance': {}, 'coingecko': {}}  # fonte -> {'etag': ..., 'last_modified': ...}
+        self.fetched_at = 0.0
+        self.load()
+
+    @property
+    def loaded(self):
+        return bool(self.binance_symbols or self.coingecko_coins)
+
+    def is_stale(self):
+        return not self.loaded or time.time() - self.fetched_at >= self.ttl
+
+    def seconds_until_stale(self):
+        """Segundos até o cache vencer (0 se já está vencido)."""
+        if not self.loaded: return 0.0
+        return max(0.0, self.fetched_at + self.ttl - time.time())
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: data = json.load(f)
+            if data.get('version') != CACHE_VERSION: return
+            self.binance_symbols = data.get('binance_symbols', [])
+            self.coingecko_coins = [tuple(c) for c in data.get('coingecko_coins', [])]
+            self.coingecko_ranks = data.get('coingecko_ranks', {})
+            self.validators = data.get('validators', self.validators)
+            self.fetched_at = data.get('fetched_at', 0.0)
+        except FileNotFoundError: pass
+        except (json.JSONDecodeError, OSError, TypeError, ValueError) as e:
+            logger.warning(f"Aviso: cache de símbolos '{self.path}' ignorado. {e}")
+
+    def save(self):
+        with self.lock:
+            data = {'version': CACHE_VERSION, 'fetched_at': self.fetched_at, 'validators': self.validators,
+                    'binance_symbols': self.binance_symbols, 'coingecko_coins': self.coingecko_coins,
+                    'coingecko_ranks': self.coingecko_ranks}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError as e: logger.error(f"--> Erro ao salvar cache de símbolos: {e}")
+
+    def resolver(self, overrides=None):
+        """Constrói o SymbolResolver a partir das listas em cache."""
+        with self.lock: return SymbolResolver(self.binance_symbols, self.coingecko_coins, self.coingecko_ranks, overrides)
+
+    def refresh(self, client, force=False):
+        """Revalida as fontes vencidas; retorna True se alguma lista mudou."""
+        if not force and not self.is_stale(): return False
+        results = {}
+
+        def fetch(source, url, parse):
+            try: results[source] = self._conditional_get(client, source, url, parse)
+            except Exception as e: logger.error(f"--> Erro ao buscar a lista de símbolos ({source}): {e}")
+
+        threads = [threading.Thread(target=fetch, args=('binance', BINANCE_EXCHANGE_INFO_URL, self._parse_binance)),
+                   threading.Thread(target=fetch, args=('coingecko', COINGECKO_COINS_LIST_URL, self._parse_coingecko))]
+        for t in threads: t.start()
+        for t in threads: t.join()
+
+        ranks = self._fetch_ranks(client) if results.get('coingecko') is not None or not self.coingecko_ranks else None
+
+        changed = False
+        with self.lock:
+            if ranks: self.coingecko_ranks = ranks; changed = True
+            if 'binance' in results and results['binance'] is not None: self.binance_symbols = results['binance']; changed = True
+            if 'coingecko' in results and results['coingecko'] is not None: self.coingecko_coins = results['coingecko']; changed = True
+            # Só considera o cache renovado se as duas fontes responderam (200 ou 304).
+            if len(results) == 2: self.fetched_at = time.time()
+        if results: self.save()
+        return changed
+
+    def _conditional_get(self, client, source, url, parse):
+        """GET condicional: retorna a lista nova ou None quando o servidor responde 304 (não modificado)."""
+        validators = self.validators.get(source, {})
+        headers = {}
+        if self.loaded:
+            if validators.get('etag'): headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'): headers['If-Modified-Since'] = validators['last_modified']
+        response = client.get(url, headers=headers, timeout=15, weight=EXCHANGE_INFO_WEIGHT if source == 'binance' else 1)
+        if response.status_code == 304: return None
+        response.raise_for_status()
+        parsed = parse(response.json())
+        with self.lock:
+            self.validators[source] = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+        return parsed
+
+    @staticmethod
+    def _fetch_ranks(client):
+        """Retorna {id: market_cap_rank} das moedas de maior capitalização (vazio em caso de erro)."""
+        ranks = {}
+        for page in range(1, RANKED_PAGES + 1):
+            params = {'vs_currency': 'usd', 'order': 'market_cap_desc', 'per_page': 250, 'page': page}
+            try:
+                response = client.get(COINGECKO_MARKETS_URL, params=params, timeout=15)
+                response.raise_for_status()
+            except Exception as e:
+                logger.error(f"--> Erro ao buscar o ranking de capitalização da CoinGecko: {e}"); break
+            items = response.json()
+            for item in items:
+                if item.get('market_cap_rank'): ranks[item['id']] = item['market_cap_rank']
+            if len(items) < 250: break
+        return ranks
+
+    @staticmethod
+    def _parse_binance(data):
+        return sorted(s['symbol'] for s in data['symbols'] if 'USDT' in s['symbol'])
+
+    @staticmethod
+    def _parse_coingecko(data):
+        return [(item['id'], item['symbol'].upper()) for item in data]
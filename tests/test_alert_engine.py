@@ -0,0 +1,21 @@
+from alert_engine import AlertEngine
+
+def test_duplicate_symbol_entries_merge_their_alerts():
+    high = {'type': 'high', 'price': 110}
+    low = {'type': 'low', 'price': 90}
+    status = {'type': 'status', 'timeframe': '1d', 'value': "MACD: Cruzamento de Alta"}
+    engine = AlertEngine([{'symbol': 'btcusdt', 'alerts': [high]}, {'symbol': 'btcusdt', 'alerts': [low, status]},
+                          {'symbol': 'btcusdt', 'alerts': []}])
+    assert engine.alert_count() == 3
+    assert engine.status_timeframes('btcusdt') == {'1d'}
+    assert engine.evaluate('btcusdt', 120, {('1d', "MACD: Cruzamento de Alta")}) == [high, status]
+    assert engine.evaluate('btcusdt', 80) == [low]
+    assert high['triggered_now'] is False and low['triggered_now'] is True
+
+def test_edge_semantics_rearm_after_leaving_the_condition():
+    high = {'type': 'high', 'price': 100}
+    engine = AlertEngine([{'symbol': 'ethusdt', 'alerts': [high]}])
+    assert engine.evaluate('ethusdt', 101) == [high]
+    assert engine.evaluate('ethusdt', 102) == []
+    assert engine.evaluate('ethusdt', 99) == []
+    assert engine.evaluate('ethusdt', 101) == [high]
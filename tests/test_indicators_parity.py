@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indicators import (IncrementalIndicators, compute_indicator_matrix, compute_signal_table, pack_close_matrix,
+                        calculate_rsi, calculate_bollinger_bands, calculate_macd, calculate_emas, GOLDEN_CROSS, DEATH_CROSS)
+
+WINDOW = 300
+
+def reference(closes):
+    """Indicadores calculados pelas funções calculate_* (pandas) sobre a série inteira."""
+    df = pd.DataFrame({'close': np.asarray(closes, dtype=np.float64)})
+    upper, lower = calculate_bollinger_bands(df)
+    emas = calculate_emas(df, [50, 200])
+    mme = None
+    if 50 in emas and 200 in emas:
+        if emas[50].iloc[-2] < emas[200].iloc[-2] and emas[50].iloc[-1] > emas[200].iloc[-1]: mme = GOLDEN_CROSS
+        elif emas[50].iloc[-2] > emas[200].iloc[-2] and emas[50].iloc[-1] < emas[200].iloc[-1]: mme = DEATH_CROSS
+    return {'rsi': calculate_rsi(df), 'upper_band': upper, 'lower_band': lower, 'macd': calculate_macd(df), 'mme': mme}
+
+def random_series(rng, length):
+    """Passeio aleatório com ciclos, para que os cruzamentos de MACD e MMEs apareçam com frequência."""
+    t = np.arange(length)
+    period = rng.uniform(40, 400)
+    trend = 0.15 * np.sin(2 * np.pi * t / period + rng.uniform(0, 2 * np.pi))
+    return 100 * np.exp(trend + np.cumsum(rng.normal(0, 0.01, length)))
+
+def assert_same(result, expected):
+    assert result['rsi'] == pytest.approx(expected['rsi'], rel=1e-9, abs=1e-9)
+    assert result['upper_band'] == pytest.approx(expected['upper_band'], rel=1e-9, abs=1e-9)
+    assert result['lower_band'] == pytest.approx(expected['lower_band'], rel=1e-9, abs=1e-9)
+    assert result['macd'] == expected['macd']
+    assert result['mme'] == expected['mme']
+
+@pytest.mark.parametrize('seed', range(5))
+def test_vectorized_matches_calculate_functions(seed):
+    rng = np.random.default_rng(seed)
+    series = [random_series(rng, int(n)) for n in rng.integers(1, WINDOW + 1, 60)] + [random_series(rng, WINDOW) for _ in range(60)]
+    matrix, lengths = pack_close_matrix(series)
+    ind = compute_indicator_matrix(matrix, lengths)
+    for i, closes in enumerate(series):
+        assert_same({key: ind[key][i] for key in ind}, reference(closes))
+
+def test_vectorized_finds_every_kind_of_cross():
+    rng = np.random.default_rng(42)
+    series = [random_series(rng, WINDOW) for _ in range(400)]
+    ind = compute_indicator_matrix(*pack_close_matrix(series))
+    assert {"Cruzamento de Alta", "Cruzamento de Baixa", "Nenhum"} <= set(ind['macd'])
+    assert {GOLDEN_CROSS, DEATH_CROSS, None} <= set(ind['mme'])
+
+@pytest.mark.parametrize('seed', range(4))
+def test_incremental_matches_calculate_functions_over_the_window(seed):
+    rng = np.random.default_rng(100 + seed)
+    closes = random_series(rng, 900)
+    engine = IncrementalIndicators()
+    seen = set()
+    for k in range(1, len(closes)):
+        # Candles 0..k-1 fechados, candle k aberto: o ciclo usa os últimos WINDOW valores da série.
+        engine.push_closed(closes[k - 1], open_time=k - 1)
+        if k > 40 and k % 7: continue
+        expected = reference(closes[max(0, k + 1 - WINDOW):k + 1])
+        assert_same(engine.snapshot([closes[k]]), expected)
+        seen.update((expected['macd'], expected['mme']))
+    assert_same(engine.snapshot(), reference(closes[-1 - WINDOW:-1]))
+    assert "Nenhum" in seen and len(seen) > 2
+
+def test_incremental_crosses_match_on_many_series():
+    rng = np.random.default_rng(7)
+    hits = set()
+    for _ in range(150):
+        closes = random_series(rng, int(rng.integers(WINDOW + 1, 700)))
+        engine = IncrementalIndicators()
+        engine.sync(list(range(len(closes) - 1)), closes[:-1])
+        expected = reference(closes[-WINDOW:])
+        assert_same(engine.snapshot(closes[-1:]), expected)
+        hits.update((expected['macd'], expected['mme']))
+    assert {"Cruzamento de Alta", "Cruzamento de Baixa"} <= hits
+
+def test_result_does_not_depend_on_uptime():
+    rng = np.random.default_rng(3)
+    closes = random_series(rng, 2000)
+    open_times = list(range(len(closes)))
+    since_start, late = IncrementalIndicators(), IncrementalIndicators()
+    since_start.sync(open_times[:-1], closes[:-1])
+    late.sync(open_times[1500:-1], closes[1500:-1])
+    for a, b in ((since_start.snapshot(closes[-1:]), late.snapshot(closes[-1:])), (since_start.snapshot(), late.snapshot())):
+        assert_same(a, b)
+
+def test_sync_consumes_only_new_candles_and_restarts_on_gaps():
+    rng = np.random.default_rng(11)
+    closes = random_series(rng, 500)
+    open_times = list(range(len(closes)))
+    engine = IncrementalIndicators()
+    engine.sync(open_times[:400], closes[:400])
+    engine.sync(open_times[:450], closes[:450])
+    assert engine.count == 450
+    # Histórico trocado (sem o último candle conhecido): o estado recomeça a partir da nova série.
+    engine.sync([t + 0.5 for t in open_times[:350]], closes[:350])
+    assert engine.count == 350
+    assert_same(engine.snapshot(closes[350:351]), reference(closes[351 - WINDOW:351]))
+
+def test_short_history_trimmed_at_the_start_matches_the_shorter_series():
+    rng = np.random.default_rng(5)
+    closes = random_series(rng, 260)
+    open_times = list(range(len(closes)))
+    engine = IncrementalIndicators()
+    engine.sync(open_times[:200], closes[:200])
+    engine.sync(open_times[30:259], closes[30:259])
+    assert_same(engine.snapshot(closes[259:]), reference(closes[30:]))
+
+def test_several_pending_candles_do_not_change_the_state():
+    rng = np.random.default_rng(9)
+    closes = random_series(rng, 400)
+    engine = IncrementalIndicators()
+    engine.sync(list(range(390)), closes[:390])
+    assert_same(engine.snapshot(closes[390:]), reference(closes[-WINDOW:]))
+    assert engine.count == 390
+    assert_same(engine.snapshot(closes[390:391]), reference(closes[391 - WINDOW:391]))
+
+def test_signals_match_compute_signal_table():
+    rng = np.random.default_rng(21)
+    symbols = [f"S{i}" for i in range(80)]
+    series = [random_series(rng, int(n)) for n in rng.integers(WINDOW, 800, len(symbols))]
+    prices = [s[-1] * rng.uniform(0.9, 1.1) for s in series]
+    table = compute_signal_table(symbols, [s[-WINDOW:] for s in series], prices)
+    for symbol, closes, price in zip(symbols, series, prices):
+        engine = IncrementalIndicators()
+        engine.sync(list(range(len(closes) - 1)), closes[:-1])
+        assert engine.signals(closes[-1:], price) == table[symbol]
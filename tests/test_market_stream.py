@@ -0,0 +1,235 @@
+import base64
+import hashlib
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("websocket")
+
+import market_stream
+from market_stream import BinanceMarketStream, TICKER_MAX_AGE_SECONDS
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class WebSocketStandIn:
+    """Servidor WebSocket local (RFC 6455, só o necessário) no lugar do stream combinado da Binance.
+
+    Registra as mensagens SUBSCRIBE/UNSUBSCRIBE recebidas por conexão, responde como a Binance
+    ({'result': None, 'id': ...}) e permite enviar eventos ou derrubar a conexão atual.
+    """
+    def __init__(self):
+        self.sock = socket.create_server(('127.0.0.1', 0))
+        self.url = f"ws://127.0.0.1:{self.sock.getsockname()[1]}"
+        self.messages = queue.Queue()  # (número da conexão, mensagem)
+        self.connections, self.paths = [], []
+        self.connected = threading.Condition()
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+
+    def _accept_loop(self):
+        while True:
+            try: conn, _ = self.sock.accept()
+            except OSError: return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = conn.recv(4096)
+            if not chunk: conn.close(); return
+            request += chunk
+        lines = request.decode('latin-1').split("\r\n")
+        headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(':') for line in lines[1:] if ':' in line)}
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+        conn.sendall(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        with self.connected:
+            self.paths.append(lines[0].split()[1]); self.connections.append(conn)
+            number = len(self.connections); self.connected.notify_all()
+        try:
+            while True:
+                opcode, payload = self._read_frame(conn)
+                if opcode == 0x8: self._send_frame(conn, 0x8, payload[:2]); break
+                if opcode == 0x9: self._send_frame(conn, 0xA, payload); continue
+                if opcode == 0x1:
+                    message = json.loads(payload)
+                    self.messages.put((number, message))
+                    self._send_frame(conn, 0x1, json.dumps({'result': None, 'id': message.get('id')}).encode())
+        except (OSError, ConnectionError): pass
+        finally: conn.close()
+
+    @staticmethod
+    def _recv_exact(conn, size):
+        data = b""
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk: raise ConnectionError("conexão fechada")
+            data += chunk
+        return data
+
+    def _read_frame(self, conn):
+        first, second = self._recv_exact(conn, 2)
+        length = second & 0x7F
+        if length == 126: length = struct.unpack("!H", self._recv_exact(conn, 2))[0]
+        elif length == 127: length = struct.unpack("!Q", self._recv_exact(conn, 8))[0]
+        mask = self._recv_exact(conn, 4) if second & 0x80 else b"\0\0\0\0"
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(self._recv_exact(conn, length)))
+        return first & 0x0F, payload
+
+    @staticmethod
+    def _send_frame(conn, opcode, payload):
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126: header += bytes([len(payload)])
+        elif len(payload) < 65536: header += bytes([126]) + struct.pack("!H", len(payload))
+        else: header += bytes([127]) + struct.pack("!Q", len(payload))
+        conn.sendall(header + payload)
+
+    def wait_connections(self, count, timeout=5):
+        with self.connected:
+            assert self.connected.wait_for(lambda: len(self.connections) >= count, timeout), f"sem a conexão {count}"
+
+    def send_event(self, event):
+        stream = f"{event['s'].lower()}@{'miniTicker' if event['e'] == '24hrMiniTicker' else 'kline_1h'}"
+        self._send_frame(self.connections[-1], 0x1, json.dumps({'stream': stream, 'data': event}).encode())
+
+    def drop(self):
+        """Derruba a conexão atual sem handshake de fechamento (queda de rede)."""
+        conn = self.connections[-1]
+        conn.shutdown(socket.SHUT_RDWR); conn.close()
+
+    def next_message(self, timeout=5):
+        return self.messages.get(timeout=timeout)
+
+    def close(self):
+        self.sock.close()
+        for conn in self.connections:
+            try: conn.close()
+            except OSError: pass
+
+class FastEvent(threading.Event):
+    """stop_event do stream que registra os atrasos de reconexão pedidos e espera no máximo 50 ms."""
+    def __init__(self):
+        super().__init__(); self.waits = []
+
+    def wait(self, timeout=None):
+        if timeout is not None: self.waits.append(timeout); timeout = min(timeout, 0.05)
+        return super().wait(timeout)
+
+def mini_ticker(symbol, close, open_price):
+    return {'e': '24hrMiniTicker', 's': symbol, 'c': str(close), 'o': str(open_price), 'h': str(close), 'l': str(open_price),
+            'v': "10", 'q': "1000"}
+
+@pytest.fixture
+def server():
+    server = WebSocketStandIn()
+    yield server
+    server.close()
+
+@pytest.fixture
+def events():
+    return queue.Queue()
+
+@pytest.fixture
+def stream(server, events, monkeypatch):
+    monkeypatch.setattr(market_stream, 'SUBSCRIBE_MESSAGE_INTERVAL', 0)
+    stream = BinanceMarketStream(lambda symbol, ticker: events.put(('ticker', symbol, ticker)),
+                                 lambda symbol, kline: events.put(('kline', symbol, kline)), base_url=server.url, kline_interval='1h')
+    stream.stop_event = FastEvent()
+    yield stream
+    stream.stop()
+    if stream.thread: stream.thread.join(timeout=5)
+
+def test_subscriptions_follow_the_symbol_list_by_difference(server, stream, events):
+    stream.set_symbols(['BTCUSDT', 'ETHUSDT'])
+    stream.start()
+    server.wait_connections(1)
+    assert server.paths == ['/stream']
+    number, message = server.next_message()
+    assert (number, message['method']) == (1, 'SUBSCRIBE')
+    assert message['params'] == ['btcusdt@kline_1h', 'btcusdt@miniTicker', 'ethusdt@kline_1h', 'ethusdt@miniTicker']
+
+    stream.set_symbols(['ethusdt', 'SOLUSDT'])
+    _, unsubscribe = server.next_message()
+    _, subscribe = server.next_message()
+    assert (unsubscribe['method'], unsubscribe['params']) == ('UNSUBSCRIBE', ['btcusdt@kline_1h', 'btcusdt@miniTicker'])
+    assert (subscribe['method'], subscribe['params']) == ('SUBSCRIBE', ['solusdt@kline_1h', 'solusdt@miniTicker'])
+    stream.set_symbols(['SOLUSDT', 'ETHUSDT'])  # mesma lista: nenhuma mensagem
+    with pytest.raises(queue.Empty): server.next_message(timeout=0.3)
+
+    server.send_event(mini_ticker('ETHUSDT', 110, 100))
+    kind, symbol, ticker = events.get(timeout=5)
+    assert (kind, symbol, ticker['lastPrice']) == ('ticker', 'ETHUSDT', '110')
+    assert ticker['priceChangePercent'] == pytest.approx(10.0)
+    server.send_event({'e': 'kline', 's': 'ETHUSDT', 'k': {'t': 0, 'T': 3_599_999, 'i': '1h', 'c': '110', 'x': False}})
+    assert events.get(timeout=5)[:2] == ('kline', 'ETHUSDT')
+    assert set(stream.fresh_tickers(['ETHUSDT', 'SOLUSDT'])) == {'ETHUSDT'}
+
+def test_reconnects_with_exponential_backoff_and_resubscribes(server, stream):
+    stream.set_symbols(['BTCUSDT'])
+    stream.start()
+    for connection in range(1, 5):
+        server.wait_connections(connection)
+        number, message = server.next_message()
+        # Cada nova conexão assina de novo todos os streams.
+        assert (number, message['method'], message['params']) == (connection, 'SUBSCRIBE', ['btcusdt@kline_1h', 'btcusdt@miniTicker'])
+        if connection < 4: server.drop()
+    assert stream.stop_event.waits == [2, 4, 8]
+
+def test_backoff_resets_after_a_long_lived_connection(server, stream, monkeypatch):
+    monkeypatch.setattr(market_stream, 'MAX_RECONNECT_DELAY', 0.2)
+    stream.set_symbols(['BTCUSDT'])
+    stream.start()
+    server.wait_connections(1); server.next_message()
+    time.sleep(0.3)  # conexão durou mais que MAX_RECONNECT_DELAY: a próxima queda volta ao atraso inicial
+    server.drop()
+    server.wait_connections(2); server.next_message()
+    assert stream.stop_event.waits == [1]
+
+def test_cycle_falls_back_to_rest_for_stale_tickers(server, stream, tmp_path, monkeypatch):
+    from monitor_service import MonitorService
+    service = MonitorService(base_path=str(tmp_path))
+    try:
+        service.config = {"cryptos_to_monitor": [{'symbol': 'BTCUSDT', 'alerts': []}, {'symbol': 'ETHUSDT', 'alerts': []}]}
+        service.symbol_resolver.source_map.update(BTCUSDT='binance', ETHUSDT='binance')
+        service.market_stream = stream
+        requested = []
+        def rest_tickers(symbols):
+            requested.append(sorted(symbols))
+            return {s: {'symbol': s, 'lastPrice': "1", 'priceChangePercent': "0"} for s in symbols}
+        monkeypatch.setattr(service, 'get_24hr_ticker_data', rest_tickers)
+        monkeypatch.setattr(service, 'fetch_klines_batch', lambda symbols, timeout=None, store=None: {})
+        monkeypatch.setattr(service, '_fetch_fundamental_data', lambda ids, price_ids=(): {})
+
+        stream.start()
+        service.run_cycle()  # o ciclo passa a lista de símbolos ao stream
+        server.wait_connections(1); server.next_message()
+        for symbol, price in (('BTCUSDT', 50_000), ('ETHUSDT', 3_000)): server.send_event(mini_ticker(symbol, price, price))
+        deadline = time.time() + 5
+        while len(stream.fresh_tickers(['BTCUSDT', 'ETHUSDT'])) < 2 and time.time() < deadline: time.sleep(0.01)
+
+        rows = service.run_cycle()
+        assert requested[-1] == []  # os dois tickers vieram do stream
+        assert {row['symbol']: row['price'] for row in rows} == {'BTCUSDT': 50_000, 'ETHUSDT': 3_000}
+
+        # Entre ciclos o stream não mexe no dicionário do ciclo; o preço novo entra no próximo ciclo.
+        cycle_tickers, cycle_snapshot = service.ticker_24h_data, dict(service.ticker_24h_data)
+        server.send_event(mini_ticker('ETHUSDT', 3_100, 3_000))
+        wait_for_price = time.time() + 5
+        while stream.fresh_tickers(['ETHUSDT'])['ETHUSDT']['lastPrice'] != '3100' and time.time() < wait_for_price: time.sleep(0.01)
+        service._on_stream_ticker('ETHUSDT', stream.fresh_tickers(['ETHUSDT'])['ETHUSDT'])  # callback da thread do stream
+        assert service.current_prices['ETHUSDT'] == 3_100
+        assert service.ticker_24h_data is cycle_tickers and service.ticker_24h_data == cycle_snapshot
+
+        with stream.lock:  # BTCUSDT parou de receber eventos
+            received_at, ticker = stream.tickers['BTCUSDT']
+            stream.tickers['BTCUSDT'] = (received_at - TICKER_MAX_AGE_SECONDS - 1, ticker)
+        rows = service.run_cycle()
+        assert requested[-1] == ['BTCUSDT']
+        assert {row['symbol']: row['price'] for row in rows} == {'BTCUSDT': 1, 'ETHUSDT': 3_100}
+    finally:
+        service.market_stream = None
+        service.stop()
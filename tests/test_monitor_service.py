@@ -0,0 +1,80 @@
+import json
+import threading
+import time
+
+import pytest
+
+from monitor_service import MonitorService
+
+@pytest.fixture
+def service(tmp_path):
+    with open(tmp_path / "config.json", "w", encoding="utf-8") as f:
+        json.dump({"check_interval_seconds": 300, "timeframes": ['1d'], "streaming_mode": False,
+                   "cryptos_to_monitor": [{'symbol': 'btcusdt', 'alerts': [{'type': 'high', 'price': 100, 'sound': 'alerta.wav'}]}]}, f)
+    service = MonitorService(base_path=str(tmp_path))
+    service.symbol_resolver.source_map['btcusdt'] = 'binance'
+    service.load_config()
+    yield service
+    service.stop()
+
+def test_listener_state_never_reaches_the_config(service, tmp_path):
+    # Um listener (como o da GUI) pode anexar estado de execução ao alerta recebido.
+    received = []
+    service.alert_listeners.append(lambda alert_data, title, message, record: received.append(alert_data) or alert_data.update(stop_event=threading.Event()))
+    assert service.evaluate_alerts('btcusdt', 'BTCUSDT', 101.0) == 1
+    assert 'stop_event' in received[0]
+    alert = service.config['cryptos_to_monitor'][0]['alerts'][0]
+    assert set(alert) == {'type', 'price', 'sound', 'triggered_now'}
+    service.config_store.save(service.config)
+    assert service.config_store.flush()
+    with open(tmp_path / "config.json", encoding="utf-8") as f:
+        assert json.load(f)['cryptos_to_monitor'][0]['alerts'] == [{'type': 'high', 'price': 100, 'sound': 'alerta.wav'}]
+
+def test_reload_that_closes_the_shard_pool_mid_cycle(service, monkeypatch):
+    service.config['shard_processes'] = 2
+    with service.apply_lock: service._apply_config()
+    pool_of_the_cycle = service.shard_pool
+    # Recarga do config.json (thread do ConfigStore) troca o pool enquanto o ciclo ainda usa o antigo.
+    config = json.loads(json.dumps(service.config)); config['shard_processes'] = 3
+    service._on_config_file_changed(config)
+    new_pool = service.shard_pool
+    assert new_pool is not pool_of_the_cycle and new_pool.processes == 3
+    candles = {'btcusdt': service.candle_store.get_closed('btcusdt')}
+    service.ticker_24h_data = {'btcusdt': {'lastPrice': '1'}}
+    assert service._compute_signals_sharded(pool_of_the_cycle, ['btcusdt'], candles, '1d', ['1d'], {'1d': {}}, deadline=0) is None
+    assert service.shard_pool is new_pool  # o pool da recarga não é descartado pelo ciclo antigo
+    assert service._replace_broken_shard_pool(new_pool)
+    assert service.shard_pool is not new_pool and service.shard_pool.processes == 3
+
+def test_symbol_universe_is_revalidated_in_the_background(service, monkeypatch):
+    universe = service.symbol_universe
+    universe.ttl = 0.2
+    refreshed = threading.Semaphore(0)
+    def refresh(client, force=False):
+        if not universe.is_stale(): return False
+        with universe.lock:
+            universe.binance_symbols = ['btcusdt', f'new{len(universe.binance_symbols)}usdt']
+            universe.fetched_at = time.time()
+        refreshed.release()
+        return True
+    monkeypatch.setattr(universe, 'refresh', refresh)
+    service.start_symbol_refresh()
+    assert refreshed.acquire(timeout=2)
+    assert refreshed.acquire(timeout=2)  # venceu de novo depois de `ttl` segundos e foi revalidado sem ninguém chamar
+    deadline = time.time() + 2
+    while 'btcusdt' not in service.all_symbols_list and time.time() < deadline: time.sleep(0.01)
+    assert 'btcusdt' in service.all_symbols_list
+    service.universe_stop.set(); service.universe_thread.join(timeout=2)
+    assert not service.universe_thread.is_alive()
+
+def test_user_saves_are_written_immediately_and_report_failures(service, tmp_path):
+    service.config['cryptos_to_monitor'].append({'symbol': 'ethusdt', 'alerts': []})
+    assert service.save_config(wait=True)
+    with open(tmp_path / "config.json", encoding="utf-8") as f:
+        assert [c['symbol'] for c in json.load(f)['cryptos_to_monitor']] == ['btcusdt', 'ethusdt']
+    service.load_config()  # reler logo após salvar não perde a edição
+    assert 'ethusdt' in service.monitored_symbols()
+
+    service.config_store.path = str(tmp_path / "sem-pasta" / "config.json")
+    assert not service.save_config(wait=True)
+    assert service.config_store.last_error
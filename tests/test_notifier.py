@@ -0,0 +1,174 @@
+import json
+import queue
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+import requests
+
+import notifier
+from notifier import NotificationDispatcher, split_message, TELEGRAM_MAX_MESSAGE_LENGTH
+
+TOKEN = "123:abc"
+
+class TelegramStandIn:
+    """Servidor HTTP local no lugar da API do Telegram (sendMessage).
+
+    Cada requisição consome a próxima resposta roteirizada (status, corpo, cabeçalhos); sem roteiro,
+    responde 200. As requisições recebidas ficam em `requests` como (caminho, campos do formulário).
+    """
+    def __init__(self):
+        self.responses, self.requests = queue.Queue(), queue.Queue()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+                stand_in.requests.put((self.path, {k: v[0] for k, v in form.items()}))
+                try: status, body, headers = stand_in.responses.get_nowait()
+                except queue.Empty: status, body, headers = 200, {'ok': True, 'result': {}}, {}
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items(): self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json'); self.send_header('Content-Length', str(len(data)))
+                self.end_headers(); self.wfile.write(data)
+
+            def log_message(self, *args): pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def script(self, *responses):
+        for response in responses: self.responses.put(response)
+
+    def received(self, count, timeout=5):
+        return [self.requests.get(timeout=timeout) for _ in range(count)]
+
+    def close(self):
+        self.server.shutdown(); self.server.server_close()
+
+@pytest.fixture
+def telegram():
+    telegram = TelegramStandIn()
+    yield telegram
+    telegram.close()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Registra as esperas de backoff do dispatcher sem dormir de fato."""
+    sleeps = []
+    monkeypatch.setattr(notifier, 'time', types.SimpleNamespace(monotonic=time.monotonic, sleep=sleeps.append))
+    return sleeps
+
+@pytest.fixture
+def make_dispatcher(telegram):
+    dispatchers = []
+    def make(**kwargs):
+        session = requests.Session(); session.trust_env = False  # sem proxies do ambiente para 127.0.0.1
+        dispatcher = NotificationDispatcher(base_url=telegram.url, session=session, **kwargs)
+        dispatchers.append(dispatcher)
+        return dispatcher
+    yield make
+    for dispatcher in dispatchers: dispatcher.stop()
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida"
+        time.sleep(0.01)
+
+def test_messages_are_coalesced_per_chat_on_flush(telegram, make_dispatcher):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    dispatcher.enqueue(TOKEN, "100", "alerta 1")
+    dispatcher.enqueue(TOKEN, "200", "alerta 2")
+    dispatcher.enqueue(TOKEN, "100", "alerta 3")
+    dispatcher.enqueue("SEU_TOKEN_AQUI", "100", "ignorado: bot não configurado")
+    dispatcher.flush()
+    received = sorted(telegram.received(2), key=lambda r: r[1]['chat_id'])
+    assert [path for path, _ in received] == [f"/bot{TOKEN}/sendMessage"] * 2
+    assert [(form['chat_id'], form['text'], form['parse_mode']) for _, form in received] == [
+        ("100", "alerta 1\n\nalerta 3", "Markdown"), ("200", "alerta 2", "Markdown")]
+    wait_for(lambda: dispatcher.metrics()['sent'] == 2)
+    assert dispatcher.metrics()['coalesced'] == 1 and dispatcher.metrics()['queue_depth'] == 0
+    with pytest.raises(queue.Empty): telegram.requests.get(timeout=0.2)
+
+def test_messages_outside_a_cycle_wait_for_the_coalescing_window(telegram, make_dispatcher):
+    dispatcher = make_dispatcher(coalesce_window=0.3)
+    started = time.monotonic()
+    dispatcher.enqueue(TOKEN, "100", "stream 1")
+    time.sleep(0.1); dispatcher.enqueue(TOKEN, "100", "stream 2")
+    (_, form), = telegram.received(1)
+    assert form['text'] == "stream 1\n\nstream 2"
+    assert time.monotonic() - started >= 0.3
+
+def test_long_batches_are_split_at_the_telegram_limit(telegram, make_dispatcher):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    messages = [f"alerta {i}: " + "x" * 300 for i in range(40)]
+    for message in messages: dispatcher.enqueue(TOKEN, "100", message)
+    dispatcher.flush()
+    wait_for(lambda: dispatcher.metrics()['sent'] >= 1 and dispatcher.metrics()['queue_depth'] == 0)
+    texts = []
+    while True:
+        try: texts.append(telegram.requests.get(timeout=0.5)[1]['text'])
+        except queue.Empty: break
+    assert len(texts) == dispatcher.metrics()['sent'] > 1
+    assert all(len(text) <= TELEGRAM_MAX_MESSAGE_LENGTH for text in texts)
+    # As quebras caem entre alertas: nenhum alerta é cortado ao meio.
+    assert [m for text in texts for m in text.split("\n\n")] == messages
+
+def test_429_waits_for_retry_after(telegram, make_dispatcher, sleeps):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    telegram.script((429, {'ok': False, 'error_code': 429, 'parameters': {'retry_after': 7}}, {}),
+                    (429, {'ok': False}, {'Retry-After': '3'}))
+    dispatcher.enqueue(TOKEN, "100", "alerta"); dispatcher.flush()
+    assert [form['text'] for _, form in telegram.received(3)] == ["alerta"] * 3
+    wait_for(lambda: dispatcher.metrics()['sent'] == 1)
+    assert sleeps == [7.0, 3.0]
+    assert dispatcher.metrics()['retries'] == 2 and dispatcher.metrics()['failed'] == 0
+
+def test_5xx_backs_off_exponentially_then_drops(telegram, make_dispatcher, sleeps):
+    dispatcher = make_dispatcher(coalesce_window=60, max_attempts=4)
+    telegram.script(*[(502, {'ok': False}, {})] * 4)
+    dispatcher.enqueue(TOKEN, "100", "perdido"); dispatcher.flush()
+    telegram.received(4)
+    wait_for(lambda: dispatcher.metrics()['failed'] == 1)
+    assert sleeps == [1, 2, 4]
+    assert dispatcher.metrics()['sent'] == 0 and dispatcher.metrics()['retries'] == 3
+    # A mensagem descartada não bloqueia as seguintes.
+    dispatcher.enqueue(TOKEN, "100", "seguinte"); dispatcher.flush()
+    (_, form), = telegram.received(1)
+    assert form['text'] == "seguinte"
+    wait_for(lambda: dispatcher.metrics()['sent'] == 1)
+
+def test_markdown_parse_errors_are_resent_as_plain_text(telegram, make_dispatcher, sleeps):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    telegram.script((400, {'ok': False, 'error_code': 400, 'description': "Bad Request: can't parse entities: "
+                                                                           "Can't find end of the entity starting at byte offset 30"}, {}))
+    dispatcher.enqueue(TOKEN, "100", "*ALERTA PREÇO: BTCUSDT*")
+    dispatcher.enqueue(TOKEN, "100", "Obs: _stop_loss em 1_000")
+    dispatcher.flush()
+    (_, markdown), (_, plain) = telegram.received(2)
+    assert markdown['parse_mode'] == "Markdown" and 'parse_mode' not in plain
+    assert plain['text'] == markdown['text'] == "*ALERTA PREÇO: BTCUSDT*\n\nObs: _stop_loss em 1_000"
+    wait_for(lambda: dispatcher.metrics()['sent'] == 1)
+    assert dispatcher.metrics()['failed'] == 0 and sleeps == []
+
+def test_other_4xx_errors_are_not_retried(telegram, make_dispatcher, sleeps):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    telegram.script((400, {'ok': False, 'error_code': 400, 'description': "Bad Request: chat not found"}, {}))
+    dispatcher.enqueue(TOKEN, "100", "alerta"); dispatcher.flush()
+    telegram.received(1)
+    wait_for(lambda: dispatcher.metrics()['failed'] == 1)
+    assert sleeps == []
+    with pytest.raises(queue.Empty): telegram.requests.get(timeout=0.2)
+
+def test_a_single_long_alert_is_split_between_words():
+    words = [f"palavra{i}" for i in range(1500)]
+    parts = split_message(" ".join(words))
+    assert len(parts) > 1 and all(len(part) <= TELEGRAM_MAX_MESSAGE_LENGTH for part in parts)
+    assert [w for part in parts for w in part.split(" ")] == words
+    assert split_message("x" * 5000) == ["x" * TELEGRAM_MAX_MESSAGE_LENGTH, "x" * (5000 - TELEGRAM_MAX_MESSAGE_LENGTH)]
@@ -0,0 +1,61 @@
+import json
+from concurrent.futures import wait
+
+import numpy as np
+import pytest
+
+from indicators import compute_signal_table
+from sharding import ShardPool, shard_of, partition_symbols, parse_shard
+
+@pytest.fixture
+def pool():
+    pool = ShardPool(4)
+    yield pool
+    pool.close()
+
+def test_pool_spreads_the_symbols_of_one_daemon_shard(pool):
+    # Dentro de uma instância --shard 1/4 todos os símbolos têm crc32 % 4 == 1.
+    symbols = [s for s in (f"coin{i}usdt" for i in range(400)) if shard_of(s, 4) == 1][:60]
+    rng = np.random.default_rng(0)
+    closes = {'1d': [100 * np.exp(np.cumsum(rng.normal(0, 0.02, 300))) for _ in symbols]}
+    prices = [c[-1] for c in closes['1d']]
+    futures = pool.submit(symbols, closes, prices, chunk=8)
+    assert sorted(len(part) for part in futures.values()) == [15, 15, 15, 15]
+    done, pending = wait(futures, timeout=60)
+    assert not pending
+    merged = {}
+    for future in done: merged.update(future.result()['1d'])
+    assert merged == compute_signal_table(symbols, closes['1d'], prices)
+
+def test_pool_with_fewer_symbols_than_processes(pool):
+    futures = pool.submit(['btcusdt'], {'1d': [np.linspace(1, 2, 50)]}, [2.0], chunk=8)
+    assert list(futures.values()) == [['btcusdt']]
+
+def test_daemon_shards_are_stable_and_cover_every_symbol():
+    symbols = [f"coin{i}usdt" for i in range(100)]
+    shards = partition_symbols(symbols, 3)
+    assert sorted(s for shard in shards for s in shard) == sorted(symbols)
+    assert all(shard_of(s, 3) == i for i, shard in enumerate(shards) for s in shard)
+    assert parse_shard("2/3") == (2, 3)
+
+def test_daemon_shards_on_one_host_keep_separate_state(tmp_path):
+    from monitor_service import MonitorService
+    symbols = [f"COIN{i}USDT" for i in range(40)]
+    with open(tmp_path / "config.json", "w", encoding="utf-8") as f:
+        json.dump({"cryptos_to_monitor": [{'symbol': s, 'alerts': []} for s in symbols]}, f)
+    services = [MonitorService(base_path=str(tmp_path), shard=(i, 2)) for i in range(2)]
+    try:
+        for service in services: service.load_config()
+        paths = [(s.candle_store.path, s.history.path, s.symbol_universe.path) for s in services]
+        assert all(p.startswith(str(tmp_path / f"shard-{i}-of-2")) for i, group in enumerate(paths) for p in group)
+        assert sorted(services[0].monitored_symbols() + services[1].monitored_symbols()) == sorted(symbols)
+        for service in services:
+            for symbol in service.monitored_symbols(): service.candle_store.merge(symbol, [[0, 1, 1, 1, 1, 1, 86_399_999]], now_ms=10**12)
+        # Recarregar o config em um shard não descarta o cache do outro.
+        services[0]._apply_config()
+        assert all(len(services[1].candle_store.get_closed(s)) for s in services[1].monitored_symbols())
+    finally:
+        for service in services: service.stop()
+    explicit = MonitorService(base_path=str(tmp_path), shard=(0, 2), data_dir=str(tmp_path / "estado"))
+    try: assert explicit.candle_store.path.startswith(str(tmp_path / "estado"))
+    finally: explicit.stop()
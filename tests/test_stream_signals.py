@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from candle_store import CLOSE, INTERVAL_MS, resample_candles
+from indicators import compute_signal_table
+from monitor_service import MonitorService, INDICATOR_CANDLES, status_signals
+
+HOUR = INTERVAL_MS['1h']
+
+@pytest.fixture
+def service(tmp_path):
+    service = MonitorService(base_path=str(tmp_path))
+    service.config = {"timeframes": ['1h'], "display_timeframe": '1h', "streaming_mode": False,
+                      "cryptos_to_monitor": [{'symbol': 'btcusdt', 'alerts': [
+                          {'type': 'status', 'timeframe': '4h', 'value': "MACD: Cruzamento de Alta"},
+                          {'type': 'status', 'timeframe': '1h', 'value': "MACD: Cruzamento de Baixa"}]}]}
+    service._apply_config()
+    yield service
+    service.stop()
+
+def klines(closes, start=0):
+    return [[(start + i) * HOUR, c, c, c, c, 1.0, (start + i + 1) * HOUR - 1] for i, c in enumerate(closes, start=0)]
+
+def expected_signals(service, symbol, price):
+    candles = service.candle_store.get_candles(symbol)
+    signals = {}
+    for timeframe in ('1h', '4h'):
+        closes = resample_candles(candles, service.candle_store.interval, timeframe)[-INDICATOR_CANDLES:, CLOSE]
+        sig = compute_signal_table([symbol], [closes], [price])[symbol]
+        signals[timeframe] = {**sig, 'mme': sig['mme'] or "N/A"}
+    return status_signals(signals)
+
+def test_stream_klines_evaluate_status_alerts_like_the_cycle(service, monkeypatch):
+    assert service.candle_store.interval == '1h'
+    rng = np.random.default_rng(1)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 1700)) + 0.1 * np.sin(np.arange(1700) / 30))
+    service.candle_store.merge('btcusdt', klines(closes[:1400]), now_ms=1400 * HOUR + 10 * HOUR)
+    evaluated = []
+    monkeypatch.setattr(service, 'evaluate_alerts', lambda symbol, d_symbol, price, signals=None: evaluated.append((price, signals)))
+    hits = set()
+    for i in range(1400, 1700):
+        # Atualização parcial do candle aberto e depois o candle final (x=True).
+        for close, final in ((closes[i - 1] * 0.5 + closes[i] * 0.5, False), (closes[i], True)):
+            service.current_prices['btcusdt'] = close
+            row = klines([close], start=i)[0]
+            service._on_stream_kline('btcusdt', {'t': row[0], 'o': close, 'h': close, 'l': close, 'c': close, 'v': 1.0,
+                                                 'T': row[6], 'x': final, 'i': '1h'})
+            price, signals = evaluated[-1]
+            assert price == close
+            assert signals == expected_signals(service, 'btcusdt', close)
+            hits |= signals
+    assert len(evaluated) == 600
+    assert {('4h', "MACD: Cruzamento de Alta"), ('1h', "MACD: Cruzamento de Baixa")} <= hits
+
+def test_symbols_without_status_alerts_are_not_evaluated(service, monkeypatch):
+    service.candle_store.merge('ethusdt', klines([1.0] * 50), now_ms=60 * HOUR)
+    monkeypatch.setattr(service, 'evaluate_alerts', lambda *args, **kwargs: pytest.fail("não deveria avaliar"))
+    service._on_stream_kline('ethusdt', {'t': 50 * HOUR, 'o': 1, 'h': 1, 'l': 1, 'c': 1, 'v': 1, 'T': 51 * HOUR - 1, 'x': False, 'i': '1h'})
+    assert not service.indicator_engines